@@ -0,0 +1,256 @@
+import asyncio
+import contextvars
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+from clob_book import best_bid_ask, format_price, resolve_mid
+from rate_limit import DeadlineExceeded, RateLimiter, acquire_async, default_limiter, parse_retry_after
+
+CLOB_API = "https://clob.polymarket.com"
+BINANCE_API_URL = "https://api.binance.com/api/v3/ticker/price"
+
+# 当前采样周期的截止时间，由 collect_tick 设置，并发子任务继承同一上下文
+_DEADLINE: contextvars.ContextVar = contextvars.ContextVar("deadline", default=None)
+
+
+class AsyncCollector:
+    """
+    常驻 asyncio 采集引擎：后台线程运行事件循环，复用同一个 aiohttp 连接池访问 CLOB 与币安，
+    每个采样周期内 Polymarket 与币安请求并发执行
+    """
+
+    def __init__(
+            self,
+            clob_api: str = CLOB_API,
+            binance_api_url: str = BINANCE_API_URL,
+            timeout: float = 5.0,
+            limit_per_host: int = 32,
+            shard_size: int = 100,
+            limiter: RateLimiter = default_limiter,
+    ):
+        self.clob_api = clob_api.rstrip("/")
+        self.binance_api_url = binance_api_url
+        self.timeout = timeout
+        self.limit_per_host = limit_per_host
+        # 批量请求（/books、ticker/price）单次携带的条目上限，超出时拆成多个分片并发请求
+        self.shard_size = max(1, shard_size)
+        # 与线程池引擎共用的按主机请求预算
+        self.limiter = limiter
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ready = threading.Event()
+
+    # ------------------------ 生命周期 ------------------------
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="async-collector", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=5)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._open_session())
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _open_session(self):
+        connector = aiohttp.TCPConnector(
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._loop = None
+
+    # ------------------------ 同步入口 ------------------------
+
+    def collect(
+            self,
+            token_by_coin: Optional[Dict[str, str]],
+            binance_symbols: Optional[Dict[str, str]],
+            polymarket_mode: str = "poll",
+            binance_mode: str = "poll",
+            deadline: float | None = None,
+    ) -> Tuple[Optional[dict], Optional[dict]]:
+        """
+        在引擎事件循环中并发执行一个周期的采集，返回 (polymarket_prices, binance_prices)
+        传入 None 的数据源跳过，对应返回值也为 None；deadline 之后不再发起新请求
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self.collect_tick(token_by_coin, binance_symbols, polymarket_mode, binance_mode, deadline),
+            self._loop,
+        )
+        return future.result(timeout=self.timeout * 2)
+
+    async def collect_tick(self, token_by_coin, binance_symbols, polymarket_mode, binance_mode, deadline=None):
+        async def skip():
+            return None
+
+        _DEADLINE.set(deadline)
+
+        polymarket_task = (
+            self.fetch_polymarket(token_by_coin, polymarket_mode) if token_by_coin is not None else skip()
+        )
+        binance_task = (
+            self.fetch_binance(binance_symbols, binance_mode) if binance_symbols is not None else skip()
+        )
+        return tuple(await asyncio.gather(polymarket_task, binance_task))
+
+    @asynccontextmanager
+    async def _request(self, method: str, url: str, **kwargs):
+        """经共享限流器发起请求；截止前拿不到配额时抛出 DeadlineExceeded，请求超时不超过截止时间"""
+        deadline = _DEADLINE.get()
+        host = urlparse(url).hostname or url
+        limiter = self.limiter.for_host(host)
+        if not await acquire_async(limiter, deadline):
+            raise DeadlineExceeded(url)
+        if deadline is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=max(0.01, min(self.timeout, deadline - time.time())))
+
+        status = None
+        retry_after = None
+        started = time.monotonic()
+        try:
+            async with self._session.request(method, url, **kwargs) as resp:
+                status = resp.status
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                yield resp
+        finally:
+            self.limiter.observe(host, status, time.monotonic() - started)
+            limiter.release(status, retry_after)
+
+    def _shards(self, mapping: Dict[str, str]) -> list:
+        items = list(mapping.items())
+        return [dict(items[i:i + self.shard_size]) for i in range(0, len(items), self.shard_size)]
+
+    # ------------------------ Polymarket ------------------------
+
+    async def fetch_polymarket(self, token_by_coin: Dict[str, str], mode: str = "poll") -> Dict[str, str]:
+        """返回 {coin: price_str}，失败为 "none" """
+        result = {coin: "none" for coin in token_by_coin}
+        valid = {coin: token for coin, token in token_by_coin.items() if token and token != "none"}
+        if not valid:
+            return result
+
+        if mode == "bulk":
+            # 各分片并发请求，单个分片失败只影响该分片的市场
+            shards = await asyncio.gather(
+                *(self._fetch_books_bulk(shard) for shard in self._shards(valid)),
+                return_exceptions=True,
+            )
+            for shard in shards:
+                if isinstance(shard, dict):
+                    result.update(shard)
+            return result
+
+        prices = await asyncio.gather(*(self._fetch_midpoint(token) for token in valid.values()))
+        result.update(zip(valid.keys(), prices))
+        return result
+
+    async def _fetch_books_bulk(self, valid: Dict[str, str]) -> Dict[str, str]:
+        coin_by_token = {token: coin for coin, token in valid.items()}
+        body = [{"token_id": token} for token in valid.values()]
+        async with self._request("POST", f"{self.clob_api}/books", json=body) as resp:
+            resp.raise_for_status()
+            books = await resp.json(content_type=None)
+
+        result = {}
+        for book in books or []:
+            coin = coin_by_token.get(book.get("asset_id"))
+            if coin is not None:
+                result[coin] = format_price(resolve_mid(*best_bid_ask(book.get("bids"), book.get("asks"))))
+        return result
+
+    async def _fetch_midpoint(self, token_id: str) -> str:
+        """与 get_price_sync 相同：先取中间价，为 0 时回退到盘口最优买价"""
+        try:
+            async with self._request("GET", f"{self.clob_api}/midpoint", params={"token_id": token_id}) as resp:
+                if resp.status == 200:
+                    data = await resp.json(content_type=None)
+                    mid = float((data or {}).get("mid") or 0)
+                    if mid > 0:
+                        return format_price(mid)
+
+            async with self._request("GET", f"{self.clob_api}/book", params={"token_id": token_id}) as resp:
+                if resp.status == 200:
+                    book = await resp.json(content_type=None)
+                    best_bid, _ = best_bid_ask((book or {}).get("bids"), [])
+                    return format_price(best_bid)
+        except Exception:
+            pass
+        return "none"
+
+    # ------------------------ 币安 ------------------------
+
+    async def fetch_binance(self, symbols: Dict[str, str], mode: str = "poll") -> Dict[str, str]:
+        """返回成功的 {coin: price}，失败的币种不出现在结果中"""
+        if not symbols:
+            return {}
+
+        result = {}
+        if mode == "batch":
+            shards = await asyncio.gather(
+                *(self._fetch_binance_batch(shard) for shard in self._shards(symbols)),
+                return_exceptions=True,
+            )
+            for shard in shards:
+                if isinstance(shard, dict):
+                    result.update(shard)
+            symbols = {coin: symbol for coin, symbol in symbols.items() if coin not in result}
+            if not symbols:
+                return result
+
+        prices = await asyncio.gather(*(self._fetch_binance_single(symbol) for symbol in symbols.values()))
+        for coin, price in zip(symbols.keys(), prices):
+            if price is not None:
+                result[coin] = price
+        return result
+
+    async def _fetch_binance_batch(self, symbols: Dict[str, str]) -> Dict[str, str]:
+        coin_by_symbol = {symbol: coin for coin, symbol in symbols.items()}
+        params = {"symbols": json.dumps(list(symbols.values()), separators=(",", ":"))}
+        async with self._request("GET", self.binance_api_url, params=params) as resp:
+            resp.raise_for_status()
+            data = await resp.json(content_type=None)
+
+        result = {}
+        for item in data if isinstance(data, list) else []:
+            coin = coin_by_symbol.get(item.get("symbol"))
+            if coin is not None and item.get("price") is not None:
+                result[coin] = str(item["price"])
+        return result
+
+    async def _fetch_binance_single(self, symbol: str) -> Optional[str]:
+        try:
+            async with self._request("GET", self.binance_api_url, params={"symbol": symbol}) as resp:
+                if resp.status != 200:
+                    return None
+                data = await resp.json(content_type=None)
+                if isinstance(data, dict) and data.get("price") is not None:
+                    return str(data["price"])
+        except Exception:
+            pass
+        return None
@@ -0,0 +1,339 @@
+"""
+历史补数：找出 data/ 中各序列缺失的秒（包括整段没有写入的时间与 none / 0 哨兵值），
+从 CLOB prices-history 与币安 1 秒 K 线取回历史价格，按时间顺序合并回当天的 CSV
+
+  - Polymarket：按缺失秒所在的周期用注册表生成 slug，经 crypto15 解析 token（含已结算的市场），
+    再请求该周期的 prices-history（分钟级）；每个缺失秒取不晚于该秒的最近一个历史点
+  - 币安：请求覆盖缺失区间的 1 秒 K 线，第 t 秒取 [t-1, t) 这根 K 线的收盘价（即 t 时刻的最新成交价）
+  - 所有请求经共享限流器并发发出；补齐的行在 source 列标记为 backfill，原有行该列为空
+    （采集器之后追加到同一文件的行由 CsvSink 按已有表头补齐，source 同样为空）
+
+用法：
+    python backfill.py 2025-01-01                          # 补一天的所有序列
+    python backfill.py 2025-01-01 2025-01-03 --series BTC,BTC5MIN,BTC_BINANCE
+    python backfill.py 2025-01-01 --start 08:00:00 --end 09:30:00 --dry-run
+
+文件被原子替换，采集器正在写入的当天文件默认跳过（--include-today 前需先停止采集器）。
+只补 CSV，Parquet 文件不变。接口地址与 main.py 相同（CLOB_API_URL / BINANCE_API_URL / GAMMA_MARKETS_URL）。
+"""
+import argparse
+import csv
+import os
+import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+import pytz
+import requests
+
+import main
+from clob_book import format_price
+from cycle_calendar import cycle_start_ts
+from crypto15 import resolve_cycle_markets
+
+BACKFILL_SOURCE = "backfill"
+# 币安 klines 单次请求的最大条数
+KLINES_LIMIT = 1000
+# 单个补数请求（含重试）的截止时间
+REQUEST_TIMEOUT = 60.0
+
+_session = requests.Session()
+
+
+@dataclass
+class SeriesGap:
+    """一个序列在某一天的缺口"""
+
+    kind: str                       # polymarket / binance
+    key: str                        # 市场键或币种
+    stem: str
+    path: str
+    missing: list                   # 缺失的 Unix 秒（升序）
+    filled: dict = field(default_factory=dict)
+
+
+def klines_url() -> str:
+    """由 BINANCE_API_URL（ticker/price）推出同一主机的 klines 地址"""
+    base = main.BINANCE_API_URL.split("/ticker/price", 1)[0]
+    return f"{base}/klines"
+
+
+def data_tz():
+    return pytz.timezone(main.POLYMARKET_CONFIG["DATA_TIMEZONE"])
+
+
+def day_range(date_str: str) -> tuple:
+    """落盘时区某一天的 [起点, 终点) Unix 秒"""
+    tz = data_tz()
+    day = datetime.strptime(date_str, "%Y-%m-%d")
+    start = tz.localize(day)
+    end = tz.localize(day + timedelta(days=1))
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def parse_time(value: str, tz=None) -> float | None:
+    """解析落盘时间字符串（整秒或带毫秒）为 Unix 时间戳"""
+    try:
+        return (tz or data_tz()).localize(datetime.fromisoformat(value)).timestamp()
+    except ValueError:
+        return None
+
+
+def read_series(path: str) -> tuple:
+    """返回 (表头, 行列表)；文件不存在时返回默认表头与空列表"""
+    if not os.path.exists(path):
+        return ["time", "price"], []
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or ["time", "price"]
+        return header, [row for row in reader if row]
+
+
+def invalid_prices(kind: str) -> set:
+    return {"", "none", "0"} if kind == "binance" else {"", "none"}
+
+
+def find_missing(rows: list, kind: str, start_ts: int, end_ts: int) -> list:
+    """[start_ts, end_ts) 内没有有效价格的秒"""
+    invalid = invalid_prices(kind)
+    tz = data_tz()
+    valid = set()
+    for row in rows:
+        ts = parse_time(row[0], tz)
+        if ts is not None and len(row) > 1 and row[1] not in invalid:
+            valid.add(int(ts))
+    return [ts for ts in range(start_ts, end_ts) if ts not in valid]
+
+
+def list_series(selected: set | None) -> list:
+    """(类型, 键, 文件名前缀)；selected 为文件名前缀集合，None 表示全部"""
+    series = [("polymarket", key, main.MARKET_REGISTRY.file_stem(key)) for key in main.MARKET_REGISTRY.keys()]
+    series += [("binance", coin, main.series_stem("binance", coin)) for coin in main.BINANCE_SYMBOLS]
+    return [item for item in series if selected is None or item[2] in selected]
+
+
+def scan_gaps(dates: list, selected: set | None, start_time: str | None, end_time: str | None) -> list:
+    gaps = []
+    now = int(time.time())
+    for date_str in dates:
+        day_start, day_end = day_range(date_str)
+        start_ts = int(parse_time(f"{date_str} {start_time}")) if start_time else day_start
+        end_ts = int(parse_time(f"{date_str} {end_time}")) if end_time else day_end
+        # 不补尚未到来的时间
+        end_ts = min(end_ts, now - 1)
+        if end_ts <= start_ts:
+            continue
+        for kind, key, stem in list_series(selected):
+            path = main.csv_sink.file_path(stem, date_str)
+            _, rows = read_series(path)
+            missing = find_missing(rows, kind, start_ts, end_ts)
+            if missing:
+                gaps.append(SeriesGap(kind, key, stem, path, missing))
+    return gaps
+
+
+def split_runs(seconds: list, max_length: int) -> list:
+    """把升序的秒切分为连续区间 [(起点, 终点含)]，每段不超过 max_length 秒"""
+    runs = []
+    for ts in seconds:
+        if runs and ts == runs[-1][1] + 1 and ts - runs[-1][0] < max_length:
+            runs[-1][1] = ts
+        else:
+            runs.append([ts, ts])
+    return [tuple(run) for run in runs]
+
+
+def step_fill(points: list, seconds: list, max_staleness: float) -> dict:
+    """points 为按时间升序的 [(t, 价格)]；每个秒取不晚于它且不超过 max_staleness 秒的最近一个点"""
+    times = [t for t, _ in points]
+    filled = {}
+    for ts in seconds:
+        index = bisect_right(times, ts) - 1
+        if index >= 0 and ts - times[index] <= max_staleness:
+            filled[ts] = points[index][1]
+    return filled
+
+
+# ======================== 历史数据接口 ========================
+
+def fetch_price_history(token_id: str, start_ts: int, end_ts: int, fidelity: int) -> list:
+    """CLOB /prices-history：返回 [(t, 价格字符串)]，fidelity 为分钟"""
+    response = main.rate_limiter.request(
+        _session, "GET", f"{main.CLOB_API}/prices-history", time.time() + REQUEST_TIMEOUT,
+        params={"market": token_id, "startTs": start_ts, "endTs": end_ts, "fidelity": fidelity},
+        timeout=10,
+    )
+    response.raise_for_status()
+    history = response.json().get("history") or []
+    points = []
+    for point in history:
+        price = format_price(float(point.get("p") or 0))
+        if price != "none":
+            points.append((int(point["t"]), price))
+    points.sort()
+    return points
+
+
+def fetch_klines(symbol: str, start_ts: int, end_ts: int) -> list:
+    """币安 1 秒 K 线：返回 [(t, 收盘价)]，t 为 K 线结束时刻（开盘时刻 + 1 秒）"""
+    response = main.rate_limiter.request(
+        main.binance_session, "GET", klines_url(), time.time() + REQUEST_TIMEOUT,
+        params={
+            "symbol": symbol,
+            "interval": "1s",
+            "startTime": start_ts * 1000,
+            "endTime": end_ts * 1000,
+            "limit": KLINES_LIMIT,
+        },
+        timeout=10,
+    )
+    response.raise_for_status()
+    return [(int(kline[0]) // 1000 + 1, str(kline[4])) for kline in response.json()]
+
+
+def plan_requests(gaps: list, fidelity: int) -> list:
+    """生成 [(缺口, 请求函数, 参数, 本请求覆盖的缺失秒)]"""
+    tasks = []
+
+    polymarket = [gap for gap in gaps if gap.kind == "polymarket"]
+    by_cycle = {}
+    for gap in polymarket:
+        spec = main.MARKET_REGISTRY.get(gap.key)
+        for ts in gap.missing:
+            cycle_ts = cycle_start_ts(spec.interval_seconds, ts)
+            by_cycle.setdefault((id(gap), spec, cycle_ts), (gap, []))[1].append(ts)
+    markets = resolve_cycle_markets(
+        list({(spec, cycle_ts) for _, spec, cycle_ts in by_cycle}), time.time() + REQUEST_TIMEOUT,
+    ) if by_cycle else {}
+    unresolved = 0
+    for (_, spec, cycle_ts), (gap, seconds) in by_cycle.items():
+        info = markets.get((spec.key, cycle_ts))
+        if info is None:
+            unresolved += 1
+            continue
+        # 从周期起点前一个历史点开始取，保证周期内第一个缺失秒也有前值
+        args = (info["UP"], cycle_ts - fidelity * 60, cycle_ts + spec.interval_seconds, fidelity)
+        tasks.append((gap, fetch_price_history, args, seconds))
+    if unresolved:
+        print(f"[警告] {unresolved} 个市场周期未能解析 token，已跳过")
+
+    for gap in gaps:
+        if gap.kind != "binance":
+            continue
+        symbol = main.BINANCE_SYMBOLS[gap.key]
+        missing = set(gap.missing)
+        for start, end in split_runs(gap.missing, KLINES_LIMIT):
+            seconds = [ts for ts in range(start, end + 1) if ts in missing]
+            tasks.append((gap, fetch_klines, (symbol, start - 1, end - 1), seconds))
+    return tasks
+
+
+def fetch_all(tasks: list, concurrency: int, max_staleness: float):
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="backfill") as executor:
+        future_map = {executor.submit(func, *args): (gap, seconds) for gap, func, args, seconds in tasks}
+        for future in as_completed(future_map):
+            gap, seconds = future_map[future]
+            try:
+                points = future.result()
+            except Exception as ex:
+                failed += 1
+                print(f"[警告] {gap.stem} 历史数据请求失败: {str(ex)[:80]}")
+                continue
+            gap.filled.update(step_fill(points, seconds, max_staleness))
+    return failed
+
+
+# ======================== 合并落盘 ========================
+
+def merge_file(gap: SeriesGap) -> int:
+    """把补齐的价格按时间顺序合并进当天文件（替换同一秒的哨兵行），原子替换，返回写入的行数"""
+    if not gap.filled:
+        return 0
+    header, rows = read_series(gap.path)
+    if "source" not in header:
+        header = header + ["source"]
+    width = len(header)
+    invalid = invalid_prices(gap.kind)
+    tz = data_tz()
+
+    keyed = []
+    for row in rows:
+        ts = parse_time(row[0], tz)
+        if ts is not None and int(ts) in gap.filled and (len(row) < 2 or row[1] in invalid):
+            # 该秒原本是哨兵值：由补齐的行替换
+            continue
+        keyed.append((ts if ts is not None else float("-inf"), row + [""] * (width - len(row))))
+    for ts, price in gap.filled.items():
+        row = [main.format_tick_time(main.to_data_datetime(ts)), price] + [""] * (width - 2)
+        row[header.index("source")] = BACKFILL_SOURCE
+        keyed.append((float(ts), row))
+    # 稳定排序：同一时刻保持原有行在前
+    keyed.sort(key=lambda item: item[0])
+
+    os.makedirs(os.path.dirname(gap.path), exist_ok=True)
+    tmp_path = f"{gap.path}.tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(row for _, row in keyed)
+    os.replace(tmp_path, gap.path)
+    return len(gap.filled)
+
+
+def date_list(start: str, end: str | None) -> list:
+    first = datetime.strptime(start, "%Y-%m-%d")
+    last = datetime.strptime(end, "%Y-%m-%d") if end else first
+    return [(first + timedelta(days=i)).strftime("%Y-%m-%d") for i in range((last - first).days + 1)]
+
+
+def run(args):
+    today = main.get_data_now().strftime("%Y-%m-%d")
+    dates = date_list(args.start_date, args.end_date)
+    if today in dates and not args.include_today:
+        print(f"[警告] 跳过当天 {today}：采集器可能正在写入（停止采集器后加 --include-today）")
+        dates.remove(today)
+    selected = set(args.series.split(",")) if args.series else None
+
+    gaps = scan_gaps(dates, selected, args.start, args.end)
+    for gap in gaps:
+        print(f"  {os.path.basename(gap.path)}: 缺失 {len(gap.missing)} 秒")
+    if not gaps:
+        print("没有缺失的数据")
+        return
+    if args.dry_run:
+        return
+
+    started = time.perf_counter()
+    tasks = plan_requests(gaps, args.fidelity)
+    failed = fetch_all(tasks, args.concurrency, args.max_staleness)
+    total = 0
+    for gap in gaps:
+        written = merge_file(gap)
+        total += written
+        if written:
+            print(f"  ✓ {os.path.basename(gap.path)}: 补齐 {written}/{len(gap.missing)} 秒")
+    print(f"补数完成：{len(tasks)} 个请求（失败 {failed}），写入 {total} 行，"
+          f"耗时 {time.perf_counter() - started:.1f}s")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="从 CLOB / 币安历史接口补齐 data/ 中缺失的秒")
+    parser.add_argument("start_date", help="起始日期 YYYY-MM-DD（落盘时区）")
+    parser.add_argument("end_date", nargs="?", help="结束日期（含），默认与起始日期相同")
+    parser.add_argument("--series", help="逗号分隔的文件名前缀，如 BTC,BTC5MIN,BTC_BINANCE，默认全部")
+    parser.add_argument("--start", help="每天只检查该时刻之后（HH:MM:SS）")
+    parser.add_argument("--end", help="每天只检查该时刻之前（HH:MM:SS）")
+    parser.add_argument("--fidelity", type=int, default=1, help="prices-history 的粒度（分钟）")
+    parser.add_argument("--max-staleness", type=float, default=120.0,
+                        help="历史点距缺失秒的最大间隔（秒），超过则不补")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发请求数（仍受 RATE_LIMITS 限制）")
+    parser.add_argument("--include-today", action="store_true", help="同时补当天（需先停止采集器）")
+    parser.add_argument("--dry-run", action="store_true", help="只统计缺口，不请求、不写文件")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,42 @@
+"""
+币安取价延迟对比：逐币种并发（poll）vs 单次批量（batch）
+
+用法：
+    python benchmarks/bench_binance_fetch.py [轮数] [间隔秒]
+
+两种模式交替执行，避免网络状况随时间变化造成偏差。不读取仓库的 .env，币种等配置取自环境变量。
+"""
+import os
+import sys
+import time
+
+from bench_utils import format_summary, isolate_dotenv, summarize_ms
+
+os.environ["ENABLE_POLYMARKET"] = "0"
+isolate_dotenv()
+
+import main  # noqa: E402
+
+
+def run(rounds: int, interval: float):
+    samples = {"poll": [], "batch": []}
+    failures = {"poll": 0, "batch": 0}
+
+    for _ in range(rounds):
+        for mode in samples:
+            main.BINANCE_CONFIG["PRICE_MODE"] = mode
+            started = time.perf_counter()
+            prices = main.fetch_binance_prices()
+            samples[mode].append(time.perf_counter() - started)
+            failures[mode] += len(main.BINANCE_SYMBOLS) - len(prices)
+        time.sleep(interval)
+
+    print(f"币种: {', '.join(main.BINANCE_SYMBOLS.values())}  轮数: {rounds}")
+    for mode, values in samples.items():
+        print(format_summary(mode, summarize_ms(values)) + f" 失败币种次数={failures[mode]}")
+
+
+if __name__ == "__main__":
+    rounds_arg = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    interval_arg = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    run(rounds_arg, interval_arg)
@@ -0,0 +1,77 @@
+"""
+CSV 写入吞吐对比：原逐行 open/append/close 路径 vs CsvSink 常驻句柄 + 批量刷盘
+
+用法：
+    python benchmarks/bench_csv_writer.py [每个序列的行数]
+
+模拟 main_loop 每秒 12 个序列（8 个 Polymarket + 4 个币安）的写入模式，写入临时目录。
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import bench_utils  # noqa: F401  (设置 sys.path)
+from csv_writer import CsvSink
+
+SERIES = ["BTC", "ETH", "SOL", "XRP", "BTC5MIN", "ETH5MIN", "SOL5MIN", "XRP5MIN",
+          "BTC_BINANCE", "ETH_BINANCE", "SOL_BINANCE", "XRP_BINANCE"]
+
+
+def legacy_save(base_dir: str, stem: str, current_datetime: datetime, price_str: str):
+    """原 save_to_csv / save_binance_to_csv 的写入路径"""
+    timestamp = current_datetime.strftime('%Y-%m-%d %H:%M:%S')
+    date_str = current_datetime.strftime('%Y-%m-%d')
+    data_dir = os.path.join(base_dir, date_str[:7], date_str)
+    os.makedirs(data_dir, exist_ok=True)
+    file_path = os.path.join(data_dir, f"{stem}_{date_str}.csv")
+    file_exists = os.path.exists(file_path)
+    with open(file_path, 'a', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        if not file_exists:
+            writer.writerow(['time', 'price'])
+        writer.writerow([timestamp, price_str])
+
+
+def run_legacy(base_dir: str, ticks: int) -> float:
+    start_dt = datetime(2026, 1, 1, 23, 0, 0)
+    started = time.perf_counter()
+    for i in range(ticks):
+        current_datetime = start_dt + timedelta(seconds=i)
+        for stem in SERIES:
+            legacy_save(base_dir, stem, current_datetime, "0.51")
+    return time.perf_counter() - started
+
+
+def run_sink(base_dir: str, ticks: int) -> float:
+    start_dt = datetime(2026, 1, 1, 23, 0, 0)
+    sink = CsvSink(base_dir)
+    started = time.perf_counter()
+    for i in range(ticks):
+        current_datetime = start_dt + timedelta(seconds=i)
+        timestamp = current_datetime.strftime('%Y-%m-%d %H:%M:%S')
+        for stem in SERIES:
+            sink.write_row(stem, current_datetime, [timestamp, "0.51"], ['time', 'price'])
+    sink.close()
+    return time.perf_counter() - started
+
+
+def count_rows(base_dir: str) -> int:
+    total = 0
+    for root, _, files in os.walk(base_dir):
+        for name in files:
+            with open(os.path.join(root, name), encoding='utf-8') as f:
+                total += sum(1 for _ in f) - 1
+    return total
+
+
+if __name__ == "__main__":
+    ticks_arg = int(sys.argv[1]) if len(sys.argv) > 1 else 7200
+    for name, runner in (("legacy", run_legacy), ("CsvSink", run_sink)):
+        with tempfile.TemporaryDirectory() as tmp:
+            elapsed = runner(tmp, ticks_arg)
+            rows = count_rows(tmp)
+        # 起点为 23:00，7200 个周期会跨过零点，覆盖轮转路径
+        print(f"{name:<8} rows={rows:<7} elapsed={elapsed:7.3f}s  throughput={rows / elapsed:10.0f} rows/s")
@@ -0,0 +1,95 @@
+"""
+周期边界计算：原逐次 pytz 计算 vs 预计算周期日历
+
+用法：
+    python benchmarks/bench_cycle_calendar.py [每个函数的调用次数]
+
+先在夏令时切换日及普通日上逐分钟核对两种实现的 5/15 分钟周期起点一致，再对比单次调用耗时。
+"""
+import math
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+import bench_utils  # noqa: F401  (设置 sys.path)
+from cycle_calendar import ET_TZ, INTERVALS, cycle_start_ts, next_cycle_start_ts
+
+
+def legacy_cycle_start_ts(minutes: int, offset_minutes: int = 0, now_ts: float | None = None) -> int:
+    """原 crypto15.get_5m_cycle_start_ts / get_15m_cycle_start_ts 的实现（可指定当前时间）"""
+    utc_now = datetime.now(pytz.utc) if now_ts is None else datetime.fromtimestamp(now_ts, pytz.utc)
+    et_tz = pytz.timezone("America/New_York")
+    et_now = utc_now.astimezone(et_tz)
+    et_midnight = et_now.replace(hour=0, minute=0, second=0, microsecond=0)
+    minutes_since_midnight = (et_now - et_midnight).total_seconds() / 60
+    cycle_index = math.floor(minutes_since_midnight / minutes)
+    cycle_start_et = et_midnight + timedelta(minutes=cycle_index * minutes)
+    adjusted = cycle_start_et + timedelta(minutes=offset_minutes)
+    return int(adjusted.astimezone(pytz.utc).timestamp())
+
+
+def legacy_next_cycle_start(minutes: int):
+    """原 main.get_next_cycle_start / get_next_5m_cycle_start 的实现"""
+    et_tz = pytz.timezone("America/New_York")
+    now_et = datetime.now(et_tz)
+    minutes_since_midnight = now_et.hour * 60 + now_et.minute
+    current_cycle = minutes_since_midnight // minutes
+    next_cycle_start_minutes = (current_cycle + 1) * minutes
+    next_cycle_start = now_et.replace(
+        hour=next_cycle_start_minutes // 60,  # 23:45 之后为 24，会抛出 ValueError
+        minute=next_cycle_start_minutes % 60,
+        second=0,
+        microsecond=0,
+    )
+    if next_cycle_start <= now_et:
+        next_cycle_start += timedelta(days=1)
+    return next_cycle_start
+
+
+def verify():
+    days = ["2026-03-08", "2026-11-01", "2026-10-17"]  # 春季切换、秋季切换、普通日
+    checked = 0
+    for day in days:
+        start = int(ET_TZ.localize(datetime.strptime(day, "%Y-%m-%d")).timestamp())
+        for ts in range(start, start + 26 * 3600, 37):
+            for minutes in (5, 15):
+                expected = legacy_cycle_start_ts(minutes, 0, ts)
+                actual = cycle_start_ts(minutes * 60, ts)
+                if expected != actual:
+                    raise AssertionError(f"{day} ts={ts} {minutes}m: legacy={expected} calendar={actual}")
+                checked += 1
+    print(f"核对通过：{checked} 个时刻（含夏令时切换日）")
+
+    for interval_name in ("1h", "4h", "1d"):
+        for day in days[:2]:
+            noon = ET_TZ.localize(datetime.strptime(day, "%Y-%m-%d").replace(hour=12)).timestamp()
+            starts = [datetime.fromtimestamp(cycle_start_ts(INTERVALS[interval_name], noon, k), ET_TZ).strftime('%m-%d %H:%M%z')
+                      for k in range(-4, 1)]
+            print(f"  {day} {interval_name:<3} 最近 5 个周期起点: {', '.join(starts)}")
+
+
+def bench(n: int):
+    cases = [
+        ("legacy 15m cycle_start", lambda: legacy_cycle_start_ts(15)),
+        ("calendar 15m cycle_start", lambda: cycle_start_ts(900)),
+        ("legacy next_cycle_start", lambda: legacy_next_cycle_start(15)),
+        ("calendar next_cycle_start", lambda: next_cycle_start_ts(900)),
+    ]
+    for name, func in cases:
+        try:
+            func()
+        except ValueError as ex:
+            print(f"{name:<28} 当前时刻调用失败: {ex}")
+            continue
+        started = time.perf_counter()
+        for _ in range(n):
+            func()
+        elapsed = time.perf_counter() - started
+        print(f"{name:<28} {elapsed / n * 1e6:8.2f} us/call")
+
+
+if __name__ == "__main__":
+    verify()
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,155 @@
+"""
+启动耗时：各采集开关组合下 import main 的耗时分解（-X importtime）与进程启动到首个采样的墙钟时间
+
+用法：
+    python benchmarks/bench_startup.py [每个组合的运行次数]
+
+组合为 ENABLE_POLYMARKET × ENABLE_BINANCE（不含全部关闭）× COLLECTOR_ENGINE。
+首个采样通过 COLLECTOR_MAX_TICKS=1 运行 main.py 测得，数据与状态文件写入临时目录；
+启用 Polymarket 但未配置密钥时会自动关闭 Polymarket（输出中标注），首个采样需要网络访问。
+
+子进程不读取仓库的 .env（main 以 override=True 加载，会覆盖各组合的开关与临时状态文件），
+.env 中的密钥等配置由本脚本读出作为环境变量的默认值传入；dotenv 因此在 import main 之前导入，不计入分解。
+"""
+import itertools
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from dotenv import dotenv_values
+
+from bench_utils import ROOT_DIR
+
+MAIN_PATH = os.path.join(ROOT_DIR, "main.py")
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIRST_TICK_MARK = "首个采样完成"
+# 每个组合打印的最耗时的直接依赖数量
+TOP_IMPORTS = 5
+RUN_TIMEOUT = 120
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def combinations() -> list:
+    combos = []
+    for polymarket, binance, engine in itertools.product(("1", "0"), ("1", "0"), ("thread", "asyncio")):
+        if polymarket == "0" and binance == "0":
+            continue
+        combos.append({"ENABLE_POLYMARKET": polymarket, "ENABLE_BINANCE": binance, "COLLECTOR_ENGINE": engine})
+    return combos
+
+
+def combo_env(combo: dict, work_dir: str) -> dict:
+    """仓库 .env 作为默认值，当前环境变量次之，组合开关与临时状态文件优先"""
+    dotenv_path = os.path.join(ROOT_DIR, ".env")
+    env = {}
+    if os.path.exists(dotenv_path):
+        env = {key: value for key, value in dotenv_values(dotenv_path).items() if value is not None}
+    env.update(os.environ)
+    env.update(combo)
+    env["COLLECTOR_MAX_TICKS"] = "1"
+    env["COLLECTOR_STATE_FILE"] = os.path.join(work_dir, "state.json")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def child_code(body: str) -> str:
+    """子进程入口：先让 main 的 load_dotenv 失效（配置只来自 combo_env），再执行 body"""
+    return (f"import sys; sys.path[:0] = [{ROOT_DIR!r}, {BENCH_DIR!r}]; "
+            f"from bench_utils import isolate_dotenv; isolate_dotenv(); {body}")
+
+
+def import_breakdown(env: dict, work_dir: str) -> tuple:
+    """返回 (import main 的累计耗时秒数, [(模块, 累计耗时秒数)] main 直接导入的模块按耗时降序)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", child_code("import main")],
+        env=env, cwd=work_dir, capture_output=True, text=True, timeout=RUN_TIMEOUT,
+    )
+    total = 0.0
+    children = []
+    pending = []
+    # importtime 按导入完成顺序输出：子模块先于父模块，缩进每深一层多两格（顶层为 1 格）
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        seconds, indent, name = int(match.group(2)) / 1e6, len(match.group(3)), match.group(4)
+        if indent == 3:
+            pending.append((name, seconds))
+        elif indent == 1:
+            if name == "main":
+                total, children = seconds, pending
+            pending = []
+    return total, sorted(children, key=lambda item: item[1], reverse=True)
+
+
+def time_to_first_tick(env: dict, work_dir: str) -> tuple:
+    """返回 (墙钟秒数, 进程自报的毫秒数, Polymarket 是否被自动关闭)；未采到首个样本时墙钟为 None"""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-u", "-c", child_code(f"import runpy; runpy.run_path({MAIN_PATH!r}, run_name='__main__')")],
+        env=env, cwd=work_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    wall = None
+    reported = None
+    polymarket_disabled = False
+    try:
+        for line in process.stdout:
+            if "已自动关闭 Polymarket 采集" in line:
+                polymarket_disabled = True
+            if wall is None and FIRST_TICK_MARK in line:
+                wall = time.perf_counter() - started
+                match = re.search(r"(\d+)ms", line)
+                reported = float(match.group(1)) if match else None
+        process.wait(timeout=RUN_TIMEOUT)
+    finally:
+        if process.poll() is None:
+            process.kill()
+    return wall, reported, polymarket_disabled
+
+
+def describe(combo: dict) -> str:
+    return (f"polymarket={combo['ENABLE_POLYMARKET']} binance={combo['ENABLE_BINANCE']} "
+            f"engine={combo['COLLECTOR_ENGINE']}")
+
+
+def run(runs: int):
+    for combo in combinations():
+        import_totals = []
+        first_ticks = []
+        reported = []
+        breakdown = []
+        disabled = False
+        for _ in range(runs):
+            with tempfile.TemporaryDirectory(prefix="bench_startup_") as work_dir:
+                env = combo_env(combo, work_dir)
+                total, children = import_breakdown(env, work_dir)
+                import_totals.append(total)
+                breakdown = children
+                wall, self_reported, polymarket_disabled = time_to_first_tick(env, work_dir)
+                disabled = disabled or polymarket_disabled
+                if wall is not None:
+                    first_ticks.append(wall)
+                if self_reported is not None:
+                    reported.append(self_reported)
+
+        note = "（未配置密钥，Polymarket 已自动关闭）" if disabled else ""
+        print(f"{describe(combo)}{note}")
+        print(f"    import main: 中位数 {statistics.median(import_totals) * 1000:8.1f}ms")
+        for name, seconds in breakdown[:TOP_IMPORTS]:
+            print(f"        {name:<28} {seconds * 1000:8.1f}ms")
+        if first_ticks:
+            print(f"    首个采样: 墙钟中位数 {statistics.median(first_ticks) * 1000:8.1f}ms，"
+                  f"进程自报中位数 {statistics.median(reported) if reported else 0:8.1f}ms "
+                  f"（{len(first_ticks)}/{runs} 次成功）")
+        else:
+            print("    首个采样: 未完成")
+
+
+if __name__ == "__main__":
+    runs_arg = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    run(runs_arg)
@@ -0,0 +1,45 @@
+import os
+import statistics
+import sys
+
+# 让 benchmarks/ 下的脚本可以直接 import 项目根目录的模块
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+def isolate_dotenv():
+    """
+    在 import main 之前调用：让 main 的 load_dotenv 不读取仓库的 .env，
+    配置完全来自当前进程的环境变量（否则 .env 会以 override=True 覆盖基准测试设置的开关）
+    """
+    import dotenv
+    dotenv.load_dotenv = lambda *a, **k: False
+
+
+def percentile(samples: list, pct: float) -> float:
+    """线性插值分位数，samples 为空时返回 0"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * pct / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def summarize_ms(samples_seconds: list) -> dict:
+    """把秒级耗时样本汇总为毫秒统计"""
+    samples = [s * 1000 for s in samples_seconds]
+    return {
+        "n": len(samples),
+        "mean": statistics.fmean(samples) if samples else 0.0,
+        "p50": percentile(samples, 50),
+        "p99": percentile(samples, 99),
+        "max": max(samples) if samples else 0.0,
+    }
+
+
+def format_summary(name: str, summary: dict) -> str:
+    return (f"{name:<24} n={summary['n']:<5} mean={summary['mean']:8.2f}ms "
+            f"p50={summary['p50']:8.2f}ms p99={summary['p99']:8.2f}ms max={summary['max']:8.2f}ms")
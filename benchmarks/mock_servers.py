@@ -0,0 +1,307 @@
+"""
+本地模拟服务：Gamma /markets、CLOB /midpoint /book /books /prices-history、币安 /api/v3/ticker/price /api/v3/klines
+
+每个服务一个端口，延迟、抖动、错误率与 429 行为可配置；同一 seed 下响应内容与故障注入序列可复现
+（并发请求的先后顺序仍会影响故障落在哪个请求上）。
+
+单独运行时启动三个服务并打印地址，便于手动运行 main.py：
+    python benchmarks/mock_servers.py [--latency-ms 20] [--error-rate 0.01] ...
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class MockBehavior:
+    """单个模拟服务的响应特性"""
+
+    latency_ms: float = 20.0       # 基础延迟
+    jitter_ms: float = 5.0         # 延迟的随机抖动（均匀分布，±jitter）
+    error_rate: float = 0.0        # 返回 500 的概率
+    throttle_rate: float = 0.0     # 返回 429 的概率
+    retry_after: float = 0.5       # 429 响应的 Retry-After 秒数
+    seed: int = 0
+
+
+def stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "big")
+
+
+def token_ids_for_slug(slug: str) -> list:
+    """slug 对应的 Up/Down token（确定性生成，与真实 token 一样是长十进制数字串）"""
+    base = stable_hash(slug)
+    return [str(base * 10 + 1), str(base * 10 + 2)]
+
+
+def mock_mid(key: str, now: float) -> float:
+    """token 或交易对在 now 时刻的模拟中间价：围绕固定基准缓慢波动"""
+    base = 0.2 + (stable_hash(key) % 600) / 1000
+    return round(base + 0.05 * math.sin(now / 30 + stable_hash(key) % 7), 3)
+
+
+class MockServer:
+    """在后台线程运行的 ThreadingHTTPServer；子类实现 route(method, path, query, body)"""
+
+    name = "mock"
+
+    def __init__(self, behavior: MockBehavior | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.behavior = behavior or MockBehavior()
+        self._rng = random.Random(self.behavior.seed)
+        self._rng_lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0}
+        self._stats_lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server._handle(self, "GET")
+
+            def do_POST(self):
+                server._handle(self, "POST")
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name=f"{self.name}-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def route(self, method: str, path: str, query: dict, body) -> tuple:
+        """返回 (状态码, JSON 可序列化的内容)"""
+        raise NotImplementedError
+
+    # ------------------------ 内部实现 ------------------------
+
+    def _draw(self) -> tuple:
+        behavior = self.behavior
+        with self._rng_lock:
+            delay = behavior.latency_ms + self._rng.uniform(-behavior.jitter_ms, behavior.jitter_ms)
+            fault = self._rng.random()
+        if fault < behavior.throttle_rate:
+            outcome = 429
+        elif fault < behavior.throttle_rate + behavior.error_rate:
+            outcome = 500
+        else:
+            outcome = None
+        return max(0.0, delay) / 1000, outcome
+
+    def _handle(self, handler: BaseHTTPRequestHandler, method: str):
+        delay, fault = self._draw()
+        length = int(handler.headers.get("Content-Length") or 0)
+        raw_body = handler.rfile.read(length) if length else b""
+        if delay:
+            time.sleep(delay)
+
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            if fault == 429:
+                self.stats["throttled"] += 1
+            elif fault == 500:
+                self.stats["errors"] += 1
+
+        headers = {}
+        if fault == 429:
+            status, payload = 429, {"error": "rate limited"}
+            headers["Retry-After"] = f"{self.behavior.retry_after:g}"
+        elif fault == 500:
+            status, payload = 500, {"error": "internal error"}
+        else:
+            parsed = urlparse(handler.path)
+            try:
+                body = json.loads(raw_body) if raw_body else None
+            except ValueError:
+                body = None
+            status, payload = self.route(method, parsed.path, parse_qs(parsed.query), body)
+
+        data = json.dumps(payload).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+
+class GammaMock(MockServer):
+    """Gamma /markets：任意 slug 都返回一个开放中的 Up/Down 市场"""
+
+    name = "gamma"
+
+    def route(self, method, path, query, body):
+        if path != "/markets":
+            return 404, {"error": "not found"}
+        return 200, [
+            {
+                "slug": slug,
+                "question": slug,
+                "closed": False,
+                "outcomes": json.dumps(["Up", "Down"]),
+                "clobTokenIds": json.dumps(token_ids_for_slug(slug)),
+            }
+            for slug in query.get("slug", [])
+        ]
+
+
+class ClobMock(MockServer):
+    """CLOB /midpoint、/book、批量 /books 与 /prices-history"""
+
+    name = "clob"
+    levels = 10
+
+    def book(self, token_id: str) -> dict:
+        mid = mock_mid(token_id, time.time())
+        step = 0.01
+        return {
+            "market": "0x" + hashlib.sha1(token_id.encode("utf-8")).hexdigest(),
+            "asset_id": token_id,
+            "timestamp": str(int(time.time() * 1000)),
+            "hash": "",
+            "min_order_size": "5",
+            "tick_size": "0.01",
+            "neg_risk": False,
+            "last_trade_price": f"{mid:.3f}",
+            "bids": [{"price": f"{mid - step * (i + 1):.3f}", "size": f"{100 + 10 * i}"} for i in range(self.levels)],
+            "asks": [{"price": f"{mid + step * (i + 1):.3f}", "size": f"{100 + 10 * i}"} for i in range(self.levels)],
+        }
+
+    def route(self, method, path, query, body):
+        if path == "/midpoint":
+            token_id = (query.get("token_id") or [""])[0]
+            return 200, {"mid": f"{mock_mid(token_id, time.time()):.3f}"}
+        if path == "/book":
+            return 200, self.book((query.get("token_id") or [""])[0])
+        if path == "/books" and method == "POST":
+            return 200, [self.book(item.get("token_id", "")) for item in body or []]
+        if path == "/prices-history":
+            token_id = (query.get("market") or [""])[0]
+            start = int((query.get("startTs") or ["0"])[0])
+            end = int((query.get("endTs") or ["0"])[0])
+            step = int((query.get("fidelity") or ["1"])[0]) * 60
+            # 与 /midpoint 同一条价格曲线，按 fidelity 分钟取点
+            first = (start + step - 1) // step * step
+            return 200, {"history": [{"t": t, "p": mock_mid(token_id, t)} for t in range(first, end + 1, step)]}
+        return 404, {"error": "not found"}
+
+
+class BinanceMock(MockServer):
+    """币安 /api/v3/ticker/price（单个 symbol 或 symbols 批量）与 1 秒 /api/v3/klines"""
+
+    name = "binance"
+
+    def route(self, method, path, query, body):
+        if path == "/api/v3/klines":
+            symbol = (query.get("symbol") or [""])[0]
+            start = int((query.get("startTime") or ["0"])[0]) // 1000
+            end = int((query.get("endTime") or ["0"])[0]) // 1000
+            limit = int((query.get("limit") or ["500"])[0])
+            klines = []
+            for t in range(start, min(end, start + limit - 1) + 1):
+                open_price, close_price = mock_mid(symbol, t) * 1000, mock_mid(symbol, t + 1) * 1000
+                prices = [f"{p:.2f}" for p in (open_price, max(open_price, close_price),
+                                                min(open_price, close_price), close_price)]
+                klines.append([t * 1000, *prices, "1.0", t * 1000 + 999, "0", 1, "0", "0", "0"])
+            return 200, klines
+        if path != "/api/v3/ticker/price":
+            return 404, {"error": "not found"}
+        now = time.time()
+        if "symbols" in query:
+            symbols = json.loads(query["symbols"][0])
+            return 200, [{"symbol": s, "price": f"{mock_mid(s, now) * 1000:.2f}"} for s in symbols]
+        symbol = (query.get("symbol") or [""])[0]
+        return 200, {"symbol": symbol, "price": f"{mock_mid(symbol, now) * 1000:.2f}"}
+
+
+class MockServers:
+    """同时启动三个模拟服务，并给出对应的环境变量（GAMMA_MARKETS_URL / CLOB_API_URL / BINANCE_API_URL）"""
+
+    def __init__(self, behavior: MockBehavior | None = None, **overrides: MockBehavior):
+        behavior = behavior or MockBehavior()
+        # 各服务使用不同的种子，避免三个服务的故障注入序列完全同步
+        self.gamma = GammaMock(overrides.get("gamma", replace(behavior, seed=behavior.seed)))
+        self.clob = ClobMock(overrides.get("clob", replace(behavior, seed=behavior.seed + 1)))
+        self.binance = BinanceMock(overrides.get("binance", replace(behavior, seed=behavior.seed + 2)))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        for server in (self.gamma, self.clob, self.binance):
+            server.start()
+        return self
+
+    def stop(self):
+        for server in (self.gamma, self.clob, self.binance):
+            server.stop()
+
+    def env(self) -> dict:
+        return {
+            "GAMMA_MARKETS_URL": f"{self.gamma.url}/markets",
+            "CLOB_API_URL": self.clob.url,
+            "BINANCE_API_URL": f"{self.binance.url}/api/v3/ticker/price",
+        }
+
+    def stats(self) -> dict:
+        return {server.name: dict(server.stats) for server in (self.gamma, self.clob, self.binance)}
+
+
+def add_behavior_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="模拟服务基础延迟（毫秒）")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="延迟抖动（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的概率")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="返回 429 的概率")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="429 响应的 Retry-After 秒数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+
+
+def behavior_from_args(args) -> MockBehavior:
+    return MockBehavior(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="启动本地模拟的 Gamma / CLOB / 币安服务")
+    add_behavior_arguments(arg_parser)
+    servers = MockServers(behavior_from_args(arg_parser.parse_args())).start()
+    for name, value in servers.env().items():
+        print(f"{name}={value}")
+    print("Ctrl + C 停止")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        servers.stop()
@@ -0,0 +1,187 @@
+"""
+本地 WebSocket 替身服务（只用标准库，支持 RFC 6455 文本帧、ping/pong 与关闭），
+用于离线测试 Polymarket market 频道与币安组合流的订阅、增量订阅与断线重连
+
+    server = MockWebSocketServer(on_message=handler).start()
+    stream = PolymarketMarketStream(server.url)
+    ...
+    server.broadcast(json.dumps({...}))    # 向所有连接推送
+    server.drop_clients()                  # 模拟服务端断开
+"""
+import base64
+import hashlib
+import socket
+import struct
+import threading
+import time
+from typing import Callable, Optional
+
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class MockConnection:
+    """一个客户端连接：path 为握手时的请求路径（含查询参数），received 为收到的文本消息"""
+
+    def __init__(self, server, sock: socket.socket, path: str):
+        self.server = server
+        self.sock = sock
+        self.path = path
+        self.received: list = []
+        self.closed = False
+        self._send_lock = threading.Lock()
+
+    def send(self, text: str):
+        self._send_frame(0x1, text.encode("utf-8"))
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._send_frame(0x8, struct.pack("!H", 1000))
+        except OSError:
+            pass
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def _send_frame(self, opcode: int, payload: bytes):
+        # 服务端发出的帧不加掩码
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        with self._send_lock:
+            self.sock.sendall(header + payload)
+
+    def _recv_exact(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("客户端已断开")
+            data += chunk
+        return data
+
+    def serve(self):
+        try:
+            while not self.closed:
+                first, second = self._recv_exact(2)
+                opcode = first & 0x0F
+                length = second & 0x7F
+                if length == 126:
+                    length = struct.unpack("!H", self._recv_exact(2))[0]
+                elif length == 127:
+                    length = struct.unpack("!Q", self._recv_exact(8))[0]
+                mask = self._recv_exact(4) if second & 0x80 else b"\0\0\0\0"
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self._recv_exact(length)))
+                if opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    self._send_frame(0xA, payload)
+                    continue
+                if opcode == 0x1:
+                    text = payload.decode("utf-8")
+                    self.received.append(text)
+                    if self.server.on_message is not None:
+                        self.server.on_message(self, text)
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            self.close()
+
+
+class MockWebSocketServer:
+    """在后台线程接受 WebSocket 连接；on_message(连接, 文本) 在连接线程中调用，可直接回复"""
+
+    def __init__(self, on_message: Optional[Callable[[MockConnection, str], None]] = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.on_message = on_message
+        self.connections: list = []
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen(16)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._sock.getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._accept_loop, name="mock-ws", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.drop_clients()
+        self._sock.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def active(self) -> list:
+        return [conn for conn in self.connections if not conn.closed]
+
+    def broadcast(self, text: str):
+        for conn in self.active():
+            try:
+                conn.send(text)
+            except OSError:
+                pass
+
+    def drop_clients(self):
+        for conn in self.active():
+            conn.close()
+
+    def wait_for(self, predicate: Callable[[], bool], timeout: float = 5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if predicate():
+                return True
+            time.sleep(0.01)
+        return predicate()
+
+    # ------------------------ 内部实现 ------------------------
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                sock, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handshake, args=(sock,), name="mock-ws-conn", daemon=True).start()
+
+    def _handshake(self, sock: socket.socket):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = sock.recv(4096)
+            if not chunk:
+                sock.close()
+                return
+            request += chunk
+        lines = request.split(b"\r\n\r\n", 1)[0].decode("latin-1").split("\r\n")
+        path = lines[0].split(" ")[1]
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        accept = base64.b64encode(hashlib.sha1((headers.get("sec-websocket-key", "") + _GUID).encode()).digest())
+        sock.sendall(
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+        conn = MockConnection(self, sock, path)
+        self.connections.append(conn)
+        conn.serve()
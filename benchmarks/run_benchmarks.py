@@ -0,0 +1,218 @@
+"""
+离线基准测试：用本地模拟的 Gamma / CLOB / 币安服务驱动采集器，按市场数量分别测量
+
+用法：
+    python benchmarks/run_benchmarks.py [--markets 8,64,256] [--ticks 30] [--latency-ms 20] [--output 结果.json]
+
+每个市场数量在独立子进程中运行（CPU / RSS 互不干扰，模块级配置按该市场数量重新加载），依次测量：
+  1) token 刷新：update_registry_token_ids 解析全部市场的耗时
+  2) 取价：fetch_polymarket_prices 的 p50 / p99
+  3) 写盘：write_rows 经 CsvSink 的写入能力（rows/s）
+  4) 主循环：main_loop 运行 --ticks 个周期的调度延迟、单周期耗时、每个市场的 CPU 与 RSS
+
+模拟服务的延迟、错误率与 429 均由 seed 决定，同样的参数重复运行结果可比，--output 保存的 JSON
+可用于跟踪市场数量增加时的性能回退。子进程不读取仓库的 .env，数据写入临时目录。
+"""
+import argparse
+import contextlib
+import csv
+import glob
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+from bench_utils import isolate_dotenv, percentile, summarize_ms
+from mock_servers import MockServers, add_behavior_arguments, behavior_from_args
+
+RESULT_PREFIX = "BENCH_RESULT "
+# 写盘能力测试写入的周期数，日期固定在过去，避免与主循环的数据混在同一天
+WRITER_CYCLES = 300
+WRITER_START = "2000-01-01 00:00:00"
+
+
+def registry_config(market_count: int) -> dict:
+    """生成 market_count 个市场的注册表：每个合成资产依次对应 15m 与 5m 两个市场和一个币安交易对"""
+    markets = [
+        {"asset": f"A{i // 2:03d}", "interval": "15m" if i % 2 == 0 else "5m"}
+        for i in range(market_count)
+    ]
+    assets = {entry["asset"]: {"binance_symbol": f"{entry['asset']}USDT"} for entry in markets}
+    return {"assets": assets, "markets": markets}
+
+
+# ======================== 子进程：单个市场数量 ========================
+
+def run_child(args):
+    # 隔离仓库 .env：配置完全来自父进程传入的环境变量
+    isolate_dotenv()
+
+    import main
+    from py_clob_client.client import ClobClient
+
+    quiet = io.StringIO()
+    markets = len(main.MARKET_TOKEN_IDS)
+    # 只访问公开接口，不需要私钥与 API 凭证
+    main.client = ClobClient(main.CLOB_API)
+    result = {"markets": markets, "binance_symbols": len(main.BINANCE_SYMBOLS)}
+
+    # 1) token 刷新
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(quiet):
+        main.update_registry_token_ids(main.MARKET_TOKEN_IDS, main.MARKET_REGISTRY)
+    result["refresh_ms"] = (time.perf_counter() - started) * 1000
+    result["resolved"] = sum(1 for tokens in main.MARKET_TOKEN_IDS.values() if tokens["UP"] != "none")
+
+    # 2) 取价
+    samples = []
+    for _ in range(args.fetch_rounds):
+        main._tick_deadline = time.time() + main.COLLECTION_CONFIG["SAMPLE_PERIOD"]
+        started = time.perf_counter()
+        prices = main.fetch_polymarket_prices()
+        samples.append(time.perf_counter() - started)
+    result["fetch"] = summarize_ms(samples)
+    result["fetch_none"] = sum(1 for price in prices.values() if price == "none")
+
+    # 3) 写盘能力：与主循环相同的行结构，直接同步调用 write_rows
+    base = main.to_data_datetime(time.mktime(time.strptime(WRITER_START, "%Y-%m-%d %H:%M:%S")))
+    rows = [("polymarket", coin, "0.50") for coin in main.MARKET_TOKEN_IDS]
+    rows += [("binance", coin, "100.00") for coin in main.BINANCE_SYMBOLS]
+    started = time.perf_counter()
+    for i in range(WRITER_CYCLES):
+        main.write_rows((base + timedelta(seconds=i), rows))
+    main.csv_sink.flush()
+    result["writer_rows_per_s"] = WRITER_CYCLES * len(rows) / (time.perf_counter() - started)
+
+    # 4) 主循环
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(quiet):
+        main.background_writer.start()
+        main.main_loop()
+        main.shutdown_writers()
+    elapsed = time.perf_counter() - started
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+
+    lags, latencies, missed = [], [], 0
+    for path in glob.glob(os.path.join("data", "*", "*", "TICKS_*.csv")):
+        if WRITER_START[:10] in path:
+            continue
+        with open(path, encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                lags.append(float(row["lag_ms"]))
+                latencies.append(float(row["response_ms"]))
+                missed += int(row["missed"])
+    ticks = len(lags)
+    result["ticks"] = ticks
+    result["missed"] = missed
+    result["lag_p50_ms"] = percentile(lags, 50)
+    result["lag_p99_ms"] = percentile(lags, 99)
+    result["tick_p50_ms"] = percentile(latencies, 50)
+    result["tick_p99_ms"] = percentile(latencies, 99)
+    result["loop_rows_per_s"] = ticks * (markets + len(main.BINANCE_SYMBOLS)) / elapsed if elapsed else 0.0
+    result["cpu_ms_per_market_tick"] = cpu * 1000 / max(1, ticks * markets)
+    # ru_maxrss 在 Linux 上单位为 KB
+    result["rss_mb"] = usage_after.ru_maxrss / 1024
+    result["rss_kb_per_market"] = usage_after.ru_maxrss / markets
+    result["limiter"] = main.rate_limiter.stats()
+
+    print(RESULT_PREFIX + json.dumps(result, ensure_ascii=False))
+
+
+# ======================== 父进程：启动模拟服务并逐个市场数量运行 ========================
+
+def child_env(args, servers: MockServers, registry_path: str, work_dir: str) -> dict:
+    env = dict(os.environ, **servers.env())
+    env.update({
+        "MARKET_REGISTRY_FILE": registry_path,
+        "ENABLE_POLYMARKET": "1",
+        "ENABLE_BINANCE": "1",
+        "POLYMARKET_PRICE_MODE": args.polymarket_mode,
+        "BINANCE_PRICE_MODE": args.binance_mode,
+        "COLLECTOR_ENGINE": args.engine,
+        "SAMPLE_PERIOD_SECONDS": str(args.period),
+        "COLLECTOR_MAX_TICKS": str(args.ticks),
+        "COLLECTOR_STATE_FILE": os.path.join(work_dir, "state.json"),
+        "ENABLE_WARM_START": "0",
+        "ENABLE_DEPTH_CAPTURE": "0",
+        "ENABLE_PARQUET_SINK": "0",
+        # 模拟服务都在 127.0.0.1 上：限流预算放宽，只测采集器本身
+        "RATE_LIMITS": f"127.0.0.1={args.host_rate:g}:{int(args.host_rate)}",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    return env
+
+
+def format_result(result: dict) -> str:
+    fetch = result["fetch"]
+    return (
+        f"markets={result['markets']:<5} 解析 {result['resolved']}/{result['markets']} "
+        f"刷新 {result['refresh_ms']:8.1f}ms | 取价 p50 {fetch['p50']:7.1f}ms p99 {fetch['p99']:7.1f}ms | "
+        f"调度延迟 p50 {result['lag_p50_ms']:6.1f}ms p99 {result['lag_p99_ms']:6.1f}ms "
+        f"单周期 p50 {result['tick_p50_ms']:7.1f}ms p99 {result['tick_p99_ms']:7.1f}ms "
+        f"跳过 {result['missed']} | 写盘 {result['writer_rows_per_s']:9.0f} rows/s | "
+        f"CPU {result['cpu_ms_per_market_tick']:.3f}ms/市场/周期 RSS {result['rss_mb']:.1f}MB "
+        f"({result['rss_kb_per_market']:.0f}KB/市场)"
+    )
+
+
+def run(args):
+    results = []
+    with MockServers(behavior_from_args(args)) as servers:
+        for market_count in args.markets:
+            with tempfile.TemporaryDirectory(prefix="bench_run_") as work_dir:
+                registry_path = os.path.join(work_dir, "markets.json")
+                with open(registry_path, "w", encoding="utf-8") as f:
+                    json.dump(registry_config(market_count), f)
+
+                completed = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--child", "--fetch-rounds", str(args.fetch_rounds)],
+                    env=child_env(args, servers, registry_path, work_dir), cwd=work_dir,
+                    capture_output=True, text=True,
+                )
+                lines = [line for line in completed.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+                if completed.returncode != 0 or not lines:
+                    print(f"markets={market_count} 运行失败:\n{completed.stderr[-2000:]}")
+                    continue
+                result = json.loads(lines[-1][len(RESULT_PREFIX):])
+                results.append(result)
+                print(format_result(result))
+
+        print(f"模拟服务请求统计: {servers.stats()}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items() if k != "output"}, "results": results},
+                      f, ensure_ascii=False, indent=1)
+        print(f"结果已写入 {args.output}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="离线基准测试（本地模拟 Gamma / CLOB / 币安）")
+    parser.add_argument("--markets", type=lambda v: [int(x) for x in v.split(",") if x],
+                        default=[8, 64, 256], help="逗号分隔的市场数量，默认 8,64,256")
+    parser.add_argument("--ticks", type=int, default=30, help="每个市场数量运行的主循环周期数")
+    parser.add_argument("--period", type=float, default=1.0, help="采样周期（秒）")
+    parser.add_argument("--fetch-rounds", type=int, default=20, help="单独测量取价的轮数")
+    parser.add_argument("--polymarket-mode", default="bulk", choices=["poll", "bulk"])
+    parser.add_argument("--binance-mode", default="batch", choices=["poll", "batch"])
+    parser.add_argument("--engine", default="thread", choices=["thread", "asyncio"])
+    parser.add_argument("--host-rate", type=float, default=10000, help="模拟服务主机的每秒请求预算")
+    parser.add_argument("--output", help="把参数与结果保存为 JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    add_behavior_arguments(parser)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    parsed = parse_args()
+    if parsed.child:
+        run_child(parsed)
+    else:
+        run(parsed)
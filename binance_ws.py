@@ -0,0 +1,215 @@
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+import websocket
+
+# 币安现货组合流地址
+BINANCE_WS_URL = "wss://stream.binance.com:9443/stream"
+
+
+class BinanceStream:
+    """币安组合流（bookTicker + aggTrade）消费者，在内存中维护每个币种的最新成交价与最优买卖价"""
+
+    def __init__(
+            self,
+            symbols: Dict[str, str],
+            url: str = BINANCE_WS_URL,
+            capture_trades: bool = False,
+            reconnect_delay: float = 1.0,
+            max_reconnect_delay: float = 30.0,
+    ):
+        # symbols: {"BTC": "BTCUSDT", ...}
+        self.symbols = dict(symbols)
+        self._coin_by_symbol = {symbol.upper(): coin for coin, symbol in self.symbols.items()}
+        self.url = url
+        # 成交级采集：逐笔成交先缓冲在内存中，由采样循环每个周期取走一次（drain_trades）
+        self.capture_trades = capture_trades
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self._lock = threading.Lock()
+        # coin -> {"price": str, "bid": str, "ask": str, "ts": float, "agg_id": int}
+        self._state: Dict[str, dict] = {coin: {} for coin in self.symbols}
+        # coin -> [trade, ...]，上次 drain_trades 之后到达的成交
+        self._trades: Dict[str, list] = {}
+        self._ws: Optional[websocket.WebSocketApp] = None
+        self._connected = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # 断线缺口统计
+        self.stats = {
+            "reconnects": 0,
+            "gap_seconds": 0.0,
+            "missed_trades": 0,
+            "last_gap_seconds": 0.0,
+        }
+        self._disconnected_at: Optional[float] = None
+
+    # ------------------------ 生命周期 ------------------------
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_forever, name="binance-ws", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            ws.close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    def stream_url(self) -> str:
+        streams = []
+        for symbol in self.symbols.values():
+            symbol = symbol.lower()
+            streams.append(f"{symbol}@bookTicker")
+            streams.append(f"{symbol}@aggTrade")
+        return f"{self.url}?streams={'/'.join(streams)}"
+
+    # ------------------------ 读取实时状态 ------------------------
+
+    def get_quote(self, coin: str) -> Optional[dict]:
+        """返回 {"price", "bid", "ask", "ts"}，断线或无数据时返回 None"""
+        if not self.connected:
+            return None
+        with self._lock:
+            state = self._state.get(coin)
+            if not state:
+                return None
+            return dict(state)
+
+    def get_prices(self) -> Dict[str, str]:
+        """返回所有有最新成交价的币种 {coin: price}"""
+        result = {}
+        if not self.connected:
+            return result
+        with self._lock:
+            for coin, state in self._state.items():
+                price = state.get("price")
+                if price is not None:
+                    result[coin] = price
+        return result
+
+    def drain_trades(self) -> Dict[str, list]:
+        """取走上次调用以来缓冲的成交 {coin: [trade, ...]}（各币种内按到达顺序）"""
+        with self._lock:
+            trades, self._trades = self._trades, {}
+        return trades
+
+    # ------------------------ 连接与消息处理 ------------------------
+
+    def _run_forever(self):
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self._ws = websocket.WebSocketApp(
+                self.stream_url(),
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+                on_close=self._on_close,
+            )
+            try:
+                # 服务端会主动 ping，websocket-client 自动回 pong；
+                # ping_timeout 同时是读循环的 select 超时：stop() 后最多 0.5 秒退出
+                self._ws.run_forever(ping_timeout=0.5)
+            except Exception as ex:
+                print(f"[Binance WS] 连接异常: {str(ex)[:80]}")
+            finally:
+                if self._connected.is_set():
+                    self._disconnected_at = time.time()
+                self._connected.clear()
+                self._ws = None
+
+            if self._stop.is_set():
+                break
+
+            if time.monotonic() - started > 5:
+                delay = self.reconnect_delay
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _on_open(self, ws):
+        if self._disconnected_at is not None:
+            gap = time.time() - self._disconnected_at
+            self.stats["reconnects"] += 1
+            self.stats["gap_seconds"] += gap
+            self.stats["last_gap_seconds"] = gap
+            print(f"[Binance WS] 已重连（第 {self.stats['reconnects']} 次），断线 {gap:.1f} 秒")
+            # 断线期间的盘口不可信，等新消息覆盖
+            with self._lock:
+                for state in self._state.values():
+                    state.pop("bid", None)
+                    state.pop("ask", None)
+        else:
+            print(f"[Binance WS] 已连接，订阅 {len(self.symbols)} 个币种")
+        self._disconnected_at = None
+        self._connected.set()
+
+    def _on_close(self, ws, status_code=None, msg=None):
+        if self._connected.is_set():
+            self._disconnected_at = time.time()
+        self._connected.clear()
+
+    def _on_error(self, ws, error):
+        print(f"[Binance WS] 错误: {str(error)[:80]}")
+
+    def _on_message(self, ws, message: str):
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            return
+
+        data = payload.get("data", payload) if isinstance(payload, dict) else None
+        if not isinstance(data, dict):
+            return
+
+        coin = self._coin_by_symbol.get(str(data.get("s", "")).upper())
+        if coin is None:
+            return
+
+        now = time.time()
+        if data.get("e") == "aggTrade":
+            self._apply_trade(coin, data, now)
+        elif "b" in data and "a" in data:
+            # bookTicker 没有事件类型字段
+            with self._lock:
+                state = self._state[coin]
+                state["bid"] = data["b"]
+                state["ask"] = data["a"]
+                state["ts"] = now
+
+    def _apply_trade(self, coin: str, data: dict, now: float):
+        agg_id = data.get("a")
+        with self._lock:
+            state = self._state[coin]
+            last_id = state.get("agg_id")
+            if isinstance(agg_id, int):
+                if isinstance(last_id, int):
+                    if agg_id <= last_id:
+                        # 重连后的重复成交
+                        return
+                    if agg_id > last_id + 1:
+                        self.stats["missed_trades"] += agg_id - last_id - 1
+                state["agg_id"] = agg_id
+            state["price"] = data["p"]
+            state["ts"] = now
+            if self.capture_trades:
+                self._trades.setdefault(coin, []).append({
+                    "price": data["p"],
+                    "qty": data.get("q"),
+                    "agg_id": agg_id,
+                    "trade_time": data.get("T"),
+                    "is_buyer_maker": data.get("m"),
+                })
@@ -0,0 +1,63 @@
+from typing import Iterable, Tuple
+
+
+# --- CLOB 盘口解析工具（REST 批量盘口与 WebSocket 盘口共用）---
+
+def level_price(level) -> float:
+    """读取单档价格，兼容 dict 与 py_clob_client 的 OrderSummary 对象"""
+    value = level.get("price") if isinstance(level, dict) else getattr(level, "price", None)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def best_bid_ask(bids: Iterable, asks: Iterable) -> Tuple[float, float]:
+    """
+    返回 (最优买价, 最优卖价)，缺失一侧时为 0
+    不依赖接口返回的档位顺序，直接取买盘最大值与卖盘最小值
+    """
+    bid_prices = [p for p in (level_price(level) for level in bids or []) if p > 0]
+    ask_prices = [p for p in (level_price(level) for level in asks or []) if p > 0]
+    return (max(bid_prices) if bid_prices else 0.0, min(ask_prices) if ask_prices else 0.0)
+
+
+def resolve_mid(best_bid: float, best_ask: float) -> float:
+    """本地计算中间价；只有买盘时取最优买价（与 get_price_sync 的 orderbook 备选逻辑一致）"""
+    if best_bid > 0 and best_ask > 0:
+        return (best_bid + best_ask) / 2
+    return best_bid
+
+
+def format_price(price: float) -> str:
+    """格式化为落盘使用的价格字符串，无效价格返回 "none" """
+    if price and price > 0:
+        return f"{price:.2f}"
+    return "none"
+
+
+def level_size(level) -> float:
+    """读取单档数量，兼容 dict 与 py_clob_client 的 OrderSummary 对象"""
+    value = level.get("size") if isinstance(level, dict) else getattr(level, "size", None)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def top_levels(bids: Iterable, asks: Iterable, depth: int) -> Tuple[list, list]:
+    """
+    返回前 depth 档 ([(价格, 数量)] 买盘从高到低, [(价格, 数量)] 卖盘从低到高)
+    同样不依赖接口返回的档位顺序，数量为 0 的档位忽略
+    """
+    def collect(levels):
+        return [
+            (price, size)
+            for price, size in ((level_price(level), level_size(level)) for level in levels or [])
+            if price > 0 and size > 0
+        ]
+
+    return (
+        sorted(collect(bids), reverse=True)[:depth],
+        sorted(collect(asks))[:depth],
+    )
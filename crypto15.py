@@ -1,41 +1,59 @@
+import os
 import time
-import math
 import requests
 import json
 from typing import Dict, Optional
-import pytz
-from datetime import datetime, timedelta
+from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+
+from cycle_calendar import INTERVALS, cycle_start_ts
+from market_cache import MarketCache
+from market_registry import MarketRegistry, MarketSpec, legacy_spec, load_registry
+from rate_limit import default_limiter
 
 # --- 全局变量（保持不变，供外部引用）---
-MARKET_TOKEN_IDS = {
-    "BTC": {"UP": "none"},
-    "ETH": {"UP": "none"},
-    "SOL": {"UP": "none"},
-    "XRP": {"UP": "none"},
-    "BTC5": {"UP": "none"},  # BTC 5分钟周期
-    "ETH5": {"UP": "none"},  # ETH 5分钟周期
-    "SOL5": {"UP": "none"},  # SOL 5分钟周期
-    "XRP5": {"UP": "none"},  # XRP 5分钟周期
-}
+# 市场列表来自市场注册表（markets.json / MARKET_REGISTRY_FILE），未配置时与原先硬编码的 8 个市场一致
+def __getattr__(name: str):
+    """
+    MARKET_REGISTRY / MARKET_TOKEN_IDS 在首次访问时才加载：
+    main 在导入本模块之后才执行 load_dotenv，导入时读取会忽略 .env 中的 MARKET_REGISTRY_FILE
+    """
+    if name == "MARKET_REGISTRY":
+        globals()[name] = load_registry()
+    elif name == "MARKET_TOKEN_IDS":
+        globals()[name] = __getattr__("MARKET_REGISTRY").token_map()
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return globals()[name]
 
 
 # --- 内部优化：连接池与缓存 ---
 # 建立一个全局 Session，复用 TCP 连接，显著提升速度
 def _create_session():
     s = requests.Session()
-    # 配置重试策略：遇到 5xx 错误或 429 限流自动重试
-    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504, 429])
-    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=retries)
+    # 不在连接层重试：429 / 5xx 由共享限流器按请求的截止时间重试（见 rate_limit）
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=0)
     s.mount('https://', adapter)
     s.mount('http://', adapter)
     return s
 
 
 _GLOBAL_SESSION = _create_session()
-_INTERNAL_CACHE = {}  # 简单的内存缓存
+# 每个市场同时有效的缓存条目数：当前周期、预取的下一周期，以及解析回退时前后相邻的周期
+_CACHE_ENTRIES_PER_MARKET = 4
+
+
+def cache_capacity(market_count: int) -> int:
+    """按市场数量估算的缓存容量（至少 256）；容量不足时每个周期都会淘汰仍然有效的条目"""
+    return max(256, market_count * _CACHE_ENTRIES_PER_MARKET)
+
+
+# 市场元数据缓存：条目在所属周期结束时过期，超出容量按 LRU 淘汰（线程安全，可被线程池并发读写）
+# 导入时还不知道注册表规模，先用最小容量，加载注册表后由调用方按规模调整（见 set_cache_capacity）
+_INTERNAL_CACHE = MarketCache(capacity=cache_capacity(0))
+# 批量未覆盖时逐个补查的并发上限
+_FALLBACK_MAX_WORKERS = 16
 
 
 # --- 核心函数 ---
@@ -43,55 +61,32 @@ _INTERNAL_CACHE = {}  # 简单的内存缓存
 def get_5m_cycle_start_ts(offset_minutes: int = 0) -> int:
     """
     计算当前（或偏移后）最近的 5 分钟周期开始时间的 Unix timestamp（秒级）
+    周期边界来自预计算的美东周期日历（正确处理夏令时切换日）
     """
-    utc_now = datetime.now(pytz.utc)
-    # 转换为美东时间
-    et_tz = pytz.timezone("America/New_York")
-    et_now = utc_now.astimezone(et_tz)
-
-    # 获取当天午夜
-    et_midnight = et_now.replace(hour=0, minute=0, second=0, microsecond=0)
-
-    # 计算当前是第几个 5 分钟
-    minutes_since_midnight = (et_now - et_midnight).total_seconds() / 60
-    cycle_index = math.floor(minutes_since_midnight / 5)
-
-    # 计算目标时间
-    cycle_start_minutes = cycle_index * 5
-    cycle_start_et = et_midnight + timedelta(minutes=cycle_start_minutes)
-    adjusted = cycle_start_et + timedelta(minutes=offset_minutes)
-
-    return int(adjusted.astimezone(pytz.utc).timestamp())
+    return cycle_start_ts(INTERVALS["5m"]) + offset_minutes * 60
 
 
 def get_15m_cycle_start_ts(offset_minutes: int = 0) -> int:
     """
     计算当前（或偏移后）最近的 15 分钟周期开始时间的 Unix timestamp（秒级）
-    保持原有逻辑的准确性，但优化了计算过程
+    周期边界来自预计算的美东周期日历（正确处理夏令时切换日）
     """
-    utc_now = datetime.now(pytz.utc)
-    # 转换为美东时间
-    et_tz = pytz.timezone("America/New_York")
-    et_now = utc_now.astimezone(et_tz)
+    return cycle_start_ts(INTERVALS["15m"]) + offset_minutes * 60
 
-    # 获取当天午夜
-    et_midnight = et_now.replace(hour=0, minute=0, second=0, microsecond=0)
 
-    # 计算当前是第几个 15 分钟
-    minutes_since_midnight = (et_now - et_midnight).total_seconds() / 60
-    cycle_index = math.floor(minutes_since_midnight / 15)
+def cached_fetch_5m_market_token_id(coin: str, cache_key: int) -> Optional[Dict[str, str]]:
+    full_key = f"{coin}5_{cache_key}"
+    return _INTERNAL_CACHE.get(full_key)
 
-    # 计算目标时间
-    cycle_start_minutes = cycle_index * 15
-    cycle_start_et = et_midnight + timedelta(minutes=cycle_start_minutes)
-    adjusted = cycle_start_et + timedelta(minutes=offset_minutes)
 
-    return int(adjusted.astimezone(pytz.utc).timestamp())
+def set_cache_capacity(capacity: int):
+    """调整市场元数据缓存容量（main 按 MARKET_CACHE_CAPACITY 或所用注册表的规模设置）"""
+    _INTERNAL_CACHE.resize(capacity)
 
 
-def cached_fetch_5m_market_token_id(coin: str, cache_key: int) -> Optional[Dict[str, str]]:
-    full_key = f"{coin}5_{cache_key}"
-    return _INTERNAL_CACHE.get(full_key)
+def get_cache_stats() -> dict:
+    """市场元数据缓存的命中/未命中/淘汰/过期统计"""
+    return _INTERNAL_CACHE.stats()
 
 
 # 为了兼容原代码的引用，保留此函数名，但内部逻辑不再使用 lru_cache 装饰器导致的复杂依赖
@@ -101,84 +96,149 @@ def cached_fetch_15m_market_token_ids(coin: str, cache_key: int) -> Optional[Dic
     return _INTERNAL_CACHE.get(full_key)
 
 
-def fetch_5m_market_token_id(
-        coin: str = "BTC", max_retries: int = 3, base_delay: float = 2.0
-) -> Optional[Dict[str, str]]:
+GAMMA_MARKETS_URL = "https://gamma-api.polymarket.com/markets"
+
+
+def gamma_markets_url() -> str:
+    """Gamma 市场接口地址；GAMMA_MARKETS_URL 可指向本地模拟服务（见 benchmarks/mock_servers.py）"""
+    # 调用时读取：main 在导入本模块之后才加载 .env
+    return os.getenv("GAMMA_MARKETS_URL", "").strip().strip('"').strip("'") or GAMMA_MARKETS_URL
+
+
+def _refresh_deadline(specs: list) -> float:
+    """token 刷新的默认截止时间：最早到期的市场的下一个周期边界，重试不会拖过该边界"""
+    return min(cycle_start_ts(spec.interval_seconds, offset_cycles=1) for spec in specs)
+
+
+def _gamma_get(params, deadline: float):
+    """经共享限流器访问 Gamma，429 / 5xx / 网络异常在截止时间内重试"""
+    return default_limiter.request(_GLOBAL_SESSION, "GET", gamma_markets_url(), deadline, params=params, timeout=6)
+
+
+def _fetch_market_by_slug(slug: str, with_down: bool, deadline: float) -> Optional[Dict[str, str]]:
     """
-    获取指定币种 5分钟 Up 市场 token_id
+    按 slug 查询单个市场并解析 token_ids，市场不存在、已关闭或 token 不足时返回 None
+    with_down=True 时要求同时解析 Down token
     """
-    coin = coin.upper()
-    coin_lower = coin.lower()
+    # 使用全局 Session 发起请求，速度更快
+    resp = _gamma_get({"slug": slug}, deadline)
+    if resp.status_code != 200:
+        return None
 
-    # 1. 检查缓存 (基于当前周期时间戳)
-    current_cycle_ts = get_5m_cycle_start_ts(0)
-    cache_key = f"{coin}5_{current_cycle_ts}"
+    data = resp.json()
+    # 兼容返回列表或字典
+    market = data[0] if isinstance(data, list) and data else data if isinstance(data, dict) else None
+    return _parse_market(market, slug, with_down)
 
-    if cache_key in _INTERNAL_CACHE:
-        # print(f"[BTC5] 使用内部缓存") # 调试用，可注释
-        return _INTERNAL_CACHE[cache_key]
 
-    # 2. 定义尝试的偏移：当前 -> 下一个 -> 上一个
-    offsets = [0, 5, -5]
+def _parse_market(
+        market: Optional[dict], slug: str, with_down: bool, include_closed: bool = False
+) -> Optional[Dict[str, str]]:
+    if not market or "clobTokenIds" not in market:
+        return None
 
-    for offset_min in offsets:
-        ts = get_5m_cycle_start_ts(offset_min)
-        slug = f"{coin_lower}-updown-5m-{ts}"
-        url = "https://gamma-api.polymarket.com/markets"
-        params = {"slug": slug}
+    # 检查市场是否已关闭 (比字符串匹配更稳健)；补历史数据时需要已结算的市场
+    if market.get("closed") is True and not include_closed:
+        return None
 
-        try:
-            # 使用全局 Session 发起请求，速度更快
-            # timeout 设置短一点，依靠 Session 的自动重试
-            resp = _GLOBAL_SESSION.get(url, params=params, timeout=6)
+    clob_raw = market["clobTokenIds"]
+    clob_ids = json.loads(clob_raw) if isinstance(clob_raw, str) else clob_raw
 
-            if resp.status_code == 200:
-                data = resp.json()
-                # 兼容返回列表或字典
-                market = data[0] if isinstance(data, list) and data else data if isinstance(data, dict) else None
+    if len(clob_ids) < (2 if with_down else 1):
+        return None
 
-                if not market or "clobTokenIds" not in market:
-                    continue
+    question = market.get("question", "")
+    up_token = clob_ids[0]
 
-                # 检查市场是否已关闭 (比字符串匹配更稳健)
-                if market.get("closed") is True:
-                    continue
+    if not with_down:
+        return {
+            "UP": up_token,
+            "slug": slug,
+            "question": question,
+        }
 
-                clob_raw = market["clobTokenIds"]
-                clob_ids = json.loads(clob_raw) if isinstance(clob_raw, str) else clob_raw
+    outcomes_raw = market.get("outcomes", '["Up", "Down"]')
+    outcomes = json.loads(outcomes_raw) if isinstance(outcomes_raw, str) else outcomes_raw
 
-                if len(clob_ids) < 1:
-                    continue
+    # 确保 Up/Down 对应正确
+    # Polymarket 这里的顺序通常固定，但为了安全起见做个映射
+    # 如果找不到明确的 "Up"/"Down" 标签，回退到默认顺序
+    down_token = clob_ids[1]
 
-                outcomes_raw = market.get("outcomes", '["Up"]')
-                outcomes = json.loads(outcomes_raw) if isinstance(outcomes_raw, str) else outcomes_raw
+    # 尝试更智能的匹配
+    if len(outcomes) == 2:
+        if "down" in str(outcomes[0]).lower():
+            up_token, down_token = down_token, up_token
 
-                up_token = clob_ids[0]
-                question = market.get("question", "")
+    return {
+        "UP": up_token,
+        "DOWN": down_token,
+        "slug": slug,
+        "question": question,
+    }
 
-                result = {
-                    "UP": up_token,
-                    "slug": slug,
-                    "question": question,
-                }
 
-                print(f"[{coin}5] 获取成功（偏移 {offset_min}min）：{question[:40]}...")
+def _cycle_cache_key(spec: MarketSpec, cycle_ts: int) -> str:
+    return f"{spec.key}_{cycle_ts}"
 
-                # 更新缓存：只缓存当前或未来周期的结果，过期数据不缓存
-                if offset_min >= 0:
-                    _INTERNAL_CACHE[cache_key] = result
 
-                return result
+def invalidate_market(spec: MarketSpec) -> bool:
+    """丢弃市场当前周期的缓存，下次解析时重新查询 Gamma（用于重建单个市场的 token）"""
+    return _INTERNAL_CACHE.invalidate(_cycle_cache_key(spec, cycle_start_ts(spec.interval_seconds)))
 
-        except Exception as e:
-            # 这里的异常主要由 Session 重试后依然失败抛出
-            # 为了不刷屏，仅在最后一次尝试失败时打印详细信息
+
+def fetch_market_token_ids(spec: MarketSpec, deadline: float | None = None) -> Optional[Dict[str, str]]:
+    """
+    按市场定义逐个查询当前周期的 token_ids
+    依次尝试 当前 -> 下一个 -> 上一个 周期的 slug，请求失败时重试到 deadline（默认为下一个周期边界）
+    """
+    interval = spec.interval_seconds
+    if deadline is None:
+        deadline = _refresh_deadline([spec])
+
+    # 1. 检查缓存 (基于当前周期时间戳)
+    current_cycle_ts = cycle_start_ts(interval)
+    cache_key = _cycle_cache_key(spec, current_cycle_ts)
+
+    cached = _INTERNAL_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # 2. 定义尝试的偏移（周期数）：当前 -> 下一个 -> 上一个
+    for offset in (0, 1, -1):
+        ts = cycle_start_ts(interval, offset_cycles=offset)
+        slug = spec.slug(ts)
+
+        try:
+            result = _fetch_market_by_slug(slug, with_down=spec.with_down, deadline=deadline)
+        except Exception:
+            # 这里的异常主要是截止时间内重试后依然失败
+            continue
+
+        if result is None:
             continue
 
-    print(f"[{coin}5] 所有尝试失败")
+        print(f"[{spec.key}] 获取成功（偏移 {offset * interval // 60}min）：{result['question'][:40]}...")
+
+        # 更新缓存：只缓存当前或未来周期的结果，过期数据不缓存；条目在当前周期结束时过期
+        if offset >= 0:
+            _INTERNAL_CACHE.set(cache_key, result, expires_at=current_cycle_ts + interval)
+
+        return result
+
+    print(f"[{spec.key}] 所有尝试失败")
     return None
 
 
+def fetch_5m_market_token_id(
+        coin: str = "BTC", max_retries: int = 3, base_delay: float = 2.0
+) -> Optional[Dict[str, str]]:
+    """
+    获取指定币种 5分钟 Up/Down 市场 token_id
+    """
+    return fetch_market_token_ids(legacy_spec(f"{coin.upper()}5"))
+
+
 def fetch_15m_market_token_ids(
         coin: str, max_retries: int = 3, base_delay: float = 2.0
 ) -> Optional[Dict[str, str]]:
@@ -187,86 +247,258 @@ def fetch_15m_market_token_ids(
     参数 max_retries 和 base_delay 被保留以维持接口兼容性，
     但实际上我们会使用更高效的 Session 重试机制。
     """
-    coin_lower = coin.lower()
+    return fetch_market_token_ids(legacy_spec(coin))
 
-    # 1. 检查缓存 (基于当前周期时间戳)
-    current_cycle_ts = get_15m_cycle_start_ts(0)
-    cache_key = f"{coin}_{current_cycle_ts}"
 
-    if cache_key in _INTERNAL_CACHE:
-        # print(f"[{coin}] 使用内部缓存") # 调试用，可注释
-        return _INTERNAL_CACHE[cache_key]
+# --- 预取下一周期 ---
+# 在周期边界之前解析下一周期的 token，并写入下一周期的缓存键，
+# 边界到达后 fetch_* 直接命中缓存，调用方可以在边界瞬间原子替换 token
 
-    # 2. 定义尝试的偏移：当前 -> 下一个 -> 上一个
-    offsets = [0, 15, -15]
+def fetch_next_market_token_ids(spec: MarketSpec, deadline: float | None = None) -> Optional[Dict[str, str]]:
+    """预取指定市场下一个周期的 token_ids，请求失败时重试到 deadline（默认为周期边界）"""
+    interval = spec.interval_seconds
+    next_cycle_ts = cycle_start_ts(interval, offset_cycles=1)
+    if deadline is None:
+        deadline = next_cycle_ts
+    cache_key = _cycle_cache_key(spec, next_cycle_ts)
 
-    for offset_min in offsets:
-        ts = get_15m_cycle_start_ts(offset_min)
-        slug = f"{coin_lower}-updown-15m-{ts}"
-        url = "https://gamma-api.polymarket.com/markets"
-        params = {"slug": slug}
+    cached = _INTERNAL_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
 
-        try:
-            # 使用全局 Session 发起请求，速度更快
-            # timeout 设置短一点，依靠 Session 的自动重试
-            resp = _GLOBAL_SESSION.get(url, params=params, timeout=6)
+    slug = spec.slug(next_cycle_ts)
+    try:
+        result = _fetch_market_by_slug(slug, with_down=spec.with_down, deadline=deadline)
+    except Exception:
+        return None
 
-            if resp.status_code == 200:
-                data = resp.json()
-                # 兼容返回列表或字典
-                market = data[0] if isinstance(data, list) and data else data if isinstance(data, dict) else None
+    if result is not None:
+        _INTERNAL_CACHE.set(cache_key, result, expires_at=next_cycle_ts + interval)
+    return result
 
-                if not market or "clobTokenIds" not in market:
-                    continue
 
-                # 检查市场是否已关闭 (比字符串匹配更稳健)
-                if market.get("closed") is True:
-                    continue
+def fetch_next_5m_market_token_id(coin: str) -> Optional[Dict[str, str]]:
+    """预取指定币种下一个 5 分钟周期的 Up token_id"""
+    return fetch_next_market_token_ids(legacy_spec(f"{coin.upper()}5"))
 
-                clob_raw = market["clobTokenIds"]
-                clob_ids = json.loads(clob_raw) if isinstance(clob_raw, str) else clob_raw
 
-                if len(clob_ids) < 2:
-                    continue
+def fetch_next_15m_market_token_ids(coin: str) -> Optional[Dict[str, str]]:
+    """预取指定币种下一个 15 分钟周期的 Up/Down token_ids"""
+    return fetch_next_market_token_ids(legacy_spec(coin))
 
-                outcomes_raw = market.get("outcomes", '["Up", "Down"]')
-                outcomes = json.loads(outcomes_raw) if isinstance(outcomes_raw, str) else outcomes_raw
 
-                # 确保 Up/Down 对应正确
-                # Polymarket 这里的顺序通常固定，但为了安全起见做个映射
-                # 如果找不到明确的 "Up"/"Down" 标签，回退到默认顺序
-                up_token = clob_ids[0]
-                down_token = clob_ids[1]
+# --- 批量解析 ---
+# 把所有市场、所有候选偏移的 slug 合并为一次（或少数几次）多 slug 的 Gamma 查询，
+# 在本地按偏移优先级为每个键选出可用的市场；批量未覆盖的键再走逐个查询的原流程
 
-                # 尝试更智能的匹配
-                if len(outcomes) == 2:
-                    if "down" in str(outcomes[0]).lower():
-                        up_token, down_token = down_token, up_token
+# 单次请求携带的 slug 数量上限（控制 URL 长度）
+_GAMMA_SLUGS_PER_REQUEST = 50
+# 分片并发上限：市场数增加到数百个时，各分片同时请求，总耗时接近单个分片
+_GAMMA_MAX_PARALLEL = 8
 
-                question = market.get("question", "")
 
-                result = {
-                    "UP": up_token,
-                    "DOWN": down_token,
-                    "slug": slug,
-                    "question": question,
-                }
+def _fetch_slug_chunk(chunk: list, deadline: float) -> list:
+    params = [("slug", slug) for slug in chunk] + [("limit", len(chunk))]
+    try:
+        resp = _gamma_get(params, deadline)
+        if resp.status_code != 200:
+            return []
+        data = resp.json()
+    except Exception:
+        return []
+    return data if isinstance(data, list) else [data]
 
-                print(f"[{coin}] 获取成功（偏移 {offset_min}min）：{question[:40]}...")
 
-                # 更新缓存：只缓存当前或未来周期的结果，过期数据不缓存
-                if offset_min >= 0:
-                    _INTERNAL_CACHE[cache_key] = result
+def fetch_markets_by_slugs(slugs: list, deadline: float | None = None) -> Dict[str, dict]:
+    """
+    批量查询多个 slug，返回 {slug: market}；分片并发请求，单个分片失败只影响该分片
+    各分片在 deadline 之前重试（默认 10 秒）
+    """
+    if deadline is None:
+        deadline = time.time() + 10
+    chunks = [slugs[i:i + _GAMMA_SLUGS_PER_REQUEST] for i in range(0, len(slugs), _GAMMA_SLUGS_PER_REQUEST)]
+    if len(chunks) == 1:
+        results = [_fetch_slug_chunk(chunks[0], deadline)]
+    else:
+        with ThreadPoolExecutor(max_workers=min(len(chunks), _GAMMA_MAX_PARALLEL)) as executor:
+            results = list(executor.map(lambda chunk: _fetch_slug_chunk(chunk, deadline), chunks))
+
+    markets = {}
+    for data in results:
+        for market in data:
+            if isinstance(market, dict) and market.get("slug"):
+                markets[market["slug"]] = market
+    return markets
+
+
+def resolve_markets_batch(specs: list, next_cycle: bool = False, deadline: float | None = None) -> Dict[str, Dict[str, str]]:
+    """
+    批量解析多个市场的 token，返回 {spec.key: info}
+    next_cycle=False：按 当前 -> 下一个 -> 上一个 的优先级解析当前周期（与逐个查询一致）
+    next_cycle=True：只解析下一周期，用于边界前预取
+    结果写入缓存，已在缓存中的键不发请求；请求失败时重试到 deadline（默认为最早的周期边界）
+    """
+    resolved = {}
+    candidates = {}  # key -> (spec, [(offset, slug)])
+    cache_targets = {}  # key -> (cache_key, target_offset, expires_at)
+
+    for spec in specs:
+        interval = spec.interval_seconds
+        offsets = [1] if next_cycle else [0, 1, -1]
+        target_ts = cycle_start_ts(interval, offset_cycles=offsets[0])
+        cache_key = _cycle_cache_key(spec, target_ts)
+
+        cached = _INTERNAL_CACHE.get(cache_key)
+        if cached is not None:
+            resolved[spec.key] = cached
+            continue
 
-                return result
+        cache_targets[spec.key] = (cache_key, offsets[0], target_ts + interval)
+        candidates[spec.key] = (spec, [
+            (offset, spec.slug(cycle_start_ts(interval, offset_cycles=offset)))
+            for offset in offsets
+        ])
 
-        except Exception as e:
-            # 这里的异常主要由 Session 重试后依然失败抛出
-            # 为了不刷屏，仅在最后一次尝试失败时打印详细信息
-            continue
+    if not candidates:
+        return resolved
 
-    print(f"[{coin}] 所有尝试失败")
-    return None
+    all_slugs = [slug for _, pairs in candidates.values() for _, slug in pairs]
+    if deadline is None:
+        deadline = _refresh_deadline([spec for spec, _ in candidates.values()])
+    markets = fetch_markets_by_slugs(all_slugs, deadline)
+
+    for key, (spec, pairs) in candidates.items():
+        for offset, slug in pairs:
+            result = _parse_market(markets.get(slug), slug, spec.with_down)
+            if result is None:
+                continue
+            resolved[key] = result
+            cache_key, target_offset, expires_at = cache_targets[key]
+            # 与逐个查询一致：只缓存目标周期及之后的结果
+            if offset >= target_offset:
+                _INTERNAL_CACHE.set(cache_key, result, expires_at=expires_at)
+            break
+
+    return resolved
+
+
+def resolve_cycle_markets(pairs: list, deadline: float | None = None) -> Dict[tuple, Dict[str, str]]:
+    """
+    解析指定周期（可以是已结束的周期）的市场 token，pairs 为 [(spec, 周期起点)]，返回 {(spec.key, 周期起点): info}
+    用于历史补数：已关闭的市场同样返回，结果不写入缓存
+    """
+    slugs = {(spec.key, cycle_ts): (spec, spec.slug(cycle_ts)) for spec, cycle_ts in pairs}
+    if not slugs:
+        return {}
+    markets = fetch_markets_by_slugs(sorted({slug for _, slug in slugs.values()}), deadline)
+    resolved = {}
+    for pair, (spec, slug) in slugs.items():
+        info = _parse_market(markets.get(slug), slug, spec.with_down, include_closed=True)
+        if info is not None:
+            resolved[pair] = info
+    return resolved
+
+
+def resolve_token_ids_batch(coin_keys: list, next_cycle: bool = False) -> Dict[str, Dict[str, str]]:
+    """兼容旧调用：按键名约定（15分钟键如 BTC、5分钟键如 BTC5）批量解析"""
+    return resolve_markets_batch([legacy_spec(key) for key in coin_keys], next_cycle=next_cycle)
+
+
+def prefetch_next_market_token_ids(specs: list, deadline: float | None = None) -> Dict[str, Dict[str, str]]:
+    """
+    预取一组市场下一周期的 token，返回 {spec.key: info}
+    先批量查询，批量未解析到的市场再逐个补查；重试不超过 deadline（默认为周期边界）
+    """
+    if not specs:
+        return {}
+
+    pending = resolve_markets_batch(specs, next_cycle=True, deadline=deadline)
+    missing = [spec for spec in specs if spec.key not in pending]
+    if not missing:
+        return pending
+
+    with ThreadPoolExecutor(max_workers=min(len(missing), _FALLBACK_MAX_WORKERS)) as executor:
+        future_to_spec = {executor.submit(fetch_next_market_token_ids, spec, deadline): spec for spec in missing}
+        for future in as_completed(future_to_spec):
+            spec = future_to_spec[future]
+            try:
+                info = future.result()
+            except Exception:
+                info = None
+            if info and "UP" in info:
+                pending[spec.key] = info
+            else:
+                print(f"[{spec.key}] 预取下一周期失败，边界后按常规流程更新")
+    return pending
+
+
+def prefetch_next_token_ids(market_token_ids: Dict[str, Dict[str, str]], coin_keys: list) -> Dict[str, Dict[str, str]]:
+    """
+    兼容旧调用：预取 coin_keys 下一周期的 token，返回 {coin_key: info}，不修改 market_token_ids
+    """
+    return prefetch_next_market_token_ids([legacy_spec(k) for k in coin_keys if k in market_token_ids])
+
+
+def apply_token_info(market_token_ids: Dict[str, Dict[str, str]], spec: MarketSpec, info: Dict[str, str]) -> bool:
+    """
+    把解析结果写入 market_token_ids；需要 Down 的市场缺少 Down 时视为失败
+    与 main.swap_token_ids 一样整体替换为新字典（单次赋值），并发读取的线程不会看到新 UP 配旧 DOWN
+    """
+    if not info or "UP" not in info:
+        return False
+    if spec.with_down and "DOWN" not in info:
+        return False
+    new_tokens = dict(market_token_ids[spec.key])
+    new_tokens["UP"] = info["UP"]
+    if spec.with_down:
+        new_tokens["DOWN"] = info["DOWN"]
+    # 实际解析到的市场（可能是偏移回退到的相邻周期），热启动据此判断是否仍是当前周期
+    if info.get("slug"):
+        new_tokens["slug"] = info["slug"]
+    else:
+        new_tokens.pop("slug", None)
+    market_token_ids[spec.key] = new_tokens
+    return True
+
+
+def update_market_token_ids(
+        market_token_ids: Dict[str, Dict[str, str]], specs: list, deadline: float | None = None
+) -> int:
+    """
+    更新一组市场当前周期的 token，返回成功数量
+    先用一次批量查询解析所有市场，未解析到的再并行逐个查询，失败的保持旧值；
+    重试不超过 deadline（默认为最早的周期边界）
+    """
+    specs = [spec for spec in specs if spec.key in market_token_ids]
+    if not specs:
+        return 0
+
+    updated_count = 0
+    resolved = resolve_markets_batch(specs, deadline=deadline)
+    fallback_specs = []
+    for spec in specs:
+        if apply_token_info(market_token_ids, spec, resolved.get(spec.key)):
+            updated_count += 1
+        else:
+            fallback_specs.append(spec)
+
+    if not fallback_specs:
+        return updated_count
+
+    with ThreadPoolExecutor(max_workers=min(len(fallback_specs), _FALLBACK_MAX_WORKERS)) as executor:
+        future_to_spec = {executor.submit(fetch_market_token_ids, spec, deadline): spec for spec in fallback_specs}
+
+        for future in as_completed(future_to_spec):
+            spec = future_to_spec[future]
+            try:
+                if apply_token_info(market_token_ids, spec, future.result()):
+                    updated_count += 1
+                else:
+                    print(f"[{spec.key}] 更新失败，保持旧值")
+            except Exception as e:
+                print(f"[{spec.key}] 更新线程异常: {str(e)[:80]}")
+
+    return updated_count
 
 
 def update_btc5_token_id(market_token_ids: Dict[str, Dict[str, str]]) -> bool:
@@ -283,95 +515,57 @@ def update_single_5m_token_id(market_token_ids: Dict[str, Dict[str, str]], coin_
     try:
         if not coin_key.endswith("5"):
             return False
-
-        base_coin = coin_key[:-1]
-        info = fetch_5m_market_token_id(base_coin)
-        if info and "UP" in info:
-            market_token_ids[coin_key]["UP"] = info["UP"]
-            return True
-        else:
-            return False
+        spec = legacy_spec(coin_key)
+        return apply_token_info(market_token_ids, spec, fetch_market_token_ids(spec))
     except Exception as e:
         return False
 
 
 def update_all_5m_token_ids(market_token_ids: Dict[str, Dict[str, str]]) -> int:
     """
-    并行更新所有 5分钟键（*5）token_id，返回成功数量
+    兼容旧调用：并行更新所有 5分钟键（*5）token_id，返回成功数量
     """
-    updated_count = 0
     five_min_keys = [k for k in market_token_ids.keys() if k.endswith("5")]
-
     if not five_min_keys:
         return 0
 
-    with ThreadPoolExecutor(max_workers=len(five_min_keys)) as executor:
-        future_to_coin_key = {
-            executor.submit(update_single_5m_token_id, market_token_ids, coin_key): coin_key
-            for coin_key in five_min_keys
-        }
-
-        for future in as_completed(future_to_coin_key):
-            coin_key = future_to_coin_key[future]
-            try:
-                ok = future.result()
-                if ok:
-                    updated_count += 1
-                else:
-                    print(f"[{coin_key}] 更新失败，保持旧值")
-            except Exception as e:
-                print(f"[{coin_key}] 更新线程异常: {str(e)[:80]}")
-
+    updated_count = update_market_token_ids(market_token_ids, [legacy_spec(k) for k in five_min_keys])
     print(f"5分钟 token 更新完成：成功 {updated_count}/{len(five_min_keys)} 个")
     return updated_count
 
 
 def update_all_token_ids(market_token_ids: Dict[str, Dict[str, str]]) -> int:
     """
-    并行更新 4 个币种的 Up/Down token_ids，返回成功数量
-    保持原有函数签名完全一致
+    兼容旧调用：并行更新所有 15分钟键的 Up/Down token_ids，返回成功数量
     """
-    updated_count = 0
     coins = [k for k in market_token_ids.keys() if not k.endswith("5")]  # 仅15分钟键
-
     if not coins:
         return 0
 
-    # 使用线程池并发
-    with ThreadPoolExecutor(max_workers=len(coins)) as executor:
-        # 这里提交任务时，不再显式传递 max_retries，使用默认值即可兼容
-        future_to_coin = {
-            executor.submit(fetch_15m_market_token_ids, coin): coin for coin in coins
-        }
+    updated_count = update_market_token_ids(market_token_ids, [legacy_spec(c) for c in coins])
+    print(f"15分钟 token 更新完成：成功 {updated_count}/{len(coins)} 个")
+    return updated_count
 
-        for future in as_completed(future_to_coin):
-            coin = future_to_coin[future]
-            try:
-                info = future.result()
-                if info and "UP" in info and "DOWN" in info:
-                    market_token_ids[coin]["UP"] = info["UP"]
-                    market_token_ids[coin]["DOWN"] = info["DOWN"]
-                    # print(f"[{coin}] 更新内存成功")
-                    updated_count += 1
-                else:
-                    print(f"[{coin}] 更新失败，保持旧值")
-            except Exception as e:
-                print(f"[{coin}] 更新线程异常: {str(e)[:80]}")
 
-    print(f"15分钟 token 更新完成：成功 {updated_count}/{len(coins)} 个")
+def update_registry_token_ids(market_token_ids: Dict[str, Dict[str, str]], registry: MarketRegistry) -> int:
+    """按注册表更新全部市场的 token，返回成功数量"""
+    updated_count = update_market_token_ids(market_token_ids, registry.markets)
+    print(f"token 更新完成：成功 {updated_count}/{len(registry.markets)} 个市场")
     return updated_count
 
 
 # 主入口（保持不变，方便测试）
 if __name__ == "__main__":
     print(f"开始更新所有 Up/Down token IDs ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})...")
-    success_count_15m = update_all_token_ids(MARKET_TOKEN_IDS)
-    success_count_5m = update_all_5m_token_ids(MARKET_TOKEN_IDS)
-    print(f"更新结束，15分钟成功 {success_count_15m} 个币种，5分钟成功 {success_count_5m} 个币种")
+    registry = load_registry()
+    market_token_ids = registry.token_map()
+    set_cache_capacity(cache_capacity(len(registry.markets)))
+    success_count = update_registry_token_ids(market_token_ids, registry)
+    print(f"更新结束，成功 {success_count}/{len(registry.markets)} 个市场")
 
     # 打印最终结果
     print("\n最终 MARKET_TOKEN_IDS:")
-    for coin, tokens in MARKET_TOKEN_IDS.items():
+    for coin, tokens in market_token_ids.items():
         up_val = tokens.get("UP", "none")
         down_val = tokens.get("DOWN")
         up_show = f"{up_val[:12]}..." if isinstance(up_val, str) and len(up_val) > 12 else str(up_val)
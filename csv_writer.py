@@ -0,0 +1,167 @@
+import csv
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+
+class _OpenFile:
+    __slots__ = ("handle", "writer", "date_str", "pad")
+
+    def __init__(self, handle, writer, date_str: str, pad: int = 0):
+        self.handle = handle
+        self.writer = writer
+        self.date_str = date_str
+        # 已有文件的表头比本次写入的多出的列数（如 backfill.py 追加的 source 列），写入时补空值
+        self.pad = pad
+
+
+class CsvSink:
+    """
+    按天落盘的 CSV 写入器：每个 (序列, 日期) 文件常驻一个打开的句柄，目录创建结果缓存，
+    行先写入缓冲区，按时间间隔或行数批量刷盘
+
+    日期切换（落盘时区零点）后前一天的句柄再保留 late_grace 秒，零点前成交等迟到的行直接追加，
+    宽限期结束后才关闭；宽限期之后才到达的行重新打开该天的文件，并开始新的宽限期
+
+    文件布局与原实现一致：{base_dir}/YYYY-MM/YYYY-MM-DD/{stem}_YYYY-MM-DD.csv
+    on_day_closed(日期目录) 在某一天的文件全部关闭后调用（宽限期结束与 close 时，在锁外执行），用于更新该天的索引；
+    同一天的迟到行无论多少，每个宽限期只调用一次
+    """
+
+    def __init__(
+            self,
+            base_dir: str = "data",
+            flush_interval: float = 1.0,
+            flush_rows: int = 256,
+            buffer_size: int = 64 * 1024,
+            on_day_closed: Optional[Callable[[str], None]] = None,
+            late_grace: float = 60.0,
+    ):
+        self.base_dir = base_dir
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.buffer_size = buffer_size
+        self.on_day_closed = on_day_closed
+        self.late_grace = late_grace
+
+        self._lock = threading.Lock()
+        self._files: dict[str, _OpenFile] = {}
+        self._known_dirs: set[str] = set()
+        self._current_date: str | None = None
+        # 已切换走、句柄仍在宽限期内保持打开的日期 -> 宽限期结束时刻（单调时钟）
+        self._closing: dict[str, float] = {}
+        self._pending_rows = 0
+        self._last_flush = time.monotonic()
+
+        self.stats = {"rows": 0, "flushes": 0, "opens": 0, "rotations": 0}
+
+    def file_path(self, stem: str, date_str: str) -> str:
+        return os.path.join(self.base_dir, date_str[:7], date_str, f"{stem}_{date_str}.csv")
+
+    def write_row(self, stem: str, current_datetime: datetime, row: list, header: list):
+        """追加一行到 stem 对应的当天文件；新文件自动写表头"""
+        date_str = current_datetime.strftime('%Y-%m-%d')
+        with self._lock:
+            now = time.monotonic()
+            if self._current_date is None or date_str > self._current_date:
+                self._rotate(date_str, now)
+            elif date_str < self._current_date and date_str not in self._closing:
+                # 宽限期之后才到达的行：重新打开该天的文件，再等一个宽限期后统一关闭
+                self._closing[date_str] = now + self.late_grace
+
+            path = self.file_path(stem, date_str)
+            open_file = self._files.get(path)
+            if open_file is None:
+                open_file = self._open(path, header, date_str)
+
+            open_file.writer.writerow(row + [""] * open_file.pad if open_file.pad else row)
+            self.stats["rows"] += 1
+            self._pending_rows += 1
+
+            if (self._pending_rows >= self.flush_rows
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+            closed_dates = self._expire_locked(now)
+        for closed_date in closed_dates:
+            self._day_closed(closed_date)
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        """刷盘并关闭所有句柄"""
+        with self._lock:
+            self._flush_locked()
+            for open_file in self._files.values():
+                open_file.handle.close()
+            self._files.clear()
+            closed_dates = sorted(self._closing)
+            self._closing.clear()
+            if self._current_date is not None:
+                closed_dates.append(self._current_date)
+        for closed_date in closed_dates:
+            self._day_closed(closed_date)
+
+    # ------------------------ 内部实现 ------------------------
+
+    def _day_closed(self, date_str: str):
+        directory = os.path.join(self.base_dir, date_str[:7], date_str)
+        if self.on_day_closed is None or not os.path.isdir(directory):
+            return
+        try:
+            self.on_day_closed(directory)
+        except Exception as ex:
+            print(f"[警告] {date_str} 关闭后处理失败: {str(ex)[:80]}")
+
+    def _open(self, path: str, header: list, date_str: str) -> _OpenFile:
+        directory = os.path.dirname(path)
+        if directory not in self._known_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._known_dirs.add(directory)
+
+        handle = open(path, 'a', newline='', encoding='utf-8', buffering=self.buffer_size)
+        writer = csv.writer(handle)
+        # 追加模式打开后位置在文件末尾，位置为 0 说明是新文件
+        pad = 0
+        if handle.tell() == 0:
+            writer.writerow(header)
+        else:
+            with open(path, newline='', encoding='utf-8') as existing:
+                pad = max(0, len(next(csv.reader(existing), [])) - len(header))
+
+        open_file = _OpenFile(handle, writer, date_str, pad)
+        self._files[path] = open_file
+        self.stats["opens"] += 1
+        return open_file
+
+    def _rotate(self, date_str: str, now: float):
+        """进入新的一天：刷盘，前一天的句柄进入宽限期（到期后由 _expire_locked 关闭）"""
+        if self._current_date is not None:
+            self.stats["rotations"] += 1
+            self._closing[self._current_date] = now + self.late_grace
+        self._current_date = date_str
+        self._flush_locked()
+        # 目录缓存只保留当天，避免长期运行无限增长
+        self._known_dirs = {d for d in self._known_dirs if d.endswith(date_str)}
+
+    def _expire_locked(self, now: float) -> list:
+        """关闭宽限期已结束的日期的句柄，返回这些日期（由调用方在锁外执行关闭后处理）"""
+        expired = [date_str for date_str, deadline in self._closing.items() if now >= deadline]
+        for date_str in expired:
+            del self._closing[date_str]
+            for path, open_file in list(self._files.items()):
+                if open_file.date_str == date_str:
+                    open_file.handle.close()
+                    del self._files[path]
+        return expired
+
+    def _flush_locked(self):
+        if self._pending_rows:
+            for open_file in self._files.values():
+                open_file.handle.flush()
+            self.stats["flushes"] += 1
+        self._pending_rows = 0
+        self._last_flush = time.monotonic()
@@ -0,0 +1,145 @@
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pytz
+
+# Polymarket Up/Down 市场周期按美东时间划分
+ET_TZ = pytz.timezone("America/New_York")
+
+INTERVALS = {
+    "5m": 5 * 60,
+    "15m": 15 * 60,
+    "1h": 60 * 60,
+    "4h": 4 * 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+
+# 小于该长度的周期按"距当地零点的实际经过秒数"切分（与原 get_*_cycle_start_ts 一致，
+# 且因夏令时偏移为整小时，与当地整点/整刻对齐）；不小于该长度的周期按当地墙钟整点切分
+_WALL_CLOCK_MIN_INTERVAL = 2 * 60 * 60
+
+
+class _Day:
+    """某个当地自然日：[start, end) 的 Unix 秒范围，以及各周期长度的边界数组（惰性计算）"""
+
+    __slots__ = ("date", "start", "end", "_boundaries")
+
+    def __init__(self, date, start: int, end: int):
+        self.date = date
+        self.start = start
+        self.end = end
+        self._boundaries: dict[int, array] = {}
+
+
+class CycleCalendar:
+    """
+    预计算的周期日历：每个当地自然日、每种周期长度的起点以 int64 数组缓存，
+    查询时同一天内为 O(1)（等长周期直接整除，墙钟周期在不超过 12 个元素的数组上二分），
+    夏令时切换日（23/25 小时）按实际边界处理
+    """
+
+    def __init__(self, tz=ET_TZ, max_days: int = 8):
+        self.tz = tz
+        self.max_days = max_days
+        self._lock = threading.Lock()
+        self._days: "OrderedDict[object, _Day]" = OrderedDict()
+        self._last_day: _Day | None = None
+
+    # ------------------------ 查询接口 ------------------------
+
+    def cycle_start(self, interval: int, ts: float | None = None, offset_cycles: int = 0) -> int:
+        """ts 所在周期（向后/向前偏移 offset_cycles 个周期）的起点 Unix 秒"""
+        if ts is None:
+            ts = time.time()
+        day = self._day_for(ts)
+        bounds = self.day_boundaries_for(day, interval)
+        index = self._index_in_day(day, bounds, interval, ts) + offset_cycles
+
+        # 偏移跨天时逐日移动
+        while index < 0:
+            day = self._day_for(day.start - 1)
+            bounds = self.day_boundaries_for(day, interval)
+            index += len(bounds)
+        while index >= len(bounds):
+            index -= len(bounds)
+            day = self._day_for(day.end)
+            bounds = self.day_boundaries_for(day, interval)
+        return bounds[index]
+
+    def next_cycle_start(self, interval: int, ts: float | None = None) -> int:
+        return self.cycle_start(interval, ts, 1)
+
+    def day_boundaries(self, interval: int, ts: float | None = None) -> array:
+        """ts 所在当地自然日内该周期长度的所有起点（int64 数组）"""
+        return self.day_boundaries_for(self._day_for(time.time() if ts is None else ts), interval)
+
+    def day_boundaries_for(self, day: _Day, interval: int) -> array:
+        bounds = day._boundaries.get(interval)
+        if bounds is None:
+            bounds = self._build_boundaries(day, interval)
+            day._boundaries[interval] = bounds
+        return bounds
+
+    # ------------------------ 内部实现 ------------------------
+
+    def _index_in_day(self, day: _Day, bounds: array, interval: int, ts: float) -> int:
+        if interval < _WALL_CLOCK_MIN_INTERVAL:
+            return int((ts - day.start) // interval)
+        return bisect_right(bounds, ts) - 1
+
+    def _day_for(self, ts: float) -> _Day:
+        day = self._last_day
+        if day is not None and day.start <= ts < day.end:
+            return day
+
+        local_date = datetime.fromtimestamp(ts, self.tz).date()
+        with self._lock:
+            day = self._days.get(local_date)
+            if day is None:
+                day = _Day(local_date, self._local_midnight(local_date), self._local_midnight(local_date + timedelta(days=1)))
+                self._days[local_date] = day
+                while len(self._days) > self.max_days:
+                    self._days.popitem(last=False)
+            else:
+                self._days.move_to_end(local_date)
+        self._last_day = day
+        return day
+
+    def _local_midnight(self, local_date) -> int:
+        naive = datetime(local_date.year, local_date.month, local_date.day)
+        return int(self.tz.localize(naive).timestamp())
+
+    def _build_boundaries(self, day: _Day, interval: int) -> array:
+        if interval < _WALL_CLOCK_MIN_INTERVAL:
+            return array("q", range(day.start, day.end, interval))
+
+        # 墙钟周期：按当地整点生成，夏令时跳过/重复的时刻由 normalize 处理后去重
+        hours = interval // 3600
+        naive_midnight = datetime(day.date.year, day.date.month, day.date.day)
+        starts = []
+        for hour in range(0, 24, hours):
+            local = self.tz.normalize(self.tz.localize(naive_midnight + timedelta(hours=hour), is_dst=False))
+            value = int(local.timestamp())
+            if day.start <= value < day.end and (not starts or value > starts[-1]):
+                starts.append(value)
+        return array("q", starts)
+
+
+# 模块级默认日历（美东时间）
+_DEFAULT_CALENDAR = CycleCalendar()
+
+
+def cycle_start_ts(interval: int, ts: float | None = None, offset_cycles: int = 0) -> int:
+    return _DEFAULT_CALENDAR.cycle_start(interval, ts, offset_cycles)
+
+
+def next_cycle_start_ts(interval: int, ts: float | None = None) -> int:
+    return _DEFAULT_CALENDAR.next_cycle_start(interval, ts)
+
+
+def day_boundaries(interval: int, ts: float | None = None) -> array:
+    return _DEFAULT_CALENDAR.day_boundaries(interval, ts)
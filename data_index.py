@@ -0,0 +1,293 @@
+"""
+按天的数据索引：每个 data/YYYY-MM/YYYY-MM-DD/ 目录一个 _index.json，记录各 CSV 的
+行数、首末时间、缺失秒数与 none 值数、每分钟第一行的字节偏移以及内容校验和（crc32）
+
+  - 缺失秒数统计当天零点到当天结束（当天的文件统计到此刻）之间没有任何行的秒，
+    包括首行之前与末行之后的时间；日期按落盘时区（POLYMARKET_DATA_TIMEZONE）判断
+
+  - 增量更新：文件只追加时从上次索引到的位置继续扫描；被替换（如 backfill.py 合并补数）或截断时整体重建
+  - 只索引完整的行：写盘缓冲区刷出的半行留到下次
+  - 范围查询按分钟偏移直接 seek，不需要解析整天的文件
+
+用法：
+    python data_index.py build                        # 增量更新 data/ 下所有日期目录
+    python data_index.py build data/2025-01/2025-01-01
+    python data_index.py query BTC5MIN 2025-01-01 14:00 14:15
+    python data_index.py show 2025-01-01
+"""
+import argparse
+import bisect
+import csv
+import io
+import json
+import os
+import sys
+import zlib
+from datetime import datetime
+
+import pytz
+from dotenv import load_dotenv
+
+INDEX_NAME = "_index.json"
+INDEX_VERSION = 2
+SECONDS_PER_DAY = 24 * 3600
+# 视为取价失败的哨兵值（Polymarket 为 none，币安为 0）
+SENTINELS = {"none", "0"}
+
+
+def day_dir(base_dir: str, date_str: str) -> str:
+    return os.path.join(base_dir, date_str[:7], date_str)
+
+
+def second_of_day(time_str: str) -> int | None:
+    """落盘时间字符串（YYYY-MM-DD HH:MM:SS[.mmm]）当天的秒数"""
+    try:
+        return int(time_str[11:13]) * 3600 + int(time_str[14:16]) * 60 + int(time_str[17:19])
+    except (ValueError, IndexError):
+        return None
+
+
+def data_now() -> datetime:
+    """落盘时区的当前时间（与 main.get_data_now 相同的时区配置）"""
+    timezone_name = os.getenv("POLYMARKET_DATA_TIMEZONE", "").strip().strip('"').strip("'") or "Asia/Shanghai"
+    return datetime.now(pytz.timezone(timezone_name))
+
+
+def day_end_second(date_str: str, now: datetime) -> int:
+    """某天应当有数据的秒数：已过去的日期为整天，当天到 now 为止，未来的日期为 0"""
+    today = now.strftime("%Y-%m-%d")
+    if date_str < today:
+        return SECONDS_PER_DAY
+    if date_str > today:
+        return 0
+    return now.hour * 3600 + now.minute * 60 + now.second
+
+
+def _empty_entry() -> dict:
+    return {
+        "size": 0,
+        "mtime_ns": 0,
+        "inode": 0,
+        "header": [],
+        "rows": 0,
+        "first": None,
+        "last": None,
+        "last_offset": None,
+        "missing": 0,
+        # 相邻两行之间的缺失秒数（增量扫描时累加），missing 在此基础上加上首行之前与末行之后的部分
+        "gaps": 0,
+        "none": 0,
+        "minutes": {},
+        "crc32": 0,
+    }
+
+
+def _can_resume(f, entry: dict, stat) -> bool:
+    """同一个文件且只在末尾追加：上次最后一行仍在原位置"""
+    if not entry or stat.st_ino != entry["inode"] or stat.st_size < entry["size"]:
+        return False
+    if entry["last_offset"] is None:
+        return entry["size"] > 0
+    f.seek(entry["last_offset"])
+    return f.readline().decode("utf-8", "replace").startswith(entry["last"])
+
+
+def _with_missing(entry: dict, end_second: int) -> dict:
+    """按 [0, end_second) 计算缺失秒数；结果不变时原样返回 entry"""
+    if entry["first"] is None:
+        missing = end_second
+    else:
+        first = second_of_day(entry["first"])
+        last = second_of_day(entry["last"])
+        missing = min(first, end_second) + entry["gaps"] + max(0, end_second - last - 1)
+    if missing == entry["missing"]:
+        return entry
+    return dict(entry, missing=missing)
+
+
+def index_file(path: str, entry: dict | None = None, end_second: int = SECONDS_PER_DAY) -> dict:
+    """
+    返回文件的索引条目；entry 为上次的条目，文件未变化时原样返回（缺失秒数变化时除外），只追加时增量扫描
+    end_second 为当天应当有数据的秒数（见 day_end_second）
+    """
+    stat = os.stat(path)
+    if entry and (entry["size"], entry["mtime_ns"], entry["inode"]) == (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+        return _with_missing(entry, end_second)
+
+    with open(path, "rb") as f:
+        if _can_resume(f, entry, stat):
+            entry = dict(entry, minutes=dict(entry["minutes"]))
+        else:
+            entry = _empty_entry()
+        f.seek(entry["size"])
+        data = f.read()
+
+    # 只处理完整的行
+    end = data.rfind(b"\n") + 1
+    data = data[:end]
+    offset = entry["size"]
+    last_second = second_of_day(entry["last"]) if entry["last"] else None
+    for line in data.splitlines(keepends=True):
+        line_offset, offset = offset, offset + len(line)
+        text = line.decode("utf-8", "replace").rstrip("\r\n")
+        if line_offset == 0:
+            entry["header"] = next(csv.reader([text]), [])
+            continue
+        if not text:
+            continue
+        time_str, _, rest = text.partition(",")
+        second = second_of_day(time_str)
+        if second is None:
+            continue
+        entry["rows"] += 1
+        entry["minutes"].setdefault(time_str[11:16], line_offset)
+        if entry["first"] is None:
+            entry["first"] = time_str
+        if last_second is not None and second > last_second + 1:
+            entry["gaps"] += second - last_second - 1
+        if rest.partition(",")[0] in SENTINELS:
+            entry["none"] += 1
+        entry["last"] = time_str
+        entry["last_offset"] = line_offset
+        last_second = second
+
+    entry["size"] = offset
+    entry["crc32"] = zlib.crc32(data, entry["crc32"])
+    entry["inode"] = stat.st_ino
+    # 末尾有半行时不记录 mtime，下次一定会重新检查
+    entry["mtime_ns"] = stat.st_mtime_ns if offset == stat.st_size else 0
+    return _with_missing(entry, end_second)
+
+
+def load_index(directory: str) -> dict:
+    try:
+        with open(os.path.join(directory, INDEX_NAME), encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {"version": INDEX_VERSION, "files": {}}
+    if index.get("version") != INDEX_VERSION:
+        return {"version": INDEX_VERSION, "files": {}}
+    return index
+
+
+def save_index(directory: str, index: dict):
+    path = os.path.join(directory, INDEX_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def update_day(directory: str, names: list | None = None, now: datetime | None = None) -> dict:
+    """
+    增量更新一个日期目录的索引（names 只更新指定文件），有变化时写回 _index.json
+    now 为落盘时区的当前时间（默认此刻），决定当天的文件缺失秒数统计到哪一秒
+    """
+    end_second = day_end_second(os.path.basename(os.path.normpath(directory)), now or data_now())
+    index = load_index(directory)
+    files = index["files"]
+    present = sorted(name for name in os.listdir(directory) if name.endswith(".csv"))
+    changed = False
+    for name in list(files):
+        if name not in present:
+            del files[name]
+            changed = True
+    for name in names if names is not None else present:
+        if name not in present:
+            continue
+        entry = index_file(os.path.join(directory, name), files.get(name), end_second)
+        if entry is not files.get(name):
+            files[name] = entry
+            changed = True
+    if changed:
+        save_index(directory, index)
+    return index
+
+
+def day_dirs(base_dir: str = "data") -> list:
+    """data/YYYY-MM/YYYY-MM-DD 目录，跳过隐藏目录（如写盘溢出的 .spill）"""
+    result = []
+    for month in sorted(os.listdir(base_dir)) if os.path.isdir(base_dir) else []:
+        month_dir = os.path.join(base_dir, month)
+        if month.startswith(".") or not os.path.isdir(month_dir):
+            continue
+        for day in sorted(os.listdir(month_dir)):
+            path = os.path.join(month_dir, day)
+            if not day.startswith(".") and os.path.isdir(path):
+                result.append(path)
+    return result
+
+
+def query(base_dir: str, stem: str, date_str: str, start: str, end: str) -> tuple:
+    """
+    返回 (表头, 行列表)：stem 序列在 date_str 当天 [start, end]（HH:MM 或 HH:MM:SS）内的行
+    先增量更新该文件的索引，再从 start 所在分钟的偏移开始读取
+    """
+    directory = day_dir(base_dir, date_str)
+    name = f"{stem}_{date_str}.csv"
+    if not os.path.isdir(directory):
+        return [], []
+    entry = update_day(directory, [name])["files"].get(name)
+    if entry is None:
+        return [], []
+
+    start_key = start if len(start) > 5 else f"{start}:00"
+    end_key = end if len(end) > 5 else f"{end}:59"
+    minutes = sorted(entry["minutes"])
+    position = bisect.bisect_left(minutes, start_key[:5])
+    if position == len(minutes):
+        return entry["header"], []
+
+    rows = []
+    with open(os.path.join(directory, name), "rb") as f:
+        f.seek(entry["minutes"][minutes[position]])
+        # 只读到已索引的位置，之后追加的半行不会被解析
+        reader = csv.reader(io.StringIO(f.read(entry["size"] - f.tell()).decode("utf-8", "replace"), newline=""))
+        for row in reader:
+            if not row:
+                continue
+            clock = row[0][11:19]
+            if clock < start_key:
+                continue
+            if clock > end_key:
+                break
+            rows.append(row)
+    return entry["header"], rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="data/ 按天索引：增量构建与按时间范围查询")
+    parser.add_argument("--base-dir", default="data", help="数据根目录，默认 data")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="增量更新索引")
+    build.add_argument("dirs", nargs="*", help="日期目录，默认 data/ 下全部")
+    show = sub.add_parser("show", help="打印某天各文件的统计")
+    show.add_argument("date", help="YYYY-MM-DD")
+    query_parser = sub.add_parser("query", help="按时间范围读取一个序列")
+    query_parser.add_argument("stem", help="文件名前缀，如 BTC5MIN、BTC_BINANCE")
+    query_parser.add_argument("date", help="YYYY-MM-DD")
+    query_parser.add_argument("start", help="HH:MM 或 HH:MM:SS")
+    query_parser.add_argument("end", help="HH:MM 或 HH:MM:SS（含）")
+    args = parser.parse_args(argv)
+    # 与 main.py 相同从 .env 读取落盘时区
+    load_dotenv()
+
+    if args.command == "build":
+        for directory in args.dirs or day_dirs(args.base_dir):
+            index = update_day(directory)
+            print(f"{directory}: {len(index['files'])} 个文件")
+    elif args.command == "show":
+        index = update_day(day_dir(args.base_dir, args.date))
+        for name, entry in index["files"].items():
+            print(f"{name}: {entry['rows']} 行 {entry['first']} ~ {entry['last']} "
+                  f"缺失 {entry['missing']} 秒 none {entry['none']} crc32 {entry['crc32']:08x}")
+    else:
+        header, rows = query(args.base_dir, args.stem, args.date, args.start, args.end)
+        writer = csv.writer(sys.stdout)
+        if header:
+            writer.writerow(header)
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+import os
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+# 二进制盘口深度文件格式（小端）：
+#   文件头:   magic(4s) 版本(B) 档数(B)
+#   记录头:   类型(B) ts_ms(q) 结果序号(B) 条目数(H)
+#     类型 0 快照: 条目为该结果 token 当前全部档位
+#     类型 1 增量: 条目为相对上一状态变化的档位，数量为 0 表示删除该档
+#     类型 2 token: 条目数为随后 token_id 的 UTF-8 字节数，后续记录属于该 token
+#   档位:     方向(B, 0 买 1 卖) 价格(H, 1e-4) 数量(I, 1e-2)
+_MAGIC = b"PMD1"
+_VERSION = 1
+_FILE_HEADER = struct.Struct("<4sBB")
+_RECORD_HEADER = struct.Struct("<BqBH")
+_LEVEL = struct.Struct("<BHI")
+
+KIND_SNAPSHOT = 0
+KIND_DELTA = 1
+KIND_TOKEN = 2
+
+OUTCOMES = ("UP", "DOWN")
+BID, ASK = 0, 1
+
+PRICE_SCALE = 10_000
+SIZE_SCALE = 100
+_MAX_PRICE = 0xFFFF
+_MAX_SIZE = 0xFFFFFFFF
+
+
+def quantize_levels(bids: list, asks: list, depth: int) -> Dict[tuple, int]:
+    """把 [(价格, 数量)] 转换为 {(方向, 价格整数): 数量整数}，只保留前 depth 档"""
+    levels = {}
+    for side, side_levels in ((BID, bids), (ASK, asks)):
+        count = 0
+        for price, size in side_levels:
+            if count >= depth:
+                break
+            price_q = min(round(price * PRICE_SCALE), _MAX_PRICE)
+            size_q = min(round(size * SIZE_SCALE), _MAX_SIZE)
+            if price_q <= 0 or size_q <= 0 or (side, price_q) in levels:
+                continue
+            levels[(side, price_q)] = size_q
+            count += 1
+    return levels
+
+
+class _OutcomeState:
+    __slots__ = ("token_id", "levels", "last_snapshot_ms")
+
+    def __init__(self):
+        self.token_id: Optional[str] = None
+        self.levels: Dict[tuple, int] = {}
+        self.last_snapshot_ms = 0
+
+
+class _OpenDepthFile:
+    __slots__ = ("handle", "date_str", "states")
+
+    def __init__(self, handle, date_str: str):
+        self.handle = handle
+        self.date_str = date_str
+        self.states: Dict[str, _OutcomeState] = {}
+
+
+class DepthRecorder:
+    """
+    UP/DOWN token 的前 N 档盘口落盘：每个市场每天一个二进制文件
+    {base_dir}/YYYY-MM/YYYY-MM-DD/{stem}_DEPTH_YYYY-MM-DD.bin
+
+    每个 token 每隔 snapshot_interval 秒（以及换 token、新文件时）写一次完整快照，
+    其余采样只写变化的档位；盘口无变化的采样不写任何字节
+    """
+
+    def __init__(
+            self,
+            base_dir: str = "data",
+            levels: int = 10,
+            snapshot_interval: float = 60.0,
+            flush_interval: float = 1.0,
+    ):
+        if not 0 < levels <= 255:
+            raise ValueError("levels 必须在 1~255 之间")
+        self.base_dir = base_dir
+        self.levels = levels
+        self.snapshot_interval_ms = int(snapshot_interval * 1000)
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._files: Dict[tuple, _OpenDepthFile] = {}
+        self._current_date: Optional[str] = None
+        self._last_flush = time.monotonic()
+        self.stats = {"snapshots": 0, "deltas": 0, "unchanged": 0, "bytes": 0, "files": 0}
+
+    def record(self, stem: str, current_datetime: datetime, outcome: str, token_id: str, bids: list, asks: list):
+        """记录一个 token 在 current_datetime 的盘口；bids/asks 为 [(价格, 数量)]"""
+        outcome_index = OUTCOMES.index(outcome)
+        ts_ms = int(current_datetime.timestamp() * 1000)
+        levels = quantize_levels(bids, asks, self.levels)
+        date_str = current_datetime.strftime('%Y-%m-%d')
+
+        with self._lock:
+            if self._current_date is None or date_str > self._current_date:
+                self._rotate(date_str)
+
+            key = (stem, date_str)
+            open_file = self._files.get(key)
+            if open_file is None:
+                open_file = self._open(stem, date_str)
+                self._files[key] = open_file
+
+            state = open_file.states.get(outcome)
+            if state is None:
+                state = open_file.states[outcome] = _OutcomeState()
+
+            chunks = []
+            if token_id != state.token_id:
+                token_bytes = token_id.encode("utf-8")
+                chunks.append(_RECORD_HEADER.pack(KIND_TOKEN, ts_ms, outcome_index, len(token_bytes)))
+                chunks.append(token_bytes)
+                state.token_id = token_id
+                state.last_snapshot_ms = 0
+
+            if not state.last_snapshot_ms or ts_ms - state.last_snapshot_ms >= self.snapshot_interval_ms:
+                chunks.append(_encode(KIND_SNAPSHOT, ts_ms, outcome_index, levels.items()))
+                state.last_snapshot_ms = ts_ms
+                self.stats["snapshots"] += 1
+            else:
+                changes = [(k, size) for k, size in levels.items() if state.levels.get(k) != size]
+                changes.extend((k, 0) for k in state.levels if k not in levels)
+                if changes:
+                    chunks.append(_encode(KIND_DELTA, ts_ms, outcome_index, changes))
+                    self.stats["deltas"] += 1
+                else:
+                    self.stats["unchanged"] += 1
+            state.levels = levels
+
+            if chunks:
+                data = b"".join(chunks)
+                open_file.handle.write(data)
+                self.stats["bytes"] += len(data)
+
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            for open_file in self._files.values():
+                open_file.handle.close()
+            self._files.clear()
+
+    # ------------------------ 内部实现 ------------------------
+
+    def _open(self, stem: str, date_str: str) -> _OpenDepthFile:
+        directory = os.path.join(self.base_dir, date_str[:7], date_str)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{stem}_DEPTH_{date_str}.bin")
+
+        # 同一天重启时追加写入：先截掉上次异常退出留下的半条记录，新会话从快照开始
+        valid_length = _valid_length(path) if os.path.exists(path) else 0
+        handle = open(path, "r+b" if valid_length else "wb", buffering=64 * 1024)
+        if valid_length:
+            handle.truncate(valid_length)
+            handle.seek(valid_length)
+        else:
+            handle.write(_FILE_HEADER.pack(_MAGIC, _VERSION, self.levels))
+        self.stats["files"] += 1
+        return _OpenDepthFile(handle, date_str)
+
+    def _flush(self):
+        for open_file in self._files.values():
+            open_file.handle.flush()
+        self._last_flush = time.monotonic()
+
+    def _rotate(self, date_str: str):
+        self._current_date = date_str
+        for key, open_file in list(self._files.items()):
+            if open_file.date_str < date_str:
+                open_file.handle.close()
+                del self._files[key]
+
+
+def _encode(kind: int, ts_ms: int, outcome_index: int, entries) -> bytes:
+    entries = list(entries)
+    parts = [_RECORD_HEADER.pack(kind, ts_ms, outcome_index, len(entries))]
+    parts.extend(_LEVEL.pack(side, price, size) for (side, price), size in entries)
+    return b"".join(parts)
+
+
+# ======================== 读取 ========================
+
+def iter_records(path: str) -> Iterator[tuple]:
+    """
+    按顺序读取记录，产出 (类型, ts_ms, 结果, 内容)
+    快照/增量的内容为 [(方向, 价格整数, 数量整数)]，token 记录的内容为 token_id；末尾的半条记录忽略
+    """
+    with open(path, "rb") as f:
+        header = f.read(_FILE_HEADER.size)
+        if len(header) < _FILE_HEADER.size or _FILE_HEADER.unpack(header)[0] != _MAGIC:
+            raise ValueError(f"不是盘口深度文件: {path}")
+
+        while True:
+            raw = f.read(_RECORD_HEADER.size)
+            if len(raw) < _RECORD_HEADER.size:
+                return
+            kind, ts_ms, outcome_index, count = _RECORD_HEADER.unpack(raw)
+            if kind == KIND_TOKEN:
+                payload = f.read(count)
+                if len(payload) < count:
+                    return
+                yield kind, ts_ms, OUTCOMES[outcome_index], payload.decode("utf-8")
+                continue
+
+            payload = f.read(count * _LEVEL.size)
+            if len(payload) < count * _LEVEL.size:
+                return
+            yield kind, ts_ms, OUTCOMES[outcome_index], list(_LEVEL.iter_unpack(payload))
+
+
+def _valid_length(path: str) -> int:
+    """文件中完整记录的总字节数；文件头无效时返回 0（整个文件重写）"""
+    with open(path, "rb") as f:
+        header = f.read(_FILE_HEADER.size)
+        if len(header) < _FILE_HEADER.size or _FILE_HEADER.unpack(header)[0] != _MAGIC:
+            return 0
+        valid = f.tell()
+        while True:
+            raw = f.read(_RECORD_HEADER.size)
+            if len(raw) < _RECORD_HEADER.size:
+                return valid
+            kind, _, _, count = _RECORD_HEADER.unpack(raw)
+            length = count if kind == KIND_TOKEN else count * _LEVEL.size
+            if len(f.read(length)) < length:
+                return valid
+            valid = f.tell()
+
+
+def _book_view(state: dict) -> dict:
+    levels = state["levels"]
+    return {
+        "token_id": state["token_id"],
+        "ts_ms": state["ts_ms"],
+        "bids": sorted(((p / PRICE_SCALE, s / SIZE_SCALE) for (side, p), s in levels.items() if side == BID),
+                       reverse=True),
+        "asks": sorted((p / PRICE_SCALE, s / SIZE_SCALE) for (side, p), s in levels.items() if side == ASK),
+    }
+
+
+def read_book_at(path: str, ts_ms: int) -> dict:
+    """
+    重建 ts_ms 时刻（含）各结果的盘口，返回 {结果: {"token_id", "ts_ms", "bids", "asks"}}
+    bids 从高到低、asks 从低到高，均为 [(价格, 数量)]；ts_ms 早于首条记录时返回空字典
+    """
+    states: Dict[str, dict] = {}
+    for kind, record_ts, outcome, payload in iter_records(path):
+        if record_ts > ts_ms:
+            break
+        state = states.setdefault(outcome, {"token_id": None, "ts_ms": record_ts, "levels": {}})
+        if kind == KIND_TOKEN:
+            state["token_id"] = payload
+            state["levels"] = {}
+        elif kind == KIND_SNAPSHOT:
+            state["levels"] = {(side, price): size for side, price, size in payload}
+        else:
+            for side, price, size in payload:
+                if size:
+                    state["levels"][(side, price)] = size
+                else:
+                    state["levels"].pop((side, price), None)
+        state["ts_ms"] = record_ts
+    return {outcome: _book_view(state) for outcome, state in states.items()}
+
+
+# 命令行：python depth_recorder.py <文件> "YYYY-MM-DD HH:MM:SS" [时区]
+if __name__ == "__main__":
+    import pytz
+
+    if len(sys.argv) < 3:
+        print('用法: python depth_recorder.py <文件> "YYYY-MM-DD HH:MM:SS" [时区，默认 Asia/Shanghai]')
+        sys.exit(1)
+
+    tz = pytz.timezone(sys.argv[3] if len(sys.argv) > 3 else "Asia/Shanghai")
+    at = tz.localize(datetime.strptime(sys.argv[2], "%Y-%m-%d %H:%M:%S"))
+    books = read_book_at(sys.argv[1], int(at.timestamp() * 1000))
+    if not books:
+        print("该时刻之前没有记录")
+    for outcome, book in books.items():
+        print(f"[{outcome}] token={book['token_id']} 更新于 {datetime.fromtimestamp(book['ts_ms'] / 1000, tz)}")
+        for price, size in reversed(book["asks"]):
+            print(f"    卖 {price:.4f}  {size:.2f}")
+        for price, size in book["bids"]:
+            print(f"    买 {price:.4f}  {size:.2f}")
@@ -1,14 +1,38 @@
 import time
-import csv
+# 进程启动时刻，用于统计启动到首个采样的耗时
+_STARTED_AT = time.monotonic()
+import json
 import os
 import sys
 import pytz
 import requests
-from datetime import datetime, timedelta
+from collections import deque
+from datetime import datetime
+from urllib.parse import urlparse
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from py_clob_client.client import ClobClient
-from crypto15 import update_all_token_ids, update_all_5m_token_ids
+from clob_book import best_bid_ask, format_price, resolve_mid, top_levels
+from crypto15 import (
+    cache_capacity, get_cache_stats, invalidate_market, prefetch_next_market_token_ids, set_cache_capacity,
+    update_market_token_ids, update_registry_token_ids,
+)
+from tick_scheduler import Tick, TickScheduler
+from cycle_calendar import ET_TZ, INTERVALS, next_cycle_start_ts
+from csv_writer import CsvSink
+from data_index import update_day as update_data_index
+from writer_queue import BackgroundWriter
+from market_registry import load_registry
+from rate_limit import default_limiter, parse_host_rates
+from supervisor import Supervisor
+from tracing import ProfileController, Tracer
+from metrics import (
+    FAILURE_STREAK, REFRESH_SECONDS, TICK_LAG_SECONDS, TICK_SECONDS, TICKS_MISSED, WRITE_SECONDS, MetricsServer,
+    default_registry, observe_request,
+)
+from state_store import (
+    DEFAULT_STATE_FILE, account_fingerprint, creds_entry, load_state, market_entries, save_state, valid_creds,
+    valid_markets,
+)
 
 load_dotenv(override=True)
 
@@ -29,81 +53,239 @@ POLYMARKET_CONFIG = {
     "PRIVATE_KEY": get_env_value("POLYMARKET_PRIVATE_KEY", ""),
     "SIGNATURE_TYPE": int(os.getenv("POLYMARKET_SIGNATURE_TYPE", "2")),
     "DATA_TIMEZONE": get_env_value("POLYMARKET_DATA_TIMEZONE", "Asia/Shanghai"),
+    # poll: 每秒 REST 轮询 get_midpoint；bulk: 每秒一次批量 /books 请求，本地计算中间价；
+    # stream: 订阅 CLOB WebSocket 行情，采样内存中的实时盘口
+    "PRICE_MODE": get_env_value("POLYMARKET_PRICE_MODE", "poll").lower(),
+    "WS_URL": get_env_value("POLYMARKET_WS_URL", "wss://ws-subscriptions-clob.polymarket.com/ws/market"),
 }
 
 COLLECTION_CONFIG = {
     "ENABLE_POLYMARKET": get_env_bool("ENABLE_POLYMARKET", "1"),
     "ENABLE_BINANCE": get_env_bool("ENABLE_BINANCE", "1"),
+    # 采样周期（秒），周期边界对齐墙钟
+    "SAMPLE_PERIOD": float(get_env_value("SAMPLE_PERIOD_SECONDS", "1") or "1"),
+    # 额外记录每个周期的计划时刻与实际响应时刻（TICKS_YYYY-MM-DD.csv）
+    "RECORD_TICKS": get_env_bool("RECORD_TICKS", "1"),
+    # thread: 常驻线程池 + requests；asyncio: 常驻事件循环 + aiohttp 连接池
+    "ENGINE": get_env_value("COLLECTOR_ENGINE", "thread").lower(),
+    # 批量请求（/books、ticker/price）单次携带的市场数上限，超出时拆成多个分片并发请求
+    "FETCH_SHARD_SIZE": int(get_env_value("FETCH_SHARD_SIZE", "100") or "100"),
+    # 数据源内部的并发请求数（逐个轮询与分片请求共用）
+    "FETCH_CONCURRENCY": int(get_env_value("FETCH_CONCURRENCY", "16") or "16"),
+    # 采样多少个周期后正常退出（0 为不限），用于启动耗时基准测试
+    "MAX_TICKS": int(get_env_value("COLLECTOR_MAX_TICKS", "0") or "0"),
 }
 
+# 市场注册表：资产 × 周期 × 结果集合，以及对应的币安参考交易对（markets.json / MARKET_REGISTRY_FILE）
+MARKET_REGISTRY = load_registry(get_env_value("MARKET_REGISTRY_FILE", "") or None)
+
 # 全局变量
-MARKET_TOKEN_IDS = {
-    "BTC": {"UP": "none"},
-    "ETH": {"UP": "none"},
-    "SOL": {"UP": "none"},
-    "XRP": {"UP": "none"},
-    "BTC5": {"UP": "none"},  # BTC 5分钟周期
-    "ETH5": {"UP": "none"},  # ETH 5分钟周期
-    "SOL5": {"UP": "none"},  # SOL 5分钟周期
-    "XRP5": {"UP": "none"},  # XRP 5分钟周期
-}
+MARKET_TOKEN_IDS = MARKET_REGISTRY.token_map()
+
+# 市场元数据缓存容量：默认按注册表规模（每个市场 4 个周期的条目，至少 256）
+set_cache_capacity(
+    int(get_env_value("MARKET_CACHE_CAPACITY", "0") or "0") or cache_capacity(len(MARKET_REGISTRY.markets))
+)
 
 # 用于跟踪连续获取 none 的次数
-none_counter = {
-    "BTC": 0,
-    "ETH": 0,
-    "SOL": 0,
-    "XRP": 0,
-    "BTC5": 0,
-    "ETH5": 0,
-    "SOL5": 0,
-    "XRP5": 0,
-}
+none_counter = {key: 0 for key in MARKET_TOKEN_IDS}
 
-binance_none_counter = {
-    "BTC": 0,
-    "ETH": 0,
-    "SOL": 0,
-    "XRP": 0,
+TOKEN_REFRESH_CONFIG = {
+    # 周期边界前多少秒开始预取下一周期的 token
+    "PREFETCH_LEAD": float(get_env_value("TOKEN_PREFETCH_LEAD_SECONDS", "30") or "30"),
+    # 周期边界前多少秒切换到新 token，保证边界那一秒采样的已是新市场
+    "SWAP_LEAD": float(get_env_value("TOKEN_SWAP_LEAD_SECONDS", "0.2") or "0.2"),
 }
 
 # 连续 none 的阈值（15秒=15次）
 MAX_NONE_COUNT = 15
 
-BINANCE_SYMBOLS = {
-    "BTC": "BTCUSDT",
-    "ETH": "ETHUSDT",
-    "SOL": "SOLUSDT",
-    "XRP": "XRPUSDT",
+SUPERVISOR_CONFIG = {
+    # 连续失败多少次后熔断并重建对应组件（数据源客户端 / 单个市场的 token）
+    "FAILURE_THRESHOLD": int(get_env_value("SUPERVISOR_FAILURE_THRESHOLD", str(MAX_NONE_COUNT)) or MAX_NONE_COUNT),
+    # 重建失败或重建后仍失败时，再次重建前的冷却秒数（每次翻倍）
+    "COOLDOWN": float(get_env_value("SUPERVISOR_COOLDOWN", "10") or "10"),
+    # 兼容旧行为：连续失败达到阈值时重启整个进程
+    "RESTART_ON_FAILURE": get_env_bool("RESTART_ON_FAILURE", "0"),
 }
+supervisor = Supervisor(SUPERVISOR_CONFIG["FAILURE_THRESHOLD"], SUPERVISOR_CONFIG["COOLDOWN"])
+
+BINANCE_SYMBOLS = dict(MARKET_REGISTRY.binance_symbols)
 
-BINANCE_API_URL = "https://api.binance.com/api/v3/ticker/price"
+binance_none_counter = {coin: 0 for coin in BINANCE_SYMBOLS}
+
+BINANCE_API_URL = get_env_value("BINANCE_API_URL", "") or "https://api.binance.com/api/v3/ticker/price"
 binance_session = requests.Session()
 
+# 各主机共享的请求预算（令牌桶 + 自适应并发），可用 RATE_LIMITS="host=每秒请求数:突发容量,..." 覆盖默认值
+rate_limiter = default_limiter
+for _host, (_rate, _burst) in parse_host_rates(get_env_value("RATE_LIMITS", "")).items():
+    rate_limiter.configure(_host, _rate, _burst)
+TRACE_CONFIG = {
+    # 持续记录每个采样周期各阶段的区间（环形缓冲区），退出时写出 Chrome trace JSON
+    "ENABLED": get_env_bool("ENABLE_TRACING", "0"),
+    "BUFFER_SPANS": int(get_env_value("TRACE_BUFFER_SPANS", "20000") or "20000"),
+    # 按需分析窗口：SIGUSR1 或创建触发文件（内容可写秒数）后开始，结果写入 PROFILE_DIR
+    "PROFILE_SECONDS": float(get_env_value("PROFILE_SECONDS", "30") or "30"),
+    "PROFILE_MODE": get_env_value("PROFILE_MODE", "sample").lower() or "sample",
+    "PROFILE_TRIGGER_FILE": get_env_value("PROFILE_TRIGGER_FILE", "profile.trigger"),
+    "PROFILE_DIR": get_env_value("PROFILE_DIR", "profiles") or "profiles",
+}
+tracer = Tracer(TRACE_CONFIG["BUFFER_SPANS"], enabled=TRACE_CONFIG["ENABLED"])
+profile_controller = None
+
+
+def on_request(host: str, status, seconds: float):
+    """每次请求尝试结束：耗时计入直方图；记录 trace 时同时生成一个请求区间（含重试的每一次）"""
+    observe_request(host, status, seconds)
+    if tracer.enabled:
+        ended = time.perf_counter()
+        tracer.record(f"request {host}", "http", ended - seconds, ended, {"status": status})
+
+
+rate_limiter.on_request = on_request
+
+METRICS_CONFIG = {
+    # Prometheus 指标端口（GET /metrics），0 为不启动
+    "PORT": int(get_env_value("METRICS_PORT", "0") or "0"),
+    "HOST": get_env_value("METRICS_HOST", "127.0.0.1") or "127.0.0.1",
+}
+metrics_server = None
+
+# 当前采样周期的截止时间（Unix 时间戳）：采样请求的重试不会超过它
+_tick_deadline = 0.0
+
+
+def tick_deadline() -> float:
+    """当前采样请求的截止时间；主循环之外调用时给出一个采样周期的预算"""
+    return _tick_deadline if _tick_deadline > time.time() else time.time() + COLLECTION_CONFIG["SAMPLE_PERIOD"]
+
+# 常驻线程池：避免每秒反复创建/销毁线程池
+# _SOURCE_EXECUTOR 用于同一周期内并发执行各数据源（Polymarket、币安、盘口深度），_REQUEST_EXECUTOR 用于数据源内部的逐请求并发
+_SOURCE_EXECUTOR = ThreadPoolExecutor(max_workers=3, thread_name_prefix="source")
+_REQUEST_EXECUTOR = ThreadPoolExecutor(max_workers=COLLECTION_CONFIG["FETCH_CONCURRENCY"], thread_name_prefix="fetch")
+
+
+def index_closed_day(directory: str):
+    """某一天的 CSV 全部关闭后（零点切换后的宽限期结束、退出时）增量更新该天的 _index.json"""
+    started = time.perf_counter()
+    index = update_data_index(directory)
+    print(f"已更新 {directory} 的数据索引（{len(index['files'])} 个文件，"
+          f"{(time.perf_counter() - started) * 1000:.0f}ms）")
+
+
+# 常驻句柄的 CSV 写入器：批量刷盘，按落盘时区零点轮转
+csv_sink = CsvSink(
+    "data",
+    flush_interval=float(get_env_value("CSV_FLUSH_INTERVAL", "1") or "1"),
+    flush_rows=int(get_env_value("CSV_FLUSH_ROWS", "256") or "256"),
+    on_day_closed=index_closed_day if get_env_bool("ENABLE_DATA_INDEX", "1") else None,
+    late_grace=float(get_env_value("CSV_LATE_GRACE_SECONDS", "60") or "60"),
+)
+# 可选的列式落盘（Parquet），与 CSV 并行写入
+parquet_sink = None
+async_collector = None
+
+DEPTH_CONFIG = {
+    # 记录每个市场 UP/DOWN token 的前 N 档盘口（快照 + 增量的二进制文件）
+    "ENABLED": get_env_bool("ENABLE_DEPTH_CAPTURE", "0"),
+    "LEVELS": int(get_env_value("DEPTH_LEVELS", "10") or "10"),
+    # 每个 token 完整快照的间隔秒数，其余采样只记录变化的档位
+    "SNAPSHOT_INTERVAL": float(get_env_value("DEPTH_SNAPSHOT_INTERVAL", "60") or "60"),
+}
+depth_recorder = None
+
+BINANCE_CONFIG = {
+    # poll: 每个币种单独请求 ticker/price；batch: 单次请求批量获取全部币种；
+    # stream: 常驻组合流 WebSocket，采样内存中的最新成交价
+    "PRICE_MODE": get_env_value("BINANCE_PRICE_MODE", "poll").lower(),
+    "WS_URL": get_env_value("BINANCE_WS_URL", "wss://stream.binance.com:9443/stream"),
+    # 成交级采集：stream 模式下额外落盘每一笔归集成交
+    "CAPTURE_TRADES": get_env_bool("BINANCE_CAPTURE_TRADES", "0"),
+}
+binance_stream = None
+# 重建组合流时旧流中尚未取走的成交行，下一个采样周期提交
+_orphan_trade_rows = deque()
+
+
+STATE_CONFIG = {
+    # 热启动：复用状态文件中的 API 凭证与当前周期的 token，启动后立即采样，后台再校验
+    "ENABLED": get_env_bool("ENABLE_WARM_START", "1"),
+    "FILE": get_env_value("COLLECTOR_STATE_FILE", "") or DEFAULT_STATE_FILE,
+}
+# 状态文件内容，在 init_polymarket_client 中读取
+collector_state = {}
+# 当前使用的凭证条目（写入状态文件）；warm_creds 表示凭证来自状态文件、尚待后台校验
+_creds_entry = None
+warm_creds = False
+# 本次启动是否恢复了状态文件中的市场（只用于首个采样的耗时报告）
+warm_started = False
+
 
 # ======================== 客户端初始化 ========================
-CLOB_API = "https://clob.polymarket.com"
+# CLOB_API_URL / BINANCE_API_URL / GAMMA_MARKETS_URL 可指向本地模拟服务做离线基准测试
+CLOB_API = get_env_value("CLOB_API_URL", "") or "https://clob.polymarket.com"
+CLOB_HOST = urlparse(CLOB_API).hostname or CLOB_API
 client = None
+polymarket_stream = None
+
+
+
+def get_account_fingerprint() -> str:
+    return account_fingerprint(
+        POLYMARKET_CONFIG["PRIVATE_KEY"], POLYMARKET_CONFIG["FUNDER_ADDRESS"], POLYMARKET_CONFIG["SIGNATURE_TYPE"]
+    )
+
+
+def create_clob_client(cached_creds: dict | None = None):
+    """创建 ClobClient；给出缓存的凭证时直接使用，否则派生 API 凭证（阻塞的网络请求）"""
+    # py_clob_client 会带入签名与加密依赖，只在启用 Polymarket 时才导入
+    from py_clob_client.client import ClobClient
+    from py_clob_client.clob_types import ApiCreds
+
+    global _creds_entry
+    new_client = ClobClient(
+        CLOB_API,
+        key=POLYMARKET_CONFIG["PRIVATE_KEY"],
+        chain_id=137,
+        signature_type=POLYMARKET_CONFIG["SIGNATURE_TYPE"],
+        funder=POLYMARKET_CONFIG["FUNDER_ADDRESS"],
+    )
+    if cached_creds is not None:
+        new_client.set_api_creds(ApiCreds(
+            cached_creds["api_key"], cached_creds["api_secret"], cached_creds["api_passphrase"]
+        ))
+        _creds_entry = cached_creds
+        return new_client
+
+    # Get & Set API credentials
+    creds = new_client.derive_api_key()
+    new_client.set_api_creds(creds)
+    _creds_entry = creds_entry(creds, get_account_fingerprint())
+    return new_client
+
 
-if COLLECTION_CONFIG["ENABLE_POLYMARKET"]:
+def init_polymarket_client():
+    """
+    启用 Polymarket 时读取状态文件并创建客户端；缺少密钥或初始化失败时自动关闭 Polymarket 采集
+    放在 main() 中调用，导入本模块不会发起网络请求
+    """
+    global client, collector_state, warm_creds
+    if not COLLECTION_CONFIG["ENABLE_POLYMARKET"]:
+        return
     if not POLYMARKET_CONFIG["PRIVATE_KEY"] or not POLYMARKET_CONFIG["FUNDER_ADDRESS"]:
         print("[警告] ENABLE_POLYMARKET=1 但缺少 Polymarket 密钥配置，已自动关闭 Polymarket 采集")
         COLLECTION_CONFIG["ENABLE_POLYMARKET"] = False
-    else:
-        try:
-            client = ClobClient(
-                CLOB_API,
-                key=POLYMARKET_CONFIG["PRIVATE_KEY"],
-                chain_id=137,
-                signature_type=POLYMARKET_CONFIG["SIGNATURE_TYPE"],
-                funder=POLYMARKET_CONFIG["FUNDER_ADDRESS"],
-            )
-            # Get & Set API credentials
-            creds = client.derive_api_key()
-            client.set_api_creds(creds)
-        except Exception as ex:
-            print(f"[警告] Polymarket 客户端初始化失败，已自动关闭 Polymarket 采集: {ex}")
-            COLLECTION_CONFIG["ENABLE_POLYMARKET"] = False
+        return
+    try:
+        if STATE_CONFIG["ENABLED"]:
+            collector_state = load_state(STATE_CONFIG["FILE"])
+        cached = valid_creds(collector_state, get_account_fingerprint()) if STATE_CONFIG["ENABLED"] else None
+        client = create_clob_client(cached)
+        warm_creds = cached is not None
+    except Exception as ex:
+        print(f"[警告] Polymarket 客户端初始化失败，已自动关闭 Polymarket 采集: {ex}")
+        COLLECTION_CONFIG["ENABLE_POLYMARKET"] = False
 
 
 def get_data_now() -> datetime:
@@ -112,11 +294,24 @@ def get_data_now() -> datetime:
     return datetime.now(pytz.timezone(timezone_name))
 
 
+def to_data_datetime(timestamp: float) -> datetime:
+    """将 Unix 时间戳转换为落盘时区的时间"""
+    timezone_name = POLYMARKET_CONFIG.get("DATA_TIMEZONE", "Asia/Shanghai")
+    return datetime.fromtimestamp(timestamp, pytz.timezone(timezone_name))
+
+
+def format_tick_time(current_datetime: datetime) -> str:
+    """落盘时间字符串；采样周期小于 1 秒时保留毫秒"""
+    if COLLECTION_CONFIG["SAMPLE_PERIOD"] < 1:
+        return current_datetime.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+    return current_datetime.strftime('%Y-%m-%d %H:%M:%S')
+
+
 def fetch_binance_single_price(symbol: str) -> str | None:
     """获取单个币安现货价格"""
     try:
-        response = binance_session.get(
-            BINANCE_API_URL,
+        response = rate_limiter.request(
+            binance_session, "GET", BINANCE_API_URL, tick_deadline(),
             params={"symbol": symbol},
             timeout=5,
         )
@@ -129,97 +324,580 @@ def fetch_binance_single_price(symbol: str) -> str | None:
     return None
 
 
-def fetch_binance_prices() -> dict | int:
-    """并发获取币安现货价格（BTC/ETH/SOL/XRP），任一失败则返回0"""
+def start_binance_stream():
+    """启动币安组合流订阅，失败时回退到 REST 轮询"""
+    global binance_stream
+    try:
+        from binance_ws import BinanceStream
+
+        capture_trades = BINANCE_CONFIG["CAPTURE_TRADES"]
+        stream = BinanceStream(BINANCE_SYMBOLS, BINANCE_CONFIG["WS_URL"], capture_trades=capture_trades)
+        stream.start()
+        binance_stream = stream
+        print("币安 WebSocket 行情订阅已启动" + ("（成交级采集已开启）" if capture_trades else ""))
+    except Exception as ex:
+        print(f"[警告] 币安 WebSocket 启动失败，回退到 REST 轮询: {ex}")
+        BINANCE_CONFIG["PRICE_MODE"] = "poll"
+
+
+def fetch_binance_batch_prices(symbols: dict) -> dict:
+    """单次请求批量获取多个币安现货价格（ticker/price 的 symbols 参数），返回 {coin: price}"""
+    coin_by_symbol = {symbol: coin for coin, symbol in symbols.items()}
+    response = rate_limiter.request(
+        binance_session, "GET", BINANCE_API_URL, tick_deadline(),
+        params={"symbols": json.dumps(list(symbols.values()), separators=(",", ":"))},
+        timeout=5,
+    )
+    response.raise_for_status()
+
+    result = {}
+    data = response.json()
+    for item in data if isinstance(data, list) else []:
+        coin = coin_by_symbol.get(item.get("symbol"))
+        if coin is not None and item.get("price") is not None:
+            result[coin] = str(item["price"])
+    return result
+
+
+def fetch_binance_fanout_prices(symbols: dict) -> dict:
+    """每个币种单独请求并发获取价格，返回成功的 {coin: price}"""
     result = {}
 
-    with ThreadPoolExecutor(max_workers=len(BINANCE_SYMBOLS)) as executor:
-        future_map = {
-            executor.submit(fetch_binance_single_price, symbol): coin
-            for coin, symbol in BINANCE_SYMBOLS.items()
-        }
+    future_map = {
+        _REQUEST_EXECUTOR.submit(fetch_binance_single_price, symbol): coin
+        for coin, symbol in symbols.items()
+    }
+
+    for future in as_completed(future_map):
+        coin = future_map[future]
+        price = future.result()
+        if price is not None:
+            result[coin] = price
 
-        for future in as_completed(future_map):
-            coin = future_map[future]
-            price = future.result()
-            if price is not None:
-                result[coin] = price
+    return result
+
+
+def shard_mapping(mapping: dict) -> list:
+    """按 FETCH_SHARD_SIZE 把 {键: 值} 拆成多个分片"""
+    size = max(1, COLLECTION_CONFIG["FETCH_SHARD_SIZE"])
+    items = list(mapping.items())
+    return [dict(items[i:i + size]) for i in range(0, len(items), size)]
 
-    if len(result) == len(BINANCE_SYMBOLS):
+
+def run_sharded(fetch_func, mapping: dict) -> list:
+    """
+    分片并发执行批量请求，返回各成功分片的结果；单个分片失败只影响该分片
+    市场数增加时分片同时发出，单周期耗时接近单个分片的耗时
+    """
+    shards = shard_mapping(mapping)
+    if len(shards) <= 1:
+        try:
+            return [fetch_func(shards[0])] if shards else []
+        except Exception:
+            return []
+
+    results = []
+    for future in [_REQUEST_EXECUTOR.submit(fetch_func, shard) for shard in shards]:
+        try:
+            results.append(future.result())
+        except Exception:
+            pass
+    return results
+
+
+def fetch_binance_prices() -> dict:
+    """获取注册表中各资产的币安现货价格，按资产独立返回，失败的资产不出现在结果中"""
+    if binance_stream is not None:
+        # 直接读取 WebSocket 维护的最新成交价，按币种独立返回，无网络请求
+        return binance_stream.get_prices()
+
+    if not BINANCE_SYMBOLS:
+        return {}
+
+    if BINANCE_CONFIG["PRICE_MODE"] == "batch":
+        result = {}
+        for shard in run_sharded(fetch_binance_batch_prices, BINANCE_SYMBOLS):
+            result.update(shard)
+        missing = {coin: symbol for coin, symbol in BINANCE_SYMBOLS.items() if coin not in result}
+        if missing:
+            # 整批失败（如单个交易对非法导致 400）或部分缺失时，仅对缺失币种逐个补请求
+            result.update(fetch_binance_fanout_prices(missing))
         return result
-    return 0
 
+    return fetch_binance_fanout_prices(BINANCE_SYMBOLS)
 
-def fetch_polymarket_prices() -> dict:
-    """并发获取所有 Polymarket 市场价格"""
+
+def depth_outcomes() -> tuple:
+    """需要采集的结果：开启盘口深度记录时同时采集 DOWN token"""
+    return ("UP", "DOWN") if depth_recorder is not None else ("UP",)
+
+
+def get_subscribed_token_ids() -> list[str]:
+    """当前需要订阅的所有有效 token_id"""
+    return [
+        tokens[outcome]
+        for tokens in MARKET_TOKEN_IDS.values()
+        for outcome in depth_outcomes()
+        if tokens.get(outcome, "none") != "none"
+    ]
+
+
+def start_polymarket_stream():
+    """启动 Polymarket WebSocket 行情订阅，失败时回退到 REST 轮询"""
+    global polymarket_stream
+    try:
+        from polymarket_ws import PolymarketMarketStream
+
+        stream = PolymarketMarketStream(POLYMARKET_CONFIG["WS_URL"])
+        stream.set_tokens(get_subscribed_token_ids())
+        stream.start()
+        polymarket_stream = stream
+        print("Polymarket WebSocket 行情订阅已启动")
+    except Exception as ex:
+        print(f"[警告] Polymarket WebSocket 启动失败，回退到 REST 轮询: {ex}")
+        POLYMARKET_CONFIG["PRICE_MODE"] = "poll"
+
+
+def fetch_polymarket_books_bulk() -> dict:
+    """
+    批量 /books 请求获取所有 token 的最优买卖价，返回 {coin: {"best_bid", "best_ask", "mid"}}
+    市场数超过 FETCH_SHARD_SIZE 时拆成多个分片并发请求
+    """
+    token_to_coin = {
+        tokens["UP"]: coin
+        for coin, tokens in MARKET_TOKEN_IDS.items()
+        if tokens.get("UP", "none") != "none"
+    }
+    if client is None or not token_to_coin:
+        return {}
+
+    result = {}
+    for token_id, (bids, asks) in fetch_order_books(token_to_coin).items():
+        best_bid, best_ask = best_bid_ask(bids, asks)
+        result[token_to_coin[token_id]] = {
+            "best_bid": best_bid,
+            "best_ask": best_ask,
+            "mid": resolve_mid(best_bid, best_ask),
+        }
+    return result
+
+
+def fetch_order_books(token_ids) -> dict:
+    """批量 /books 获取多个 token 的原始盘口，返回 {token_id: (bids, asks)}；按 FETCH_SHARD_SIZE 分片并发"""
     result = {}
+    for shard in run_sharded(fetch_order_books_shard, {token_id: token_id for token_id in token_ids}):
+        result.update(shard)
+    return result
 
-    with ThreadPoolExecutor(max_workers=len(MARKET_TOKEN_IDS)) as executor:
-        future_map = {
-            executor.submit(get_price_sync, tokens["UP"]): coin
+
+def fetch_order_books_shard(tokens: dict) -> dict:
+    """单个分片的批量 /books 请求"""
+    from py_clob_client.clob_types import BookParams
+
+    params = [BookParams(token_id=token_id) for token_id in tokens]
+    books = rate_limiter.call(CLOB_HOST, lambda: client.get_order_books(params), tick_deadline())
+
+    result = {}
+    for book in books or []:
+        asset_id = book.get("asset_id") if isinstance(book, dict) else getattr(book, "asset_id", None)
+        if asset_id not in tokens:
+            continue
+        bids = book.get("bids") if isinstance(book, dict) else getattr(book, "bids", None)
+        asks = book.get("asks") if isinstance(book, dict) else getattr(book, "asks", None)
+        result[asset_id] = (bids, asks)
+    return result
+
+
+def fetch_polymarket_prices_bulk() -> dict:
+    """批量模式：单次请求获取所有市场价格，中间价缺失时在本地用盘口回退"""
+    try:
+        quotes = fetch_polymarket_books_bulk()
+    except Exception:
+        quotes = {}
+    return {
+        coin: format_price(quotes[coin]["mid"]) if coin in quotes else "none"
+        for coin in MARKET_TOKEN_IDS
+    }
+
+
+def fetch_polymarket_prices() -> dict:
+    """并发获取所有 Polymarket 市场价格"""
+    if polymarket_stream is not None:
+        # 直接读取 WebSocket 维护的实时盘口，无网络请求
+        return {
+            coin: polymarket_stream.get_price(tokens["UP"])
             for coin, tokens in MARKET_TOKEN_IDS.items()
         }
 
-        for future in as_completed(future_map):
-            coin = future_map[future]
-            try:
-                result[coin] = future.result()
-            except Exception:
-                result[coin] = "none"
+    if POLYMARKET_CONFIG["PRICE_MODE"] == "bulk":
+        return fetch_polymarket_prices_bulk()
+
+    result = {}
 
+    future_map = {
+        _REQUEST_EXECUTOR.submit(get_price_sync, tokens["UP"]): coin
+        for coin, tokens in MARKET_TOKEN_IDS.items()
+    }
+
+    for future in as_completed(future_map):
+        coin = future_map[future]
+        try:
+            result[coin] = future.result()
+        except Exception:
+            result[coin] = "none"
+
+    return result
+
+
+def depth_token_ids() -> dict:
+    """深度记录需要的 token：{(coin, outcome): token_id}"""
+    return {
+        (coin, outcome): tokens[outcome]
+        for coin, tokens in MARKET_TOKEN_IDS.items()
+        for outcome in ("UP", "DOWN")
+        if tokens.get(outcome, "none") != "none"
+    }
+
+
+def group_depth_books(wanted: dict, books: dict) -> dict:
+    """把 {token_id: (bids, asks)} 按市场整理为 {coin: {outcome: (token_id, bids, asks)}}"""
+    result = {}
+    for (coin, outcome), token_id in wanted.items():
+        book = books.get(token_id)
+        if book is not None:
+            result.setdefault(coin, {})[outcome] = (token_id, book[0], book[1])
     return result
 
 
+def fetch_depth_books() -> dict:
+    """
+    获取所有市场 UP/DOWN token 的前 N 档盘口，返回 {coin: {outcome: (token_id, bids, asks)}}
+    stream 模式直接读取内存盘口，否则一次（分片并发的）批量 /books 请求
+    """
+    depth = DEPTH_CONFIG["LEVELS"]
+    wanted = depth_token_ids()
+
+    if polymarket_stream is not None:
+        books = {token_id: polymarket_stream.get_book(token_id, depth) for token_id in wanted.values()}
+    elif client is None or not wanted:
+        return {}
+    else:
+        books = {
+            token_id: top_levels(bids, asks, depth)
+            for token_id, (bids, asks) in fetch_order_books(set(wanted.values())).items()
+        }
+    return group_depth_books(wanted, books)
+
+
+def shares_bulk_books() -> bool:
+    """bulk 模式下开启深度记录时，取价与深度共用同一次批量 /books 响应"""
+    return (
+        depth_recorder is not None
+        and polymarket_stream is None
+        and POLYMARKET_CONFIG["PRICE_MODE"] == "bulk"
+    )
+
+
+def fetch_polymarket_bulk_with_depth() -> tuple[dict, dict]:
+    """
+    一次（分片并发的）批量 /books 同时请求 UP/DOWN token，返回 (polymarket_prices, depth_books)
+    中间价的计算与 fetch_polymarket_prices_bulk 相同，深度取前 N 档
+    """
+    wanted = depth_token_ids()
+    books = {}
+    if client is not None and wanted:
+        try:
+            books = fetch_order_books(set(wanted.values()))
+        except Exception:
+            books = {}
+
+    prices = {}
+    for coin, tokens in MARKET_TOKEN_IDS.items():
+        book = books.get(tokens.get("UP"))
+        prices[coin] = format_price(resolve_mid(*best_bid_ask(*book))) if book is not None else "none"
+
+    depth = DEPTH_CONFIG["LEVELS"]
+    depth_books = group_depth_books(
+        wanted, {token_id: top_levels(bids, asks, depth) for token_id, (bids, asks) in books.items()}
+    )
+    return prices, depth_books
+
+
+def start_depth_recorder():
+    """启用盘口深度记录"""
+    global depth_recorder
+    try:
+        from depth_recorder import DepthRecorder
+
+        depth_recorder = DepthRecorder(
+            "data",
+            levels=DEPTH_CONFIG["LEVELS"],
+            snapshot_interval=DEPTH_CONFIG["SNAPSHOT_INTERVAL"],
+        )
+        print(f"盘口深度记录已启用：前 {DEPTH_CONFIG['LEVELS']} 档，快照间隔 {DEPTH_CONFIG['SNAPSHOT_INTERVAL']:g} 秒")
+    except Exception as ex:
+        print(f"[警告] 盘口深度记录启动失败: {ex}")
+
+
+def start_async_collector():
+    """启动常驻 asyncio 采集引擎，失败时回退到线程池引擎"""
+    global async_collector
+    try:
+        from async_engine import AsyncCollector
+
+        collector = AsyncCollector(
+            CLOB_API,
+            BINANCE_API_URL,
+            limit_per_host=COLLECTION_CONFIG["FETCH_CONCURRENCY"],
+            shard_size=COLLECTION_CONFIG["FETCH_SHARD_SIZE"],
+        )
+        collector.start()
+        async_collector = collector
+        print("asyncio 采集引擎已启动")
+    except Exception as ex:
+        print(f"[警告] asyncio 采集引擎启动失败，回退到线程池: {ex}")
+        COLLECTION_CONFIG["ENGINE"] = "thread"
+
+
+def stop_async_collector():
+    """关闭 asyncio 采集引擎的 aiohttp 会话与事件循环线程"""
+    global async_collector
+    if async_collector is None:
+        return
+    collector = async_collector
+    async_collector = None
+    try:
+        collector.close()
+    except Exception as ex:
+        print(f"[警告] asyncio 采集引擎关闭失败: {str(ex)[:80]}")
+
+
+def collect_tick(poll_polymarket: bool | None = None) -> tuple[dict | None, dict | None]:
+    """
+    在同一个采样周期内并发获取 Polymarket 与币安价格，返回 (polymarket_prices, binance_prices)
+    未开启的数据源返回 None；poll_polymarket=False 时本次跳过 Polymarket（由调用方另行获取）
+    """
+    if poll_polymarket is None:
+        poll_polymarket = COLLECTION_CONFIG["ENABLE_POLYMARKET"]
+    poll_binance = COLLECTION_CONFIG["ENABLE_BINANCE"]
+
+    if async_collector is not None:
+        # WebSocket 模式的数据源直接读内存，其余交给 asyncio 引擎并发请求
+        use_engine_polymarket = poll_polymarket and polymarket_stream is None
+        use_engine_binance = poll_binance and binance_stream is None
+        token_by_coin = {coin: tokens["UP"] for coin, tokens in MARKET_TOKEN_IDS.items()}
+        try:
+            polymarket_prices, binance_prices = async_collector.collect(
+                token_by_coin if use_engine_polymarket else None,
+                BINANCE_SYMBOLS if use_engine_binance else None,
+                POLYMARKET_CONFIG["PRICE_MODE"],
+                BINANCE_CONFIG["PRICE_MODE"],
+                tick_deadline(),
+            )
+        except Exception:
+            polymarket_prices = {} if use_engine_polymarket else None
+            binance_prices = {} if use_engine_binance else None
+        if poll_polymarket and not use_engine_polymarket:
+            polymarket_prices = fetch_polymarket_prices()
+        if poll_binance and not use_engine_binance:
+            binance_prices = fetch_binance_prices()
+        return polymarket_prices, binance_prices
+
+    polymarket_future = _SOURCE_EXECUTOR.submit(fetch_polymarket_prices) if poll_polymarket else None
+    binance_future = _SOURCE_EXECUTOR.submit(fetch_binance_prices) if poll_binance else None
+
+    polymarket_prices = None
+    binance_prices = None
+    if polymarket_future is not None:
+        try:
+            polymarket_prices = polymarket_future.result()
+        except Exception:
+            polymarket_prices = {}
+    if binance_future is not None:
+        try:
+            binance_prices = binance_future.result()
+        except Exception:
+            binance_prices = {}
+    return polymarket_prices, binance_prices
+
+
+def collect_tick_with_depth() -> tuple[dict | None, dict | None, dict]:
+    """
+    采集一个周期的价格与盘口深度，返回 (polymarket_prices, binance_prices, depth_books)
+    bulk 模式下取价与深度共用同一次批量 /books 请求，其余模式深度与取价并发获取
+    """
+    if depth_recorder is None or not COLLECTION_CONFIG["ENABLE_POLYMARKET"]:
+        polymarket_prices, binance_prices = collect_tick()
+        return polymarket_prices, binance_prices, {}
+
+    if shares_bulk_books():
+        books_future = _SOURCE_EXECUTOR.submit(fetch_polymarket_bulk_with_depth)
+        _, binance_prices = collect_tick(poll_polymarket=False)
+        try:
+            polymarket_prices, depth_books = books_future.result()
+        except Exception:
+            polymarket_prices, depth_books = {}, {}
+        return polymarket_prices, binance_prices, depth_books
+
+    depth_future = _SOURCE_EXECUTOR.submit(fetch_depth_books)
+    polymarket_prices, binance_prices = collect_tick()
+    try:
+        depth_books = depth_future.result()
+    except Exception:
+        depth_books = {}
+    return polymarket_prices, binance_prices, depth_books
+
+
+def series_stem(kind: str, coin: str) -> str:
+    """序列的落盘文件名前缀（不含日期）"""
+    if kind == "binance":
+        return f"{coin}_BINANCE"
+    # 文件名前缀由注册表决定（5分钟市场默认为 {币种}5MIN 以避免混淆）
+    return MARKET_REGISTRY.file_stem(coin)
+
+
 def save_binance_to_csv(coin: str, current_datetime: datetime, price_str: str):
     """将币安数据保存到对应的CSV文件（仅 time 与 price 两列）"""
-    timestamp = current_datetime.strftime('%Y-%m-%d %H:%M:%S')
-    date_str = current_datetime.strftime('%Y-%m-%d')
-    month_str = date_str[:7]
+    timestamp = format_tick_time(current_datetime)
+    stem = series_stem("binance", coin)
+    csv_sink.write_row(stem, current_datetime, [timestamp, price_str], ['time', 'price'])
+    if parquet_sink is not None:
+        parquet_sink.write_price(stem, current_datetime, price_str)
 
-    data_dir = os.path.join("data", month_str, date_str)
-    os.makedirs(data_dir, exist_ok=True)
+def drain_binance_trades(stream) -> list:
+    """取走组合流缓冲的成交，每个币种一行 ("binance_trades", coin, [trade, ...])"""
+    if stream is None or not stream.capture_trades:
+        return []
+    return [("binance_trades", coin, trades) for coin, trades in stream.drain_trades().items()]
 
-    filename = f"{coin}_BINANCE_{date_str}.csv"
-    file_path = os.path.join(data_dir, filename)
-    file_exists = os.path.exists(file_path)
+def binance_trade_rows() -> list:
+    """
+    成交级采集：本周期要落盘的成交行，随采样行一起作为一个周期提交，不单独占用写盘队列；
+    包括重建组合流时旧流中尚未取走的成交
+    """
+    rows = []
+    while _orphan_trade_rows:
+        rows.append(_orphan_trade_rows.popleft())
+    return rows + drain_binance_trades(binance_stream)
 
-    with open(file_path, 'a', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        if not file_exists:
-            writer.writerow(['time', 'price'])
-        writer.writerow([timestamp, price_str])
+def save_binance_trades_to_csv(coin: str, current_datetime: datetime, trades: list):
+    """成交级采集：将币安归集成交按成交时间逐笔追加到对应日期的成交CSV"""
+    for trade in trades:
+        trade_time_ms = trade.get("trade_time")
+        trade_datetime = to_data_datetime(trade_time_ms / 1000) if trade_time_ms else current_datetime
+        csv_sink.write_row(
+            f"{coin}_BINANCE_TRADES",
+            trade_datetime,
+            [
+                trade_datetime.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+                trade["price"],
+                trade.get("qty"),
+                trade.get("agg_id"),
+                int(bool(trade.get("is_buyer_maker"))),
+            ],
+            ['time', 'price', 'qty', 'agg_id', 'is_buyer_maker'],
+        )
 
 # 保存数据到CSV文件
 def save_to_csv(coin: str, current_datetime: datetime, price_str: str):
     """将数据保存到对应的CSV文件"""
-    timestamp = current_datetime.strftime('%Y-%m-%d %H:%M:%S')
-    # 生成日期信息
-    date_str = current_datetime.strftime('%Y-%m-%d')
-    month_str = date_str[:7]  # YYYY-MM
-
-    # 创建目录结构：data/YYYY-MM/YYYY-MM-DD
-    data_dir = os.path.join("data", month_str, date_str)
-    os.makedirs(data_dir, exist_ok=True)
-
-    # 生成文件名（按日期）
-    # 5分钟市场使用不同的文件名前缀以避免混淆
-    if coin.endswith("5"):
-        filename = f"{coin}MIN_{date_str}.csv"
-    else:
-        filename = f"{coin}_{date_str}.csv"
+    timestamp = format_tick_time(current_datetime)
+    stem = series_stem("polymarket", coin)
+    csv_sink.write_row(stem, current_datetime, [timestamp, price_str], ['time', 'price'])
+    if parquet_sink is not None:
+        parquet_sink.write_price(stem, current_datetime, price_str)
+
+def save_depth(coin: str, current_datetime: datetime, books: dict):
+    """将一个市场 UP/DOWN token 的盘口写入当天的深度文件"""
+    stem = series_stem("polymarket", coin)
+    for outcome, (token_id, bids, asks) in books.items():
+        depth_recorder.record(stem, current_datetime, outcome, token_id, bids, asks)
+
+def save_tick_to_csv(tick: Tick, current_datetime: datetime, response_time: float):
+    """记录每个采样周期的计划时刻、实际响应时刻与调度延迟"""
+    timestamp = format_tick_time(current_datetime)
+    response_str = format_tick_time(to_data_datetime(response_time))
+    csv_sink.write_row(
+        "TICKS",
+        current_datetime,
+        [
+            timestamp,
+            response_str,
+            f"{tick.lag * 1000:.1f}",
+            f"{(response_time - tick.scheduled_time) * 1000:.1f}",
+            tick.missed,
+        ],
+        ['time', 'response_time', 'lag_ms', 'response_ms', 'missed'],
+    )
+
+
+# 落盘行类型 -> 写入函数；队列中只保存 (类型, 键, 值)，可被溢出策略序列化到磁盘
+ROW_WRITERS = {
+    "polymarket": save_to_csv,
+    "binance": save_binance_to_csv,
+    "binance_trades": save_binance_trades_to_csv,
+    "ticks": save_tick_to_csv,
+    "depth": save_depth,
+}
 
-    file_path = os.path.join(data_dir, filename)
-    
-    # 检查文件是否存在，如果不存在则写入表头
-    file_exists = os.path.exists(file_path)
-    
-    with open(file_path, 'a', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        # 如果是新文件，写入表头
-        if not file_exists:
-            writer.writerow(['time', 'price'])
-        # 写入数据行
-        writer.writerow([timestamp, price_str])
+
+def write_rows(item: tuple):
+    """写盘线程：按顺序落盘一个采样周期的所有行"""
+    current_datetime, rows = item
+    started = time.perf_counter()
+    for kind, key, value in rows:
+        try:
+            ROW_WRITERS[kind](key, current_datetime, value)
+        except Exception as ex:
+            print(f"[警告] {kind} 写入失败: {str(ex)[:80]}")
+    ended = time.perf_counter()
+    WRITE_SECONDS.observe(ended - started)
+    tracer.record("write", "writer", started, ended, {"rows": len(rows)})
+
+
+# 采集与落盘之间的有界队列，由专用写盘线程消费
+background_writer = BackgroundWriter(
+    write_rows,
+    maxsize=int(get_env_value("WRITER_QUEUE_SIZE", "600") or "600"),
+    policy=get_env_value("WRITER_BACKPRESSURE", "block").lower() or "block",
+)
+
+
+def submit_rows(current_datetime: datetime, rows: list):
+    """提交一个采样周期的落盘任务，立即返回（队列满时按背压策略处理）"""
+    if rows:
+        background_writer.submit((current_datetime, rows))
+
+
+def start_parquet_sink():
+    """启用 Parquet 列式落盘，缺少 pyarrow 时仅保留 CSV"""
+    global parquet_sink
+    try:
+        from parquet_sink import ParquetSink
+
+        parquet_sink = ParquetSink(
+            "data",
+            row_group_size=int(get_env_value("PARQUET_ROW_GROUP_SIZE", "3600") or "3600"),
+        )
+        print("Parquet 列式落盘已启用")
+    except Exception as ex:
+        print(f"[警告] Parquet 落盘启动失败，仅写入 CSV: {ex}")
+
+
+def shutdown_writers():
+    """等待写盘线程落完队列与溢出文件中的数据，并刷盘关闭所有文件句柄"""
+    if binance_stream is not None:
+        # 停止组合流后提交最后一个周期之后到达的成交
+        binance_stream.stop()
+        submit_rows(get_data_now(), binance_trade_rows())
+    background_writer.close()
+    csv_sink.close()
+    if parquet_sink is not None:
+        parquet_sink.close()
+    if depth_recorder is not None:
+        depth_recorder.close()
+    metrics = background_writer.metrics()
+    print(f"写盘完成：共 {metrics['written']} 个周期，丢弃 {metrics['dropped']}，溢出 {metrics['spilled']}")
 
 # 同步获取价格函数
 def get_price_sync(token_id: str) -> str:
@@ -229,7 +907,8 @@ def get_price_sync(token_id: str) -> str:
     
     try:
         # 使用客户端的官方方法获取价格
-        midpoint_data = client.get_midpoint(token_id)
+        deadline = tick_deadline()
+        midpoint_data = rate_limiter.call(CLOB_HOST, lambda: client.get_midpoint(token_id), deadline)
         mid_price = 0.0
 
         if isinstance(midpoint_data, dict):
@@ -242,7 +921,7 @@ def get_price_sync(token_id: str) -> str:
             return f"{mid_price:.2f}"
             
         # 备选：尝试orderbook
-        book = client.get_order_book(token_id)
+        book = rate_limiter.call(CLOB_HOST, lambda: client.get_order_book(token_id), deadline)
         if hasattr(book, 'bids') and book.bids:
             best_bid = float(book.bids[0].price)
             if best_bid > 0:
@@ -256,65 +935,298 @@ def get_price_sync(token_id: str) -> str:
 # 计算下一个5分钟周期开始时间（美东时间）
 def get_next_5m_cycle_start():
     """获取下一个5分钟周期的美东时间开始时刻"""
-    et_tz = pytz.timezone("America/New_York")
-    now_et = datetime.now(et_tz)
-    
-    # 计算当前是第几个5分钟周期
-    minutes_since_midnight = now_et.hour * 60 + now_et.minute
-    current_cycle = minutes_since_midnight // 5
-    
-    # 计算下一个周期的开始时间
-    next_cycle_start_minutes = (current_cycle + 1) * 5
-    next_cycle_hour = next_cycle_start_minutes // 60
-    next_cycle_minute = next_cycle_start_minutes % 60
-    
-    next_cycle_start = now_et.replace(
-        hour=next_cycle_hour,
-        minute=next_cycle_minute,
-        second=0,
-        microsecond=0
-    )
-    
-    if next_cycle_start <= now_et:
-        next_cycle_start += timedelta(days=1)
-    
-    return next_cycle_start
+    return datetime.fromtimestamp(next_cycle_start_ts(INTERVALS["5m"]), ET_TZ)
 
 
 # 计算下一个15分钟周期开始时间（美东时间）
 def get_next_cycle_start():
     """获取下一个15分钟周期的美东时间开始时刻"""
-    et_tz = pytz.timezone("America/New_York")
-    now_et = datetime.now(et_tz)
-    
-    # 计算当前是第几个15分钟周期
-    minutes_since_midnight = now_et.hour * 60 + now_et.minute
-    current_cycle = minutes_since_midnight // 15
-    
-    # 计算下一个周期的开始时间
-    next_cycle_start_minutes = (current_cycle + 1) * 15
-    next_cycle_hour = next_cycle_start_minutes // 60
-    next_cycle_minute = next_cycle_start_minutes % 60
-    
-    next_cycle_start = now_et.replace(
-        hour=next_cycle_hour,
-        minute=next_cycle_minute,
-        second=0,
-        microsecond=0
-    )
-    
-    if next_cycle_start <= now_et:
-        next_cycle_start += timedelta(days=1)
-    
-    return next_cycle_start
+    return datetime.fromtimestamp(next_cycle_start_ts(INTERVALS["15m"]), ET_TZ)
+
+# ======================== 指标 ========================
+
+BREAKER_OPEN = default_registry.gauge("collector_breaker_open", "组件熔断状态（1 为熔断中）", ("component", "kind"))
+CACHE_LOOKUPS = default_registry.gauge("collector_market_cache_lookups", "token 缓存累计查询次数", ("result",))
+CACHE_HIT_RATIO = default_registry.gauge("collector_market_cache_hit_ratio", "token 缓存命中率")
+WRITER_QUEUE_DEPTH = default_registry.gauge("collector_writer_queue_depth", "写盘队列中待落盘的采样周期数")
+WRITER_LAG_SECONDS = default_registry.gauge("collector_writer_lag_seconds", "最近一个采样周期从入队到落盘的耗时")
+
+
+def collect_metrics():
+    """抓取前把已有的统计同步到指标：各序列连续失败次数、熔断状态、token 缓存与写盘队列"""
+    streaks = {("polymarket", coin): count for coin, count in none_counter.items()}
+    streaks.update({("binance", coin): count for coin, count in binance_none_counter.items()})
+    FAILURE_STREAK.set_all(streaks)
+
+    breakers = supervisor.snapshot()["breakers"]
+    BREAKER_OPEN.set_all({(name, info["kind"]): info["state"] != "closed" for name, info in breakers.items()})
+
+    cache = get_cache_stats()
+    CACHE_LOOKUPS.set_all({("hit",): cache["hits"], ("miss",): cache["misses"]})
+    CACHE_HIT_RATIO.set(cache["hit_rate"])
+
+    writer = background_writer.metrics()
+    WRITER_QUEUE_DEPTH.set(writer["depth"])
+    WRITER_LAG_SECONDS.set(writer["lag"])
+
+
+def start_profiling_hooks():
+    """注册按需分析的触发方式（SIGUSR1 与触发文件），窗口在主循环中开始与结束"""
+    global profile_controller
+    try:
+        profile_controller = ProfileController(
+            tracer,
+            out_dir=TRACE_CONFIG["PROFILE_DIR"],
+            seconds=TRACE_CONFIG["PROFILE_SECONDS"],
+            mode=TRACE_CONFIG["PROFILE_MODE"],
+            trigger_file=TRACE_CONFIG["PROFILE_TRIGGER_FILE"] or None,
+        )
+    except ValueError as ex:
+        print(f"[警告] 按需分析未启用: {ex}")
+        return
+    triggers = []
+    if profile_controller.install_signal():
+        triggers.append(f"kill -USR1 {os.getpid()}")
+    if profile_controller.trigger_file:
+        triggers.append(f"创建 {profile_controller.trigger_file}")
+    if triggers:
+        print(f"按需分析: {' 或 '.join(triggers)}，{TRACE_CONFIG['PROFILE_SECONDS']:g} 秒后写入 "
+              f"{TRACE_CONFIG['PROFILE_DIR']}/")
+
+
+def dump_trace():
+    """ENABLE_TRACING 时退出前写出环形缓冲区中的全部区间"""
+    if not TRACE_CONFIG["ENABLED"]:
+        return
+    path = os.path.join(TRACE_CONFIG["PROFILE_DIR"], f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    try:
+        print(f"已写出 trace: {path}（{tracer.dump(path)} 个区间）")
+    except Exception as ex:
+        print(f"[警告] 写出 trace 失败: {str(ex)[:80]}")
+
+
+def start_metrics_server():
+    """METRICS_PORT 非 0 时在后台提供 Prometheus 指标"""
+    global metrics_server
+    if not METRICS_CONFIG["PORT"]:
+        return
+    try:
+        default_registry.add_collector(collect_metrics)
+        metrics_server = MetricsServer(default_registry, METRICS_CONFIG["PORT"], METRICS_CONFIG["HOST"]).start()
+        print(f"指标端点已启动: {metrics_server.address}")
+    except Exception as ex:
+        print(f"[警告] 指标端点启动失败: {str(ex)[:80]}")
+
+
+# ======================== 热启动状态 ========================
+
+def save_collector_state():
+    """保存 API 凭证与当前周期已解析的市场（权限 600）"""
+    if not STATE_CONFIG["ENABLED"]:
+        return
+    try:
+        state = {"markets": market_entries(MARKET_TOKEN_IDS, MARKET_REGISTRY)}
+        if _creds_entry is not None:
+            state["creds"] = _creds_entry
+        save_state(state, STATE_CONFIG["FILE"])
+    except Exception as ex:
+        print(f"[警告] 保存状态文件失败: {str(ex)[:80]}")
+
+
+def apply_warm_markets() -> list:
+    """把状态文件中仍属于当前周期的市场写入 MARKET_TOKEN_IDS，返回已恢复的键"""
+    restored = valid_markets(collector_state, MARKET_REGISTRY)
+    for key, tokens in restored.items():
+        MARKET_TOKEN_IDS[key] = dict(MARKET_TOKEN_IDS[key], **tokens)
+    return list(restored)
+
+
+def validate_cached_creds():
+    """重新派生 API 凭证校验缓存的凭证，变化时切换到新客户端"""
+    global client, warm_creds
+    if not warm_creds or client is None:
+        return
+    try:
+        fresh = create_clob_client()
+        if fresh.creds.api_key != client.creds.api_key:
+            print("[热启动] API 凭证已变化，切换到新凭证")
+            client = fresh
+        warm_creds = False
+    except Exception as ex:
+        print(f"[警告] [热启动] 凭证校验失败，继续使用缓存凭证: {str(ex)[:80]}")
+    save_collector_state()
+
+
+def validate_warm_state(restored_keys: list):
+    """
+    后台校验热启动状态：先校验凭证，再重新解析全部市场（覆盖状态文件中的 token），
+    完成后写回状态文件；采样在此期间照常进行
+    """
+    started = time.time()
+    validate_cached_creds()
+    missing = [key for key in MARKET_TOKEN_IDS if key not in restored_keys]
+    refresh_started = time.time()
+    updated = update_market_token_ids(MARKET_TOKEN_IDS, MARKET_REGISTRY.markets)
+    REFRESH_SECONDS.observe(time.time() - refresh_started, phase="warm_start")
+    if polymarket_stream is not None:
+        polymarket_stream.set_tokens(get_subscribed_token_ids())
+    save_collector_state()
+    print(f"[热启动] 后台校验完成：重新解析 {updated}/{len(MARKET_TOKEN_IDS)} 个市场"
+          f"（状态文件缺失 {len(missing)} 个），耗时 {time.time() - started:.2f}s")
+
+
+# ======================== 故障隔离与重建 ========================
+
+def rebuild_polymarket_source() -> bool:
+    """重建 Polymarket 数据源：stream 模式重建 WebSocket 订阅，否则重新创建 ClobClient"""
+    global client, polymarket_stream
+    if polymarket_stream is not None:
+        old_stream = polymarket_stream
+        polymarket_stream = None  # 重建期间回退到 REST 采样
+        old_stream.stop()
+        start_polymarket_stream()
+        return polymarket_stream is not None
+    client = create_clob_client()
+    save_collector_state()
+    return True
+
+
+def rebuild_binance_source() -> bool:
+    """重建币安数据源：stream 模式重建组合流，否则替换 HTTP 会话（丢弃可能失效的连接池）"""
+    global binance_session, binance_stream
+    if binance_stream is not None:
+        old_stream = binance_stream
+        binance_stream = None
+        old_stream.stop()
+        _orphan_trade_rows.extend(drain_binance_trades(old_stream))
+        start_binance_stream()
+        return binance_stream is not None
+    old_session = binance_session
+    binance_session = requests.Session()
+    old_session.close()
+    return True
+
+
+def rebuild_market_token(key: str) -> bool:
+    """重新解析单个市场当前周期的 token（丢弃缓存），并按需更新订阅"""
+    spec = MARKET_REGISTRY.get(key)
+    invalidate_market(spec)
+    refresh_started = time.time()
+    updated = update_market_token_ids(MARKET_TOKEN_IDS, [spec])
+    REFRESH_SECONDS.observe(time.time() - refresh_started, phase="rebuild")
+    if not updated:
+        return False
+    if polymarket_stream is not None:
+        polymarket_stream.set_tokens(get_subscribed_token_ids())
+    save_collector_state()
+    return True
+
+
+def setup_supervisor():
+    """按启用的数据源注册熔断组件：数据源级（客户端/会话）与市场级（单个市场的 token）"""
+    if COLLECTION_CONFIG["ENABLE_POLYMARKET"]:
+        supervisor.register("polymarket", "polymarket_source", rebuild_polymarket_source)
+        for key in MARKET_TOKEN_IDS:
+            supervisor.register(f"polymarket:{key}", "market_token", lambda key=key: rebuild_market_token(key))
+    if COLLECTION_CONFIG["ENABLE_BINANCE"]:
+        supervisor.register("binance", "binance_source", rebuild_binance_source)
+        for coin in BINANCE_SYMBOLS:
+            # 单个交易对没有可单独重建的对象，只记录熔断与恢复
+            supervisor.register(f"binance:{coin}", "binance_symbol")
+
+
+def report_health(polymarket_failed: list | None, binance_failed: list | None):
+    """
+    向监督器上报本周期结果（None 表示该数据源未采集）：
+    已有 token 的市场全部失败时记为数据源故障（重建客户端/会话），否则逐个市场上报（只重建失败的市场）
+    """
+    if polymarket_failed is not None:
+        failed = set(polymarket_failed)
+        with_token = [key for key, tokens in MARKET_TOKEN_IDS.items() if tokens.get("UP", "none") != "none"]
+        source_down = bool(with_token) and failed.issuperset(with_token)
+        supervisor.report("polymarket", not source_down)
+        for key in MARKET_TOKEN_IDS:
+            # 数据源整体故障时不把单个市场算作故障，避免同时触发逐个市场的 token 重建
+            if not (source_down and key in with_token):
+                supervisor.report(f"polymarket:{key}", key not in failed)
+
+    if binance_failed is not None:
+        failed = set(binance_failed)
+        source_down = bool(BINANCE_SYMBOLS) and failed.issuperset(BINANCE_SYMBOLS)
+        supervisor.report("binance", not source_down)
+        if not source_down:
+            for coin in BINANCE_SYMBOLS:
+                supervisor.report(f"binance:{coin}", coin not in failed)
+
+
+def build_price_rows(polymarket_prices: dict | None, binance_prices: dict | None, log_prefix: str | None = None):
+    """
+    把一个周期的价格整理为落盘行并更新连续失败计数，返回 (rows, polymarket_failed, binance_failed)
+    未采集的数据源对应的失败列表为 None；log_prefix 不为空时（分片采样进程）不逐个打印价格，
+    失败只在首次与达到阈值时打印
+    """
+    verbose = log_prefix is None
+
+    def warn(label: str, count: int):
+        if verbose:
+            print(f"    ⚠️ {label} 连续 {count} 秒获取失败")
+        elif count in (1, MAX_NONE_COUNT):
+            print(f"{log_prefix} ⚠️ {label} 连续 {count} 秒获取失败")
+
+    rows = []
+    polymarket_failed = None
+    binance_failed = None
+
+    if polymarket_prices is not None:
+        polymarket_failed = []
+        for coin in MARKET_TOKEN_IDS.keys():
+            price_str = polymarket_prices.get(coin, "none")
+            if verbose:
+                print(f"  {coin}: {price_str}")
+            rows.append(("polymarket", coin, price_str))
+
+            # 更新 none 计数器
+            if price_str == "none":
+                polymarket_failed.append(coin)
+                none_counter[coin] += 1
+                warn(coin, none_counter[coin])
+            else:
+                # 价格正常，重置计数器
+                if verbose and none_counter[coin] > 0:
+                    print(f"    ✓ {coin} 恢复正常，重置计数器")
+                none_counter[coin] = 0
+
+    if binance_prices is not None:
+        binance_failed = []
+        for coin in BINANCE_SYMBOLS.keys():
+            price_str = binance_prices.get(coin, "0")
+            if verbose:
+                print(f"  {coin}_BINANCE: {price_str}")
+            rows.append(("binance", coin, price_str))
+
+            if price_str in {"none", "0"}:
+                binance_failed.append(coin)
+                binance_none_counter[coin] += 1
+                warn(f"{coin}_BINANCE", binance_none_counter[coin])
+            else:
+                if verbose and binance_none_counter[coin] > 0:
+                    print(f"    ✓ {coin}_BINANCE 恢复正常，重置计数器")
+                binance_none_counter[coin] = 0
+
+    return rows, polymarket_failed, binance_failed
+
 
 # 重启脚本
 def restart_script():
     """重启当前脚本"""
     print("\n" + "=" * 50)
-    print("检测到连续15秒获取价格失败，正在重启脚本...")
+    print(f"检测到连续{MAX_NONE_COUNT}秒获取价格失败，正在重启脚本（RESTART_ON_FAILURE=1）...")
     print("=" * 50)
     time.sleep(2)  # 等待2秒让消息显示
+
+    # 等待写盘线程落完已提交的数据
+    stop_async_collector()
+    shutdown_writers()
     
     # 重启当前Python脚本
     python = sys.executable
@@ -322,103 +1234,199 @@ def restart_script():
 
 # 主监控循环
 def main_loop():
-    """主监控循环 - 每秒执行一次"""
+    """主监控循环 - 按单调时钟绝对截止时间每个采样周期执行一次"""
+    period = COLLECTION_CONFIG["SAMPLE_PERIOD"]
+    scheduler = TickScheduler(period)
+
+    global _tick_deadline
     while True:
-        # 获取当前时间戳
-        current_datetime = get_data_now()
-        timestamp = current_datetime.strftime('%Y-%m-%d %H:%M:%S')
-        
+        tick = scheduler.wait_next()
+        # 本周期的请求（含重试）必须在下一个采样时刻之前结束
+        _tick_deadline = tick.scheduled_time + period
+        if profile_controller is not None:
+            profile_controller.poll()
+        tick_started = time.perf_counter()
+
+        # 落盘时间使用计划触发时刻，保证时间戳严格按周期递增、不重复
+        with tracer.span("timestamp", "tick"):
+            current_datetime = to_data_datetime(tick.scheduled_time)
+            timestamp = format_tick_time(current_datetime)
+
         # 输出时间戳
         print(f"[{timestamp}]")
-        
-        if COLLECTION_CONFIG["ENABLE_POLYMARKET"]:
-            # 并发获取并保存所有币种价格
-            polymarket_prices = fetch_polymarket_prices()
-            for coin in MARKET_TOKEN_IDS.keys():
-                price_str = polymarket_prices.get(coin, "none")
-                print(f"  {coin}: {price_str}")
-                save_to_csv(coin, current_datetime, price_str)
-
-                # 更新 none 计数器
-                if price_str == "none":
-                    none_counter[coin] += 1
-                    print(f"    ⚠️ {coin} 连续 {none_counter[coin]} 秒获取失败")
-
-                    # 检查是否达到重启阈值
-                    if none_counter[coin] >= MAX_NONE_COUNT:
-                        print(f"    ✗ {coin} 连续 {none_counter[coin]} 秒获取失败，触发重启！")
-                        restart_script()
-                else:
-                    # 价格正常，重置计数器
-                    if none_counter[coin] > 0:
-                        print(f"    ✓ {coin} 恢复正常，重置计数器")
-                    none_counter[coin] = 0
-
-        if COLLECTION_CONFIG["ENABLE_BINANCE"]:
-            # 获取并保存币安秒级现货价格
-            binance_prices = fetch_binance_prices()
-            for coin in BINANCE_SYMBOLS.keys():
-                if isinstance(binance_prices, dict):
-                    price_str = binance_prices.get(coin, "0")
-                else:
-                    price_str = "0"
-                print(f"  {coin}_BINANCE: {price_str}")
-                save_binance_to_csv(coin, current_datetime, price_str)
-
-                if price_str in {"none", "0"}:
-                    binance_none_counter[coin] += 1
-                    print(f"    ⚠️ {coin}_BINANCE 连续 {binance_none_counter[coin]} 秒获取失败")
-
-                    if binance_none_counter[coin] >= MAX_NONE_COUNT:
-                        print(f"    ✗ {coin}_BINANCE 连续 {binance_none_counter[coin]} 秒获取失败，触发重启！")
-                        restart_script()
-                else:
-                    if binance_none_counter[coin] > 0:
-                        print(f"    ✓ {coin}_BINANCE 恢复正常，重置计数器")
-                    binance_none_counter[coin] = 0
-        
+        if tick.missed:
+            print(f"  ⚠️ 上一周期处理超时，跳过 {tick.missed} 个采样点（累计 {scheduler.stats['missed']}）")
+
+        # 同一周期内并发获取 Polymarket 与币安价格（以及盘口深度）
+        with tracer.span("fetch", "tick"):
+            polymarket_prices, binance_prices, depth_books = collect_tick_with_depth()
+        response_time = time.time()
+        format_started = time.perf_counter()
+        TICK_LAG_SECONDS.observe(max(0.0, tick.lag))
+        TICK_SECONDS.observe(response_time - tick.scheduled_time)
+        if tick.missed:
+            TICKS_MISSED.inc(tick.missed)
+
+        # 本周期待落盘的行，交给写盘线程处理，不阻塞下一周期的采集
+        rows, polymarket_failed, binance_failed = build_price_rows(polymarket_prices, binance_prices)
+
+        # 旧行为：达到阈值时重启整个进程（默认由监督器只重建故障组件）
+        if SUPERVISOR_CONFIG["RESTART_ON_FAILURE"]:
+            exhausted = [coin for coin in polymarket_failed or [] if none_counter[coin] >= MAX_NONE_COUNT]
+            exhausted += [f"{coin}_BINANCE" for coin in binance_failed or []
+                          if binance_none_counter[coin] >= MAX_NONE_COUNT]
+            if exhausted:
+                print(f"    ✗ {', '.join(exhausted)} 连续 {MAX_NONE_COUNT} 秒获取失败，触发重启！")
+                submit_rows(current_datetime, rows)
+                restart_script()
+
+        # 格式化与控制台输出
+        tracer.record("format", "tick", format_started, time.perf_counter())
+
+        # 熔断与按组件重建在后台进行，不阻塞本周期
+        if not SUPERVISOR_CONFIG["RESTART_ON_FAILURE"]:
+            report_health(polymarket_failed, binance_failed)
+
+        for coin, books in depth_books.items():
+            rows.append(("depth", coin, books))
+        rows.extend(binance_trade_rows())
+
+        if COLLECTION_CONFIG["RECORD_TICKS"]:
+            rows.append(("ticks", tick, response_time))
+        with tracer.span("submit", "tick"):
+            submit_rows(current_datetime, rows)
+        tracer.record("tick", "tick", tick_started, time.perf_counter(), {"lag_ms": round(tick.lag * 1000, 3)})
+
+        if scheduler.stats["ticks"] == 1:
+            print(f"  首个采样完成：距进程启动 {(time.monotonic() - _STARTED_AT) * 1000:.0f}ms"
+                  f"（{'热启动' if warm_started else '冷启动'}）")
+        if COLLECTION_CONFIG["MAX_TICKS"] and scheduler.stats["ticks"] >= COLLECTION_CONFIG["MAX_TICKS"]:
+            print(f"已采样 {scheduler.stats['ticks']} 个周期，达到 COLLECTOR_MAX_TICKS，退出")
+            return
+
+        if scheduler.finish(tick):
+            print(f"  ⚠️ 本周期处理耗时超过 {period:g} 秒（累计超时 {scheduler.stats['overruns']} 次）")
+
+        writer_metrics = background_writer.metrics()
+        if writer_metrics["depth"] > 1 or writer_metrics["spill_pending"]:
+            print(f"  ⚠️ 写盘积压：队列 {writer_metrics['depth']}，溢出 {writer_metrics['spill_pending']}，"
+                  f"延迟 {writer_metrics['lag'] * 1000:.0f}ms")
+
         print("-" * 30)
-        
-        # 精确等待1秒
-        time.sleep(1)
+
+def sleep_until(timestamp: float):
+    """睡眠到指定的 Unix 时间戳（已过则立即返回）"""
+    while True:
+        remaining = timestamp - time.time()
+        if remaining <= 0:
+            return
+        time.sleep(remaining)
+
+
+def swap_token_ids(pending: dict) -> int:
+    """
+    用预取结果替换 token：每个市场整体替换为新字典（单次赋值），
+    采样线程读到的要么是完整的旧 token，要么是完整的新 token
+    """
+    for key, info in pending.items():
+        new_tokens = dict(MARKET_TOKEN_IDS[key])
+        new_tokens["UP"] = info["UP"]
+        if "DOWN" in info:
+            new_tokens["DOWN"] = info["DOWN"]
+        if info.get("slug"):
+            new_tokens["slug"] = info["slug"]
+        else:
+            new_tokens.pop("slug", None)
+        MARKET_TOKEN_IDS[key] = new_tokens
+    return len(pending)
+
+
+# 最近一次 token 切换的统计（切换延迟为相对周期边界的秒数，负数表示提前完成）
+token_refresh_stats = {
+    "swaps": 0,
+    "last_swap_latency": 0.0,
+    "max_swap_latency": 0.0,
+    "prefetch_failures": 0,
+}
+
 
 # 定时更新token_id
 def update_tokens_thread():
-    """后台线程：按美东时间周期更新token_id（15分钟和5分钟）"""
+    """
+    后台线程：按美东时间周期更新token_id（注册表中的各个周期）
+    在边界前 TOKEN_PREFETCH_LEAD 秒预取下一周期的 token，边界前 TOKEN_SWAP_LEAD 秒原子切换，
+    保证新市场的第一秒即可采样；预取失败的市场在边界后按原流程补取
+    """
     while True:
-        # 获取两个周期的下一个开始时间
-        next_15m_cycle = get_next_cycle_start()
-        next_5m_cycle = get_next_5m_cycle_start()
-        
-        # 选择最近的更新时间
-        et_tz = pytz.timezone("America/New_York")
-        now_et = datetime.now(et_tz)
-        
-        next_update = min(next_15m_cycle, next_5m_cycle)
-        wait_seconds = (next_update - now_et).total_seconds()
-        
+        # 注册表中所有周期的下一个边界，取最近的一个；同一边界到期的市场一起处理
+        boundary_ts = min(next_cycle_start_ts(interval) for interval in MARKET_REGISTRY.intervals())
+        due_specs = [
+            spec for spec in MARKET_REGISTRY.markets
+            if next_cycle_start_ts(spec.interval_seconds) == boundary_ts
+        ]
+        next_update = datetime.fromtimestamp(boundary_ts, ET_TZ)
+
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] "
-              f"下次更新: {next_update.strftime('%Y-%m-%d %H:%M:%S')} (美东)")
-        time.sleep(wait_seconds)
-        
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 更新token_id...")
-        
-        # 检查是否需要更新15分钟周期
-        if abs((next_update - next_15m_cycle).total_seconds()) < 1:  # 允许1秒误差
-            print("执行15分钟周期更新...")
-            update_all_token_ids(MARKET_TOKEN_IDS)
-            print("15分钟周期更新完成")
-        
-        # 检查是否需要更新5分钟周期
-        if abs((next_update - next_5m_cycle).total_seconds()) < 1:  # 允许1秒误差
-            print("执行5分钟周期更新...")
-            update_all_5m_token_ids(MARKET_TOKEN_IDS)
-            print("5分钟周期更新完成")
-        
+              f"下次更新: {next_update.strftime('%Y-%m-%d %H:%M:%S')} (美东)，{len(due_specs)} 个市场")
+
+        # 1) 提前预取下一周期的 token
+        sleep_until(boundary_ts - TOKEN_REFRESH_CONFIG["PREFETCH_LEAD"])
+        prefetch_started = time.time()
+        # 同一边界到期的各周期市场合并为一次批量查询
+        # 预取失败时重试到切换时刻为止
+        with tracer.span("prefetch", "token_refresh", markets=len(due_specs)):
+            pending = prefetch_next_market_token_ids(
+                due_specs, deadline=boundary_ts - TOKEN_REFRESH_CONFIG["SWAP_LEAD"]
+            )
+        missing = [spec for spec in due_specs if spec.key not in pending]
+        token_refresh_stats["prefetch_failures"] += len(missing)
+        REFRESH_SECONDS.observe(time.time() - prefetch_started, phase="prefetch")
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 预取下一周期 token："
+              f"成功 {len(pending)}/{len(due_specs)}，耗时 {time.time() - prefetch_started:.2f}s")
+
+        if polymarket_stream is not None and pending:
+            # 提前订阅新 token，切换时盘口已就绪
+            polymarket_stream.set_tokens(get_subscribed_token_ids() + [
+                info[outcome] for info in pending.values() for outcome in depth_outcomes() if outcome in info
+            ])
+
+        # 2) 边界处原子切换
+        sleep_until(boundary_ts - TOKEN_REFRESH_CONFIG["SWAP_LEAD"])
+        with tracer.span("swap", "token_refresh", markets=len(pending)):
+            swap_token_ids(pending)
+        swap_latency = time.time() - boundary_ts
+        token_refresh_stats["swaps"] += 1
+        token_refresh_stats["last_swap_latency"] = swap_latency
+        token_refresh_stats["max_swap_latency"] = max(token_refresh_stats["max_swap_latency"], swap_latency)
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 已切换 {len(pending)} 个市场，"
+              f"相对边界 {swap_latency * 1000:+.0f}ms")
+
+        # 3) 预取失败的市场在边界后按原流程更新（已预取的直接命中缓存）
+        sleep_until(boundary_ts)
+        if missing:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 补取 token_id: "
+                  f"{', '.join(spec.key for spec in missing)}")
+            # 补取最多重试到下一轮预取开始之前，不影响下一个边界的预取
+            next_boundary_ts = min(next_cycle_start_ts(interval, boundary_ts) for interval in MARKET_REGISTRY.intervals())
+            fallback_started = time.time()
+            with tracer.span("fallback", "token_refresh", markets=len(missing)):
+                update_market_token_ids(
+                    MARKET_TOKEN_IDS, missing,
+                    deadline=max(boundary_ts + 1, next_boundary_ts - TOKEN_REFRESH_CONFIG["PREFETCH_LEAD"]),
+                )
+            REFRESH_SECONDS.observe(time.time() - fallback_started, phase="fallback")
+
+        if polymarket_stream is not None:
+            # 切换完成后只保留当前 token 的订阅
+            polymarket_stream.set_tokens(get_subscribed_token_ids())
+
+        save_collector_state()
         print("更新完成")
 
 # 主函数
 def main():
+    global warm_started
+    init_polymarket_client()
     print(f"数据落盘时区: {POLYMARKET_CONFIG.get('DATA_TIMEZONE', 'Asia/Shanghai')}")
     print(f"采集开关: Polymarket={COLLECTION_CONFIG['ENABLE_POLYMARKET']}, Binance={COLLECTION_CONFIG['ENABLE_BINANCE']}")
 
@@ -426,11 +1434,22 @@ def main():
         raise ValueError("ENABLE_POLYMARKET 和 ENABLE_BINANCE 不能同时关闭")
 
     if COLLECTION_CONFIG["ENABLE_POLYMARKET"]:
-        print("正在初始化 token_id...")
-        # 初始化15分钟周期token_id
-        update_all_token_ids(MARKET_TOKEN_IDS)
-        # 初始化5分钟周期token_id
-        update_all_5m_token_ids(MARKET_TOKEN_IDS)
+        import threading
+        restored_keys = apply_warm_markets() if STATE_CONFIG["ENABLED"] else []
+        if restored_keys:
+            # 热启动：直接使用状态文件中的凭证与 token 开始采样，后台校验并补齐
+            warm_started = True
+            print(f"[热启动] 复用缓存凭证: {'是' if warm_creds else '否'}，"
+                  f"恢复当前周期市场 {len(restored_keys)}/{len(MARKET_TOKEN_IDS)} 个")
+            threading.Thread(target=validate_warm_state, args=(restored_keys,), name="warm-start", daemon=True).start()
+        else:
+            print(f"正在初始化 token_id（{len(MARKET_REGISTRY.markets)} 个市场）...")
+            refresh_started = time.perf_counter()
+            update_registry_token_ids(MARKET_TOKEN_IDS, MARKET_REGISTRY)
+            REFRESH_SECONDS.observe(time.perf_counter() - refresh_started, phase="init")
+            save_collector_state()
+            if warm_creds:
+                threading.Thread(target=validate_cached_creds, name="warm-creds", daemon=True).start()
         print("初始化完成")
         print("=" * 50)
 
@@ -441,18 +1460,43 @@ def main():
             print(f"  {status} {coin}")
         print("=" * 50)
 
+        if DEPTH_CONFIG["ENABLED"]:
+            start_depth_recorder()
+
+        if POLYMARKET_CONFIG["PRICE_MODE"] == "stream":
+            start_polymarket_stream()
+
         # 启动定时更新线程
-        import threading
         update_thread = threading.Thread(target=update_tokens_thread, daemon=True)
         update_thread.start()
         print("定时更新线程已启动")
     else:
         print("已关闭 Polymarket 采集，仅运行币安采集")
+
+    if COLLECTION_CONFIG["ENABLE_BINANCE"] and BINANCE_CONFIG["PRICE_MODE"] == "stream":
+        start_binance_stream()
+
+    if COLLECTION_CONFIG["ENGINE"] == "asyncio":
+        start_async_collector()
     
+    if get_env_bool("ENABLE_PARQUET_SINK", "0"):
+        start_parquet_sink()
+
+    background_writer.start()
+    setup_supervisor()
+    start_metrics_server()
+    start_profiling_hooks()
+
     try:
         main_loop()
     except KeyboardInterrupt:
-        print("\n程序已停止")
+        pass
+    stop_async_collector()
+    shutdown_writers()
+    dump_trace()
+    for line in supervisor.summary_lines():
+        print(f"故障恢复统计 {line}")
+    print("\n程序已停止")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class MarketCache:
+    """
+    线程安全的市场元数据缓存：每个条目带过期时间（通常为所属周期结束时刻），
+    超出容量时按最近最少使用（LRU）淘汰，并统计命中/未命中/淘汰次数
+    """
+
+    def __init__(self, capacity: int = 256, clock: Callable[[], float] = time.time):
+        if capacity <= 0:
+            raise ValueError("capacity 必须大于 0")
+        self.capacity = capacity
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (value, expires_at)；expires_at 为 None 表示不过期
+        self._data: "OrderedDict[Hashable, tuple[Any, Optional[float]]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self._stats["misses"] += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._data[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        """写入条目；expires_at 为 Unix 时间戳，到期后读取视为未命中"""
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            if len(self._data) > self.capacity:
+                self._purge_expired()
+                while len(self._data) > self.capacity:
+                    self._data.popitem(last=False)
+                    self._stats["evictions"] += 1
+
+    def resize(self, capacity: int):
+        """调整容量，缩小时先清理过期条目，再按 LRU 淘汰多出的条目"""
+        if capacity <= 0:
+            raise ValueError("capacity 必须大于 0")
+        with self._lock:
+            self.capacity = capacity
+            if len(self._data) > capacity:
+                self._purge_expired()
+                while len(self._data) > capacity:
+                    self._data.popitem(last=False)
+                    self._stats["evictions"] += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """删除单个条目，返回条目是否存在"""
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def purge_expired(self) -> int:
+        """主动清理所有已过期条目，返回清理数量"""
+        with self._lock:
+            return self._purge_expired()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = dict(self._stats)
+            result["size"] = len(self._data)
+        lookups = result["hits"] + result["misses"]
+        result["hit_rate"] = result["hits"] / lookups if lookups else 0.0
+        return result
+
+    def _purge_expired(self) -> int:
+        now = self._clock()
+        expired = [k for k, (_, expires_at) in self._data.items() if expires_at is not None and expires_at <= now]
+        for key in expired:
+            del self._data[key]
+        self._stats["expirations"] += len(expired)
+        return len(expired)
+
+    # --- 兼容原先把缓存当作 dict 使用的写法 ---
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.set(key, value)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
@@ -0,0 +1,182 @@
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from cycle_calendar import ET_TZ, INTERVALS
+
+# 默认 slug 模板：与 crypto15 原有的 5/15 分钟市场一致
+DEFAULT_SLUG_TEMPLATE = "{asset_lower}-updown-{interval}-{ts}"
+
+# 未指定 outcomes 时的结果集合：Up/Down 市场都有两个 token，各周期一致
+DEFAULT_OUTCOMES = ("UP", "DOWN")
+
+DEFAULT_REGISTRY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "markets.json")
+
+# 未提供配置文件时的内置默认值：BTC/ETH/SOL/XRP × 15分钟/5分钟
+DEFAULT_CONFIG = {
+    "assets": {
+        "BTC": {"binance_symbol": "BTCUSDT"},
+        "ETH": {"binance_symbol": "ETHUSDT"},
+        "SOL": {"binance_symbol": "SOLUSDT"},
+        "XRP": {"binance_symbol": "XRPUSDT"},
+    },
+    "intervals": ["15m", "5m"],
+}
+
+
+@dataclass(frozen=True)
+class MarketSpec:
+    """一个 Up/Down 市场序列：资产 × 周期 × 结果集合"""
+
+    key: str                        # 内部键，如 BTC（15分钟）、BTC5（5分钟）
+    asset: str
+    interval: str                   # 5m / 15m / 1h / 4h / 1d
+    outcomes: tuple = DEFAULT_OUTCOMES
+    binance_symbol: str | None = None
+    slug_template: str = DEFAULT_SLUG_TEMPLATE
+    file_stem: str = ""             # CSV 文件名前缀（不含日期）
+
+    @property
+    def interval_seconds(self) -> int:
+        return INTERVALS[self.interval]
+
+    @property
+    def with_down(self) -> bool:
+        return "DOWN" in self.outcomes
+
+    def slug(self, cycle_ts: int) -> str:
+        """按周期起点生成市场 slug；模板可使用美东时间的日期字段，用于小时/日级市场"""
+        et = datetime.fromtimestamp(cycle_ts, ET_TZ)
+        hour12 = et.hour % 12 or 12
+        return self.slug_template.format(
+            asset=self.asset,
+            asset_lower=self.asset.lower(),
+            interval=self.interval,
+            ts=cycle_ts,
+            year=et.year,
+            month=et.strftime("%B").lower(),
+            day=et.day,
+            hour=et.hour,
+            hour12=hour12,
+            ampm="am" if et.hour < 12 else "pm",
+        )
+
+
+def default_key(asset: str, interval: str) -> str:
+    """沿用原有键名：15分钟为币种本身，5分钟为币种加 5，其他周期加周期后缀"""
+    if interval == "15m":
+        return asset
+    if interval == "5m":
+        return f"{asset}5"
+    return f"{asset}{interval.upper()}"
+
+
+def default_file_stem(key: str, interval: str) -> str:
+    """沿用原有文件名：5分钟市场为 {币种}5MIN"""
+    if interval == "5m":
+        return f"{key}MIN"
+    return key
+
+
+def legacy_spec(key: str) -> MarketSpec:
+    """
+    按原有键名约定（末尾 5 为 5分钟市场）推断市场定义，兼容未走注册表的旧调用
+    结果集合与注册表的默认值相同，同一个键无论是否经过注册表都解析出同样的 token
+    """
+    if key.endswith("5"):
+        asset, interval = key[:-1], "5m"
+    else:
+        asset, interval = key, "15m"
+    return MarketSpec(key=key, asset=asset, interval=interval, file_stem=default_file_stem(key, interval))
+
+
+@dataclass
+class MarketRegistry:
+    markets: list
+    binance_symbols: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._by_key = {spec.key: spec for spec in self.markets}
+        if len(self._by_key) != len(self.markets):
+            raise ValueError("市场注册表中存在重复的键")
+
+    def keys(self) -> list:
+        return [spec.key for spec in self.markets]
+
+    def get(self, key: str) -> MarketSpec:
+        spec = self._by_key.get(key)
+        return spec if spec is not None else legacy_spec(key)
+
+    def intervals(self) -> list:
+        """注册表中出现的所有周期长度（秒），升序"""
+        return sorted({spec.interval_seconds for spec in self.markets})
+
+    def by_interval(self, interval_seconds: int) -> list:
+        return [spec for spec in self.markets if spec.interval_seconds == interval_seconds]
+
+    def token_map(self) -> dict:
+        """生成初始的 MARKET_TOKEN_IDS 结构"""
+        return {spec.key: {"UP": "none"} for spec in self.markets}
+
+    def file_stem(self, key: str) -> str:
+        spec = self.get(key)
+        return spec.file_stem or spec.key
+
+
+def build_registry(config: dict) -> MarketRegistry:
+    """
+    配置格式：
+    {
+      "assets": {"BTC": {"binance_symbol": "BTCUSDT"}, ...},
+      "intervals": ["15m", "5m"],                 # 资产 × 周期 的笛卡尔积
+      "markets": [                                # 可选：逐个追加或覆盖
+        {"asset": "BTC", "interval": "1h", "key": "BTC1H",
+         "slug_template": "bitcoin-up-or-down-{month}-{day}-{hour12}{ampm}-et"}
+      ]
+    }
+    """
+    assets = config.get("assets", {})
+    if isinstance(assets, list):
+        assets = {asset: {} for asset in assets}
+
+    entries = [
+        {"asset": asset, "interval": interval}
+        for interval in config.get("intervals", [])
+        for asset in assets
+    ]
+    entries.extend(config.get("markets", []))
+
+    specs: dict[str, MarketSpec] = {}
+    for entry in entries:
+        asset = entry["asset"].upper()
+        interval = entry["interval"]
+        if interval not in INTERVALS:
+            raise ValueError(f"不支持的周期: {interval}，可选 {', '.join(INTERVALS)}")
+        key = entry.get("key") or default_key(asset, interval)
+        specs[key] = MarketSpec(
+            key=key,
+            asset=asset,
+            interval=interval,
+            outcomes=tuple(o.upper() for o in entry.get("outcomes", DEFAULT_OUTCOMES)),
+            binance_symbol=entry.get("binance_symbol") or assets.get(asset, {}).get("binance_symbol"),
+            slug_template=entry.get("slug_template", DEFAULT_SLUG_TEMPLATE),
+            file_stem=entry.get("file_stem") or default_file_stem(key, interval),
+        )
+
+    binance_symbols = {
+        asset: info["binance_symbol"]
+        for asset, info in assets.items()
+        if isinstance(info, dict) and info.get("binance_symbol")
+    }
+    return MarketRegistry(list(specs.values()), binance_symbols)
+
+
+def load_registry(path: str | None = None) -> MarketRegistry:
+    """从 JSON 配置加载市场注册表；文件不存在时使用内置默认值（与原硬编码的 8 个市场一致）"""
+    if path is None:
+        path = os.getenv("MARKET_REGISTRY_FILE", "").strip() or DEFAULT_REGISTRY_FILE
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return build_registry(json.load(f))
+    return build_registry(DEFAULT_CONFIG)
@@ -0,0 +1,130 @@
+import math
+import os
+import threading
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 列式落盘的统一结构：毫秒级 Unix 时间戳 + 浮点价格 + 有效标记（取代 CSV 中的 "none"/"0" 哨兵值）
+PRICE_SCHEMA = pa.schema([
+    ("ts_ms", pa.int64()),
+    ("price", pa.float64()),
+    ("valid", pa.bool_()),
+])
+
+
+def parse_price(price_str: str) -> tuple[float, bool]:
+    """把落盘价格字符串转换为 (价格, 是否有效)，"none"/"0" 等无效值记为 NaN"""
+    try:
+        price = float(price_str)
+    except (TypeError, ValueError):
+        return math.nan, False
+    if price > 0:
+        return price, True
+    return math.nan, False
+
+
+class _OpenParquet:
+    __slots__ = ("writer", "date_str", "ts", "price", "valid")
+
+    def __init__(self, writer, date_str: str):
+        self.writer = writer
+        self.date_str = date_str
+        self.ts: list[int] = []
+        self.price: list[float] = []
+        self.valid: list[bool] = []
+
+
+class ParquetSink:
+    """
+    与 CSV 并行的列式落盘：按行组批量写入 Parquet，目录布局与 CSV 相同
+    {base_dir}/YYYY-MM/YYYY-MM-DD/{stem}_YYYY-MM-DD.parquet
+
+    Parquet 文件在关闭（零点切换或程序退出）时才写入文件尾，当天仍在写的文件以 CSV 为准；
+    同一天重启后追加写入 {stem}_YYYY-MM-DD.1.parquet 等分片，读取时按目录整体加载即可
+    """
+
+    def __init__(self, base_dir: str = "data", row_group_size: int = 3600, compression: str = "zstd"):
+        self.base_dir = base_dir
+        self.row_group_size = row_group_size
+        self.compression = compression
+
+        self._lock = threading.Lock()
+        self._files: dict[tuple[str, str], _OpenParquet] = {}
+        self._current_date: str | None = None
+        self.stats = {"rows": 0, "row_groups": 0, "files": 0}
+
+    def write_price(self, stem: str, current_datetime: datetime, price_str: str):
+        price, valid = parse_price(price_str)
+        self.write(stem, current_datetime, price, valid)
+
+    def write(self, stem: str, current_datetime: datetime, price: float, valid: bool):
+        date_str = current_datetime.strftime('%Y-%m-%d')
+        with self._lock:
+            if self._current_date is None or date_str > self._current_date:
+                self._rotate(date_str)
+
+            key = (stem, date_str)
+            open_file = self._files.get(key)
+            if open_file is None:
+                open_file = self._open(stem, date_str)
+                self._files[key] = open_file
+
+            open_file.ts.append(int(current_datetime.timestamp() * 1000))
+            open_file.price.append(price)
+            open_file.valid.append(valid)
+            self.stats["rows"] += 1
+
+            if len(open_file.ts) >= self.row_group_size:
+                self._write_row_group(open_file)
+
+    def close(self):
+        with self._lock:
+            for open_file in self._files.values():
+                self._close_file(open_file)
+            self._files.clear()
+
+    # ------------------------ 内部实现 ------------------------
+
+    def _open(self, stem: str, date_str: str) -> _OpenParquet:
+        directory = os.path.join(self.base_dir, date_str[:7], date_str)
+        os.makedirs(directory, exist_ok=True)
+
+        path = os.path.join(directory, f"{stem}_{date_str}.parquet")
+        part = 1
+        while os.path.exists(path):
+            path = os.path.join(directory, f"{stem}_{date_str}.{part}.parquet")
+            part += 1
+
+        writer = pq.ParquetWriter(path, PRICE_SCHEMA, compression=self.compression)
+        self.stats["files"] += 1
+        return _OpenParquet(writer, date_str)
+
+    def _write_row_group(self, open_file: _OpenParquet):
+        if not open_file.ts:
+            return
+        table = pa.Table.from_arrays(
+            [
+                pa.array(open_file.ts, type=pa.int64()),
+                pa.array(open_file.price, type=pa.float64()),
+                pa.array(open_file.valid, type=pa.bool_()),
+            ],
+            schema=PRICE_SCHEMA,
+        )
+        open_file.writer.write_table(table)
+        open_file.ts.clear()
+        open_file.price.clear()
+        open_file.valid.clear()
+        self.stats["row_groups"] += 1
+
+    def _close_file(self, open_file: _OpenParquet):
+        self._write_row_group(open_file)
+        open_file.writer.close()
+
+    def _rotate(self, date_str: str):
+        self._current_date = date_str
+        for key, open_file in list(self._files.items()):
+            if open_file.date_str < date_str:
+                self._close_file(open_file)
+                del self._files[key]
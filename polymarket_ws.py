@@ -0,0 +1,266 @@
+import json
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+import websocket
+
+from clob_book import format_price, resolve_mid
+
+# CLOB market 频道（公开行情，无需鉴权）
+POLYMARKET_WS_URL = "wss://ws-subscriptions-clob.polymarket.com/ws/market"
+
+
+class PolymarketMarketStream:
+    """订阅 CLOB market 频道，在内存中实时维护每个 token 的最优买卖价与中间价"""
+
+    def __init__(
+            self,
+            url: str = POLYMARKET_WS_URL,
+            ping_interval: float = 10.0,
+            reconnect_delay: float = 1.0,
+            max_reconnect_delay: float = 30.0,
+    ):
+        self.url = url
+        self.ping_interval = ping_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self._lock = threading.Lock()
+        self._tokens: set = set()
+        # token_id -> {"bids": {price: size}, "asks": {price: size}, "ts": 本地接收时间}
+        self._books: Dict[str, dict] = {}
+        self._ws: Optional[websocket.WebSocketApp] = None
+        self._connected = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.reconnect_count = 0
+        self.message_count = 0
+
+    # ------------------------ 生命周期 ------------------------
+
+    def start(self):
+        """启动后台连接线程（断线自动重连）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_forever, name="polymarket-ws", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            ws.close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    def set_tokens(self, token_ids: Iterable[str]):
+        """
+        更新订阅的 token 集合：已连接时在当前连接上增量发送退订/订阅消息，未变化的 token 保留盘口，
+        新 token 的盘口在服务端推送快照后可用；未连接时由 _on_open 按完整集合订阅
+        """
+        new_tokens = {t for t in token_ids if t and t != "none"}
+        with self._lock:
+            if new_tokens == self._tokens:
+                return
+            added = sorted(new_tokens - self._tokens)
+            removed = sorted(self._tokens - new_tokens)
+            self._tokens = new_tokens
+            # 已不再订阅的 token 盘口直接丢弃，避免读到过期价格
+            for token_id in removed:
+                self._books.pop(token_id, None)
+            for token_id in added:
+                self._books[token_id] = _empty_book()
+
+            ws = self._ws
+            if ws is None or not self.connected:
+                return
+            # 在锁内发送：与 _on_open 的完整订阅串行，不会漏掉连接建立期间加入的 token
+            try:
+                if removed:
+                    ws.send(json.dumps({"assets_ids": removed, "operation": "unsubscribe"}))
+                if added:
+                    ws.send(json.dumps({"assets_ids": added, "operation": "subscribe"}))
+            except Exception as ex:
+                print(f"[Polymarket WS] 增量订阅失败，重新连接: {str(ex)[:80]}")
+                ws.close()
+                return
+        print(f"[Polymarket WS] 订阅 +{len(added)} / -{len(removed)} 个 token")
+
+    # ------------------------ 读取实时状态 ------------------------
+
+    def get_quote(self, token_id: str) -> Optional[Dict[str, float]]:
+        """返回 {"best_bid", "best_ask", "mid", "ts"}，无数据时返回 None"""
+        if not self.connected:
+            return None
+        with self._lock:
+            book = self._books.get(token_id)
+            if book is None:
+                return None
+            best_bid = max(book["bids"]) if book["bids"] else 0.0
+            best_ask = min(book["asks"]) if book["asks"] else 0.0
+            ts = book["ts"]
+
+        mid = resolve_mid(best_bid, best_ask)
+        return {"best_bid": best_bid, "best_ask": best_ask, "mid": mid, "ts": ts}
+
+    def get_book(self, token_id: str, depth: int) -> Optional[tuple]:
+        """返回前 depth 档 (bids, asks)，均为 [(价格, 数量)]，无数据时返回 None"""
+        if not self.connected:
+            return None
+        with self._lock:
+            book = self._books.get(token_id)
+            if book is None:
+                return None
+            bids = sorted(book["bids"].items(), reverse=True)[:depth]
+            asks = sorted(book["asks"].items())[:depth]
+        return bids, asks
+
+    def get_price(self, token_id: str) -> str:
+        """返回与 get_price_sync 相同格式的价格字符串，无数据时返回 "none" """
+        if not token_id or token_id == "none":
+            return "none"
+        quote = self.get_quote(token_id)
+        if quote is None:
+            return "none"
+        return format_price(quote["mid"])
+
+    # ------------------------ 连接与消息处理 ------------------------
+
+    def _run_forever(self):
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            with self._lock:
+                has_tokens = bool(self._tokens)
+            if not has_tokens:
+                # 尚无可订阅的 token，等待 set_tokens
+                time.sleep(0.2)
+                continue
+
+            started = time.monotonic()
+            self._ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+                on_close=self._on_close,
+            )
+            try:
+                # ping_timeout 同时是读循环的 select 超时：stop() 后最多 0.5 秒退出（默认最长阻塞 10 秒）
+                self._ws.run_forever(ping_timeout=0.5)
+            except Exception as ex:
+                print(f"[Polymarket WS] 连接异常: {str(ex)[:80]}")
+            finally:
+                self._connected.clear()
+                self._ws = None
+
+            if self._stop.is_set():
+                break
+
+            # 连接维持较久说明是正常断开（如服务端主动关闭），立即重连；否则指数退避
+            if time.monotonic() - started > 5:
+                delay = self.reconnect_delay
+                time.sleep(0.05)
+            else:
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+            self.reconnect_count += 1
+
+    def _on_open(self, ws):
+        with self._lock:
+            tokens = sorted(self._tokens)
+            # 新连接（含断线重连）：断线期间的盘口不可信，等待服务端推送新的快照
+            self._books = {t: _empty_book() for t in tokens}
+            ws.send(json.dumps({"assets_ids": tokens, "type": "market"}))
+            self._connected.set()
+        print(f"[Polymarket WS] 已订阅 {len(tokens)} 个 token")
+
+        def heartbeat():
+            # 服务端要求客户端定期发送 PING 文本保活
+            while self._connected.is_set() and ws is self._ws:
+                time.sleep(self.ping_interval)
+                try:
+                    ws.send("PING")
+                except Exception:
+                    break
+
+        threading.Thread(target=heartbeat, name="polymarket-ws-ping", daemon=True).start()
+
+    def _on_close(self, ws, status_code=None, msg=None):
+        self._connected.clear()
+
+    def _on_error(self, ws, error):
+        print(f"[Polymarket WS] 错误: {str(error)[:80]}")
+
+    def _on_message(self, ws, message: str):
+        if message == "PONG":
+            return
+        try:
+            data = json.loads(message)
+        except ValueError:
+            return
+
+        self.message_count += 1
+        events = data if isinstance(data, list) else [data]
+        now = time.time()
+        with self._lock:
+            for event in events:
+                if isinstance(event, dict):
+                    self._apply_event(event, now)
+
+    def _apply_event(self, event: dict, now: float):
+        event_type = event.get("event_type")
+
+        if event_type == "book":
+            book = self._books.get(event.get("asset_id"))
+            if book is None:
+                return
+            book["bids"] = _levels_to_map(event.get("bids") or event.get("buys") or [])
+            book["asks"] = _levels_to_map(event.get("asks") or event.get("sells") or [])
+            book["ts"] = now
+
+        elif event_type == "price_change":
+            # 新格式：price_changes 中每条带 asset_id；旧格式：顶层 asset_id + changes
+            if "price_changes" in event:
+                changes = event["price_changes"]
+            else:
+                changes = [dict(c, asset_id=event.get("asset_id")) for c in event.get("changes", [])]
+
+            for change in changes:
+                book = self._books.get(change.get("asset_id"))
+                if book is None:
+                    continue
+                side = "bids" if str(change.get("side", "")).upper() == "BUY" else "asks"
+                try:
+                    price = float(change["price"])
+                    size = float(change["size"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if size > 0:
+                    book[side][price] = size
+                else:
+                    book[side].pop(price, None)
+                book["ts"] = now
+
+
+def _empty_book() -> dict:
+    return {"bids": {}, "asks": {}, "ts": 0.0}
+
+
+def _levels_to_map(levels) -> Dict[float, float]:
+    result = {}
+    for level in levels:
+        try:
+            price = float(level["price"])
+            size = float(level["size"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if size > 0:
+            result[price] = size
+    return result
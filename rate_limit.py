@@ -0,0 +1,283 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+
+# 各主机的默认预算：(每秒请求数, 突发容量)，低于交易所公开限额并留有余量
+DEFAULT_HOST_RATES = {
+    "gamma-api.polymarket.com": (10.0, 20),
+    "clob.polymarket.com": (20.0, 40),
+    "api.binance.com": (10.0, 20),
+}
+DEFAULT_RATE = (10.0, 20)
+
+# 可重试的 HTTP 状态码：限流与服务端错误
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(Exception):
+    """在截止时间之前未能拿到配额或完成请求"""
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """解析 Retry-After 头（秒数）；无法解析时返回 None"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class HostLimiter:
+    """
+    单个主机的令牌桶 + 自适应并发上限
+    收到 429 时并发上限减半，并在 Retry-After 期间暂停发放配额；
+    连续成功达到当前上限次数后上限加 1（加性增、乘性减）
+    """
+
+    def __init__(self, rate: float, burst: int | None = None, max_concurrency: int = 16, min_concurrency: int = 1):
+        if rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+
+        self._cond = threading.Condition()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._in_flight = 0
+        self._limit = max_concurrency
+        self._successes = 0
+        self._paused_until = 0.0  # 单调时钟
+
+        self.stats = {"requests": 0, "throttled": 0, "rejected": 0, "waited_seconds": 0.0}
+
+    @property
+    def concurrency_limit(self) -> int:
+        return self._limit
+
+    def try_acquire(self) -> float:
+        """非阻塞地尝试取得一个配额：成功返回 0，否则返回建议等待的秒数"""
+        with self._cond:
+            return self._try_acquire()
+
+    def acquire(self, deadline: float | None = None) -> bool:
+        """阻塞直到取得配额；deadline 为 Unix 时间戳，截止前拿不到时返回 False"""
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                if deadline is not None and time.time() >= deadline:
+                    self.stats["rejected"] += 1
+                    return False
+                wait = self._try_acquire()
+                if wait == 0:
+                    self.stats["waited_seconds"] += time.monotonic() - started
+                    return True
+                if deadline is not None and time.time() + wait > deadline:
+                    self.stats["rejected"] += 1
+                    return False
+                self._cond.wait(wait)
+
+    def release(self, status: int | None = None, retry_after: float | None = None):
+        """归还并发名额；status 为 429 时收缩并发上限并按 Retry-After 暂停"""
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            if status == 429:
+                self.stats["throttled"] += 1
+                self._limit = max(self.min_concurrency, self._limit // 2)
+                self._successes = 0
+                pause = retry_after if retry_after is not None else 1.0
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+                self._tokens = 0.0
+            elif status is not None and status < 400:
+                self._successes += 1
+                if self._successes >= self._limit and self._limit < self.max_concurrency:
+                    self._limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            result = dict(self.stats)
+            result["concurrency_limit"] = self._limit
+            result["in_flight"] = self._in_flight
+            result["paused_seconds"] = max(0.0, self._paused_until - time.monotonic())
+        return result
+
+    def _try_acquire(self) -> float:
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._in_flight >= self._limit:
+            # 等待其他请求归还名额（release 会唤醒），给出一个较短的轮询间隔
+            return 0.05
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+
+        self._tokens -= 1
+        self._in_flight += 1
+        self.stats["requests"] += 1
+        return 0
+
+
+class RateLimiter:
+    """
+    按主机划分的共享请求预算，以及带截止时间的重试：
+    每次重试前确认退避后仍在截止时间之内，否则直接放弃（采样请求不会拖过当前采样周期，
+    token 刷新则可以一直重试到周期边界）
+    """
+
+    def __init__(
+            self,
+            host_rates: Dict[str, tuple] | None = None,
+            default_rate: tuple = DEFAULT_RATE,
+            base_delay: float = 0.2,
+            max_delay: float = 5.0,
+    ):
+        self.host_rates = dict(DEFAULT_HOST_RATES if host_rates is None else host_rates)
+        self.default_rate = default_rate
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, HostLimiter] = {}
+        # 每次请求尝试结束后的回调 (主机, 状态码或 None, 耗时秒数)，用于延迟统计（见 metrics）
+        self.on_request: Optional[Callable[[str, Optional[int], float], None]] = None
+
+    def configure(self, host: str, rate: float, burst: int | None = None):
+        """调整某个主机的预算（替换已创建的限流器）"""
+        with self._lock:
+            self.host_rates[host] = (rate, burst)
+            self._hosts.pop(host, None)
+
+    def for_host(self, host: str) -> HostLimiter:
+        with self._lock:
+            limiter = self._hosts.get(host)
+            if limiter is None:
+                rate, burst = self.host_rates.get(host, self.default_rate)
+                limiter = HostLimiter(rate, burst)
+                self._hosts[host] = limiter
+            return limiter
+
+    def for_url(self, url: str) -> HostLimiter:
+        return self.for_host(urlparse(url).hostname or url)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {host: limiter.snapshot() for host, limiter in hosts.items()}
+
+    def observe(self, host: str, status: int | None, seconds: float):
+        if self.on_request is not None:
+            self.on_request(host, status, seconds)
+
+    def backoff(self, attempt: int, retry_after: float | None = None) -> float:
+        """第 attempt 次重试前的等待时间：优先 Retry-After，否则指数退避加抖动"""
+        if retry_after is not None:
+            return retry_after
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def request(self, session, method: str, url: str, deadline: float, **kwargs):
+        """
+        通过 requests.Session 发起受限流与截止时间约束的请求，返回最后一次的 Response
+        429 / 5xx / 网络异常在截止时间内重试；截止前拿不到配额时抛出 DeadlineExceeded
+        """
+        host = urlparse(url).hostname or url
+        limiter = self.for_host(host)
+        timeout = kwargs.pop("timeout", None)
+        attempt = 0
+        while True:
+            if not limiter.acquire(deadline):
+                raise DeadlineExceeded(url)
+            remaining = max(0.01, deadline - time.time())
+            started = time.monotonic()
+            try:
+                response = session.request(
+                    method, url,
+                    timeout=min(timeout, remaining) if timeout is not None else remaining,
+                    **kwargs,
+                )
+            except Exception:
+                self.observe(host, None, time.monotonic() - started)
+                limiter.release()
+                if not self._sleep_before_retry(attempt, None, deadline):
+                    raise
+                attempt += 1
+                continue
+
+            self.observe(host, response.status_code, time.monotonic() - started)
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            limiter.release(response.status_code, retry_after)
+            if response.status_code not in RETRY_STATUS:
+                return response
+            if not self._sleep_before_retry(attempt, retry_after, deadline):
+                return response
+            attempt += 1
+
+    def call(self, host: str, func: Callable, deadline: float):
+        """
+        对不经过 requests 的客户端（如 py_clob_client）调用 func()，同样受限流与截止时间约束
+        异常带 status_code 时按状态码判断是否可重试，没有状态码的视为网络异常
+        """
+        limiter = self.for_host(host)
+        attempt = 0
+        while True:
+            if not limiter.acquire(deadline):
+                raise DeadlineExceeded(host)
+            started = time.monotonic()
+            try:
+                result = func()
+            except Exception as ex:
+                status = getattr(ex, "status_code", None)
+                self.observe(host, status, time.monotonic() - started)
+                limiter.release(status)
+                if status is not None and status not in RETRY_STATUS:
+                    raise
+                if not self._sleep_before_retry(attempt, None, deadline):
+                    raise
+                attempt += 1
+                continue
+            self.observe(host, 200, time.monotonic() - started)
+            limiter.release(200)
+            return result
+
+    def _sleep_before_retry(self, attempt: int, retry_after: float | None, deadline: float) -> bool:
+        delay = self.backoff(attempt, retry_after)
+        if time.time() + delay >= deadline:
+            return False
+        time.sleep(delay)
+        return True
+
+
+async def acquire_async(limiter: HostLimiter, deadline: float | None = None) -> bool:
+    """asyncio 版本的 acquire：等待期间让出事件循环"""
+    while True:
+        if deadline is not None and time.time() >= deadline:
+            limiter.stats["rejected"] += 1
+            return False
+        wait = limiter.try_acquire()
+        if wait == 0:
+            return True
+        if deadline is not None and time.time() + wait > deadline:
+            limiter.stats["rejected"] += 1
+            return False
+        await asyncio.sleep(wait)
+
+
+def parse_host_rates(spec: str) -> Dict[str, tuple]:
+    """解析 "host=每秒请求数:突发容量,host2=..." 形式的配置"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        host, _, value = item.partition("=")
+        rate, _, burst = value.partition(":")
+        rates[host.strip()] = (float(rate), int(burst) if burst else None)
+    return rates
+
+
+# 进程内共享的默认预算：crypto15、main 与 asyncio 引擎访问同一主机时共用同一个令牌桶
+default_limiter = RateLimiter()
@@ -0,0 +1,306 @@
+"""
+多进程分片采集：一个协调进程 + 若干采样进程 + 一个写盘进程
+
+  协调进程：持有市场注册表，负责 API 凭证、token 初始化与周期切换（复用 main.update_tokens_thread），
+            token 变化后经管道只把对应分片的更新发给各采样进程
+  采样进程：各自按墙钟对齐的周期采样一个分片的市场（以及分到的币安交易对），采样结果（含组合流缓冲的逐笔成交）
+            经队列发给写盘进程；各自运行监督器，只重建本分片中故障的数据源或市场
+  写盘进程：唯一写入 data/ 的进程（复用 main.write_rows），每个序列只属于一个分片，文件内仍按时间顺序
+
+用法：
+    python sharded.py            # 进程数由 SHARD_WORKERS 决定
+    SHARD_WORKERS=6 python sharded.py
+
+配置与 main.py 相同（.env）；各主机的请求预算按采样进程数均分。盘口深度记录在分片模式下不启用，
+RESTART_ON_FAILURE 不适用（故障组件由采样进程的监督器重建）。
+"""
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+
+import main
+
+# 协调进程检查 token 变化并下发的间隔（秒）：远小于 TOKEN_SWAP_LEAD，切换在边界前送达
+TOKEN_SYNC_INTERVAL = 0.05
+# 采样进程每隔多少个周期打印一次状态
+STATUS_EVERY_TICKS = 60
+# 写盘进程等待队列的超时（秒）：超时后检查采样进程是否已全部退出（含未发出结束标记就崩溃的进程）
+WRITER_POLL_INTERVAL = 0.5
+
+
+def default_worker_count() -> int:
+    return max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+def split_round_robin(items: list, count: int) -> list:
+    """轮流分配，保证各周期的市场大致均匀地分布在各分片"""
+    return [items[i::count] for i in range(count)]
+
+
+def token_snapshot(market_token_ids: dict) -> dict:
+    return {key: (tokens.get("UP"), tokens.get("DOWN")) for key, tokens in market_token_ids.items()}
+
+
+# ======================== 采样进程 ========================
+
+def _worker_main(index: int, keys: list, symbols: dict, creds: dict | None, tokens: dict,
+                 worker_count: int, conn, row_queue, stop_event):
+    # Ctrl + C 由协调进程处理：设置 stop_event 后本进程在当前周期结束时退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # 初始化失败也要发出结束标记，写盘进程不会一直等待本进程
+    try:
+        _worker_setup(keys, symbols, creds, tokens, worker_count)
+        threading.Thread(target=_receive_tokens, args=(conn,), name="token-sync", daemon=True).start()
+        _worker_loop(index, row_queue, stop_event)
+    finally:
+        _worker_shutdown(index, row_queue)
+        row_queue.put(None)
+
+
+def _worker_setup(keys: list, symbols: dict, creds: dict | None, tokens: dict, worker_count: int):
+    """把 main 的全局状态收窄到本分片，并按进程数均分请求预算"""
+    main.MARKET_TOKEN_IDS = {key: dict(tokens.get(key) or {"UP": "none"}) for key in keys}
+    main.none_counter = {key: 0 for key in keys}
+    main.BINANCE_SYMBOLS = dict(symbols)
+    main.binance_none_counter = {coin: 0 for coin in symbols}
+    main.COLLECTION_CONFIG["ENABLE_POLYMARKET"] = main.COLLECTION_CONFIG["ENABLE_POLYMARKET"] and bool(keys)
+    main.COLLECTION_CONFIG["ENABLE_BINANCE"] = main.COLLECTION_CONFIG["ENABLE_BINANCE"] and bool(symbols)
+    # 状态文件由协调进程保存；采样进程只持有本分片的市场，重建时不能覆盖它
+    main.STATE_CONFIG["ENABLED"] = False
+
+    # 共享预算按进程数均分，所有采样进程合计不超过单进程时的限额
+    limiter = main.rate_limiter
+    for host, (rate, burst) in list(limiter.host_rates.items()):
+        limiter.configure(host, rate / worker_count, max(1, (burst or int(rate)) // worker_count))
+    rate, burst = limiter.default_rate
+    limiter.default_rate = (rate / worker_count, max(1, (burst or int(rate)) // worker_count))
+
+    if main.COLLECTION_CONFIG["ENABLE_POLYMARKET"]:
+        # 凭证由协调进程派生后传入，这里不再发起网络请求
+        main.client = main.create_clob_client(creds)
+        if main.POLYMARKET_CONFIG["PRICE_MODE"] == "stream":
+            main.start_polymarket_stream()
+    if main.COLLECTION_CONFIG["ENABLE_BINANCE"] and main.BINANCE_CONFIG["PRICE_MODE"] == "stream":
+        main.start_binance_stream()
+    if main.COLLECTION_CONFIG["ENGINE"] == "asyncio":
+        main.start_async_collector()
+    # 与单进程模式相同的熔断与按组件重建，范围限于本分片
+    main.setup_supervisor()
+
+
+def _worker_shutdown(index: int, row_queue):
+    """停止组合流与 asyncio 引擎；最后一个周期之后到达的成交作为不带周期信息的一项发给写盘进程"""
+    try:
+        if main.binance_stream is not None:
+            main.binance_stream.stop()
+            rows = main.binance_trade_rows()
+            if rows:
+                row_queue.put((time.time(), rows, None))
+        main.stop_async_collector()
+        for line in main.supervisor.summary_lines():
+            print(f"[W{index}] 故障恢复统计 {line}")
+    except Exception as ex:
+        print(f"[警告] [W{index}] 采样进程清理失败: {str(ex)[:80]}")
+
+
+def _receive_tokens(conn):
+    """接收协调进程下发的 token 更新 {key: tokens}，整体替换对应市场的字典（采样线程读到的总是完整的一组）"""
+    while True:
+        try:
+            update = conn.recv()
+        except (EOFError, OSError):
+            return
+        if update is None:
+            return
+        for key, tokens in update.items():
+            if key in main.MARKET_TOKEN_IDS:
+                main.MARKET_TOKEN_IDS[key] = tokens
+        if main.polymarket_stream is not None:
+            main.polymarket_stream.set_tokens(main.get_subscribed_token_ids())
+
+
+def _worker_loop(index: int, row_queue, stop_event):
+    period = main.COLLECTION_CONFIG["SAMPLE_PERIOD"]
+    max_ticks = main.COLLECTION_CONFIG["MAX_TICKS"]
+    scheduler = main.TickScheduler(period)
+    prefix = f"[W{index}]"
+    print(f"{prefix} 采样 {len(main.MARKET_TOKEN_IDS)} 个市场、{len(main.BINANCE_SYMBOLS)} 个币安交易对")
+
+    while not stop_event.is_set():
+        tick = scheduler.wait_next()
+        main._tick_deadline = tick.scheduled_time + period
+        if tick.missed:
+            print(f"{prefix} ⚠️ 上一周期处理超时，跳过 {tick.missed} 个采样点（累计 {scheduler.stats['missed']}）")
+
+        polymarket_prices, binance_prices = main.collect_tick()
+        response_time = time.time()
+
+        rows, polymarket_failed, binance_failed = main.build_price_rows(
+            polymarket_prices, binance_prices, log_prefix=prefix,
+        )
+        failed = len(polymarket_failed or []) + len(binance_failed or [])
+        main.report_health(polymarket_failed, binance_failed)
+        rows.extend(main.binance_trade_rows())
+
+        tick_info = (index, tick.lag, response_time - tick.scheduled_time, tick.missed, response_time)
+        row_queue.put((tick.scheduled_time, rows, tick_info))
+
+        ticks = scheduler.stats["ticks"]
+        if scheduler.finish(tick):
+            print(f"{prefix} ⚠️ 本周期处理耗时超过 {period:g} 秒（累计超时 {scheduler.stats['overruns']} 次）")
+        if ticks % STATUS_EVERY_TICKS == 1:
+            print(f"{prefix} 第 {ticks} 个周期：{len(rows)} 行，失败 {failed}，"
+                  f"耗时 {(response_time - tick.scheduled_time) * 1000:.0f}ms")
+        if max_ticks and ticks >= max_ticks:
+            return
+
+
+# ======================== 写盘进程 ========================
+
+def _writer_main(row_queue, worker_count: int, workers_done):
+    """
+    所有采样进程都发出结束标记后退出；采样进程被强制结束时收不到标记，
+    协调进程在所有采样进程退出后设置 workers_done，写盘进程落完队列中剩余的数据后退出
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if main.get_env_bool("ENABLE_PARQUET_SINK", "0"):
+        main.start_parquet_sink()
+    record_ticks = main.COLLECTION_CONFIG["RECORD_TICKS"]
+    finished = 0
+    written = 0
+    while finished < worker_count:
+        try:
+            item = row_queue.get(timeout=WRITER_POLL_INTERVAL)
+        except queue.Empty:
+            if workers_done.is_set():
+                print(f"[警告] {worker_count - finished} 个采样进程未发出结束标记，写盘进程退出")
+                break
+            continue
+        if item is None:
+            finished += 1
+            continue
+        scheduled_time, rows, tick_info = item
+        current_datetime = main.to_data_datetime(scheduled_time)
+        main.write_rows((current_datetime, rows))
+        # 采样进程退出前发出的剩余成交没有周期信息
+        if record_ticks and tick_info is not None:
+            save_worker_tick(current_datetime, tick_info)
+        written += 1
+    main.csv_sink.close()
+    if main.parquet_sink is not None:
+        main.parquet_sink.close()
+    print(f"写盘进程完成：共 {written} 个分片周期")
+
+
+def save_worker_tick(current_datetime, tick_info: tuple):
+    """每个采样进程一个 TICKS_W{n} 文件，记录该分片的调度延迟与单周期耗时"""
+    index, lag, response_seconds, missed, response_time = tick_info
+    main.csv_sink.write_row(
+        f"TICKS_W{index}",
+        current_datetime,
+        [
+            main.format_tick_time(current_datetime),
+            main.format_tick_time(main.to_data_datetime(response_time)),
+            f"{lag * 1000:.1f}",
+            f"{response_seconds * 1000:.1f}",
+            missed,
+        ],
+        ['time', 'response_time', 'lag_ms', 'response_ms', 'missed'],
+    )
+
+
+# ======================== 协调进程 ========================
+
+def _sync_tokens(shard_of: dict, conns: list, stop_event):
+    """token 变化（预取切换、补取、热启动校验）后，只向对应的采样进程下发变化的市场"""
+    last = token_snapshot(main.MARKET_TOKEN_IDS)
+    while not stop_event.wait(TOKEN_SYNC_INTERVAL):
+        current = token_snapshot(main.MARKET_TOKEN_IDS)
+        if current == last:
+            continue
+        updates = [{} for _ in conns]
+        for key, value in current.items():
+            if last.get(key) != value and key in shard_of:
+                updates[shard_of[key]][key] = dict(main.MARKET_TOKEN_IDS[key])
+        for conn, update in zip(conns, updates):
+            if update:
+                conn.send(update)
+        last = current
+
+
+def run(worker_count: int | None = None):
+    worker_count = worker_count or int(main.get_env_value("SHARD_WORKERS", "0") or "0") or default_worker_count()
+    main.init_polymarket_client()
+    if not main.COLLECTION_CONFIG["ENABLE_POLYMARKET"] and not main.COLLECTION_CONFIG["ENABLE_BINANCE"]:
+        raise ValueError("ENABLE_POLYMARKET 和 ENABLE_BINANCE 不能同时关闭")
+    if main.DEPTH_CONFIG["ENABLED"]:
+        print("[警告] 分片模式下不记录盘口深度（ENABLE_DEPTH_CAPTURE 已忽略）")
+    if main.SUPERVISOR_CONFIG["RESTART_ON_FAILURE"]:
+        print("[警告] 分片模式下不支持 RESTART_ON_FAILURE，故障组件由各采样进程的监督器重建")
+
+    keys = list(main.MARKET_TOKEN_IDS) if main.COLLECTION_CONFIG["ENABLE_POLYMARKET"] else []
+    coins = list(main.BINANCE_SYMBOLS) if main.COLLECTION_CONFIG["ENABLE_BINANCE"] else []
+    worker_count = max(1, min(worker_count, max(len(keys), len(coins), 1)))
+    key_shards = split_round_robin(keys, worker_count)
+    coin_shards = split_round_robin(coins, worker_count)
+    shard_of = {key: i for i, shard in enumerate(key_shards) for key in shard}
+
+    if keys:
+        print(f"正在初始化 token_id（{len(keys)} 个市场）...")
+        main.update_registry_token_ids(main.MARKET_TOKEN_IDS, main.MARKET_REGISTRY)
+        main.save_collector_state()
+    print(f"分片模式：{worker_count} 个采样进程，{len(keys)} 个市场，{len(coins)} 个币安交易对")
+
+    ctx = multiprocessing.get_context("spawn")
+    stop_event = ctx.Event()
+    workers_done = ctx.Event()
+    row_queue = ctx.Queue(maxsize=int(main.get_env_value("WRITER_QUEUE_SIZE", "600") or "600") * worker_count)
+    writer = ctx.Process(target=_writer_main, args=(row_queue, worker_count, workers_done), name="shard-writer")
+    writer.start()
+
+    creds = main._creds_entry if main.client is not None else None
+    workers = []
+    conns = []
+    for index in range(worker_count):
+        parent_conn, child_conn = ctx.Pipe(duplex=False)
+        tokens = {key: dict(main.MARKET_TOKEN_IDS[key]) for key in key_shards[index]}
+        symbols = {coin: main.BINANCE_SYMBOLS[coin] for coin in coin_shards[index]}
+        process = ctx.Process(
+            target=_worker_main,
+            args=(index, key_shards[index], symbols, creds, tokens, worker_count, parent_conn, row_queue, stop_event),
+            name=f"shard-{index}",
+        )
+        process.start()
+        workers.append(process)
+        conns.append(child_conn)
+
+    if keys:
+        threading.Thread(target=main.update_tokens_thread, name="token-refresh", daemon=True).start()
+        threading.Thread(
+            target=_sync_tokens, args=(shard_of, conns, stop_event), name="token-sync", daemon=True,
+        ).start()
+
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        print("\n正在停止采样进程...")
+        stop_event.set()
+        for process in workers:
+            process.join()
+    for process in workers:
+        if process.exitcode:
+            print(f"[警告] 采样进程 {process.name} 异常退出（exitcode {process.exitcode}）")
+    stop_event.set()
+    workers_done.set()
+    for conn in conns:
+        conn.close()
+    writer.join()
+    print("\n程序已停止")
+
+
+if __name__ == "__main__":
+    run()
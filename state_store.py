@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from cycle_calendar import cycle_start_ts
+
+STATE_VERSION = 1
+DEFAULT_STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".collector_state.json")
+# 凭证的最长复用时间（秒），超过后启动时重新派生
+DEFAULT_CREDS_MAX_AGE = 7 * 24 * 3600
+
+
+def account_fingerprint(private_key: str, funder: str, signature_type: int) -> str:
+    """账户配置的指纹：私钥、资金地址或签名类型变化后旧凭证作废（文件中不保存私钥）"""
+    raw = f"{private_key}|{funder.lower()}|{signature_type}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+def load_state(path: str = DEFAULT_STATE_FILE) -> dict:
+    """读取状态文件；不存在、损坏或版本不符时返回空字典"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+        return {}
+    return state
+
+
+def save_state(state: dict, path: str = DEFAULT_STATE_FILE):
+    """
+    原子写入状态文件，权限 600（文件含 API 凭证）
+    多个线程可能同时保存（热启动校验、token 刷新、重建），每次写入使用独立的临时文件，最后一次替换生效
+    """
+    state = dict(state, version=STATE_VERSION, saved_at=time.time())
+    directory, name = os.path.split(os.path.abspath(path))
+    # mkstemp 创建的文件权限即为 600
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def valid_creds(state: dict, fingerprint: str, max_age: float = DEFAULT_CREDS_MAX_AGE, now: float | None = None):
+    """返回可复用的凭证 {"api_key", "api_secret", "api_passphrase"}；账户不符或过期时返回 None"""
+    creds = state.get("creds")
+    if not isinstance(creds, dict) or creds.get("fingerprint") != fingerprint:
+        return None
+    now = time.time() if now is None else now
+    if now - float(creds.get("derived_at", 0)) > max_age:
+        return None
+    if not all(creds.get(k) for k in ("api_key", "api_secret", "api_passphrase")):
+        return None
+    return creds
+
+
+def creds_entry(creds, fingerprint: str) -> dict:
+    """把 ApiCreds 转换为可保存的字典"""
+    return {
+        "fingerprint": fingerprint,
+        "derived_at": time.time(),
+        "api_key": creds.api_key,
+        "api_secret": creds.api_secret,
+        "api_passphrase": creds.api_passphrase,
+    }
+
+
+def market_entries(market_token_ids: dict, registry, now: float | None = None) -> dict:
+    """
+    当前周期已解析的市场：{key: {"UP", "DOWN"?, "cycle_start", "slug"}}
+    cycle_start 与 slug 用于下次启动时校验是否仍是同一周期、同一市场定义；
+    slug 为 token 实际所属的市场（偏移回退时是相邻周期），没有记录 slug 的 token 无法校验，不保存
+    """
+    entries = {}
+    for key, tokens in market_token_ids.items():
+        if tokens.get("UP", "none") == "none" or not tokens.get("slug"):
+            continue
+        spec = registry.get(key)
+        cycle_start = cycle_start_ts(spec.interval_seconds, now)
+        entry = {"UP": tokens["UP"], "cycle_start": cycle_start, "slug": tokens["slug"]}
+        if tokens.get("DOWN"):
+            entry["DOWN"] = tokens["DOWN"]
+        entries[key] = entry
+    return entries
+
+
+def valid_markets(state: dict, registry, now: float | None = None) -> dict:
+    """
+    返回状态文件中仍属于当前周期的市场 {key: {"UP", "DOWN"?, "slug"}}；
+    周期已切换、定义变化或当时解析到的是相邻周期市场的条目丢弃
+    """
+    result = {}
+    for key, entry in (state.get("markets") or {}).items():
+        if key not in registry.keys() or not isinstance(entry, dict):
+            continue
+        spec = registry.get(key)
+        cycle_start = cycle_start_ts(spec.interval_seconds, now)
+        if entry.get("cycle_start") != cycle_start or entry.get("slug") != spec.slug(cycle_start):
+            continue
+        if spec.with_down and not entry.get("DOWN"):
+            continue
+        result[key] = {k: entry[k] for k in ("UP", "DOWN", "slug") if entry.get(k)}
+    return result
@@ -0,0 +1,185 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    单个组件（数据源或单个市场）的熔断状态
+      closed:    正常，统计连续失败次数
+      open:      连续失败达到阈值，正在重建或等待冷却后再次重建
+      half_open: 重建完成，等待下一次采样验证；成功则 closed，失败则回到 open 且冷却时间翻倍
+    """
+
+    def __init__(self, name: str, kind: str, rebuild: Optional[Callable[[], bool]] = None):
+        self.name = name
+        self.kind = kind
+        self.rebuild = rebuild
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.failure_started: float | None = None
+        self.retry_at = 0.0
+        self.cooldown = 0.0
+        self.rebuilding = False
+        self.opens = 0
+        self.rebuilds = 0
+        self.rebuild_failures = 0
+
+
+class Supervisor:
+    """
+    进程内监督器：按数据源与市场分别熔断，只重建出故障的组件，其余序列照常采样
+    每次故障（熔断打开）从第一次失败到恢复成功的耗时按组件类型记录
+    """
+
+    def __init__(self, failure_threshold: int = 15, cooldown: float = 10.0, max_cooldown: float = 120.0):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        # kind -> {"incidents", "recoveries", "last_recovery", "max_recovery", "total_recovery"}
+        self.recovery_stats: Dict[str, dict] = {}
+
+    def register(self, name: str, kind: str, rebuild: Optional[Callable[[], bool]] = None) -> CircuitBreaker:
+        """注册组件；rebuild 返回是否重建成功，为 None 时只做熔断与恢复统计"""
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, kind, rebuild)
+                self._breakers[name] = breaker
+            else:
+                breaker.rebuild = rebuild
+            return breaker
+
+    def get(self, name: str) -> Optional[CircuitBreaker]:
+        return self._breakers.get(name)
+
+    def state(self, name: str) -> str:
+        breaker = self._breakers.get(name)
+        return breaker.state if breaker is not None else CLOSED
+
+    def report(self, name: str, ok: bool):
+        """上报一次采样结果（每个采样周期每个组件一次）"""
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            return
+        now = time.monotonic()
+
+        with self._lock:
+            if ok:
+                if breaker.state != CLOSED:
+                    self._record_recovery(breaker, now - breaker.failure_started)
+                breaker.state = CLOSED
+                breaker.consecutive_failures = 0
+                breaker.failure_started = None
+                breaker.cooldown = 0.0
+                return
+
+            breaker.consecutive_failures += 1
+            if breaker.failure_started is None:
+                breaker.failure_started = now
+
+            if breaker.state == CLOSED:
+                if breaker.consecutive_failures < self.failure_threshold:
+                    return
+                breaker.state = OPEN
+                breaker.opens += 1
+                breaker.cooldown = self.base_cooldown
+                self._stats_for(breaker.kind)["incidents"] += 1
+                action = "熔断并重建" if breaker.rebuild is not None else "熔断"
+                print(f"    ✗ [{breaker.name}] 连续 {breaker.consecutive_failures} 次失败，{action}")
+                start = True
+            elif breaker.state == HALF_OPEN:
+                # 重建后的验证仍失败：冷却时间翻倍后再重建
+                breaker.state = OPEN
+                breaker.cooldown = min(self.max_cooldown, breaker.cooldown * 2 or self.base_cooldown)
+                breaker.retry_at = now + breaker.cooldown
+                start = False
+            else:
+                start = not breaker.rebuilding and now >= breaker.retry_at
+
+            if start:
+                self._start_rebuild(breaker)
+
+    def snapshot(self) -> dict:
+        """各组件的熔断状态与各类故障的恢复耗时统计"""
+        with self._lock:
+            breakers = {
+                name: {
+                    "kind": b.kind,
+                    "state": b.state,
+                    "consecutive_failures": b.consecutive_failures,
+                    "opens": b.opens,
+                    "rebuilds": b.rebuilds,
+                    "rebuild_failures": b.rebuild_failures,
+                }
+                for name, b in self._breakers.items()
+            }
+            recovery = {kind: dict(stats) for kind, stats in self.recovery_stats.items()}
+        return {"breakers": breakers, "recovery": recovery}
+
+    def summary_lines(self) -> list:
+        lines = []
+        for kind, stats in sorted(self.recovery_stats.items()):
+            avg = stats["total_recovery"] / stats["recoveries"] if stats["recoveries"] else 0.0
+            lines.append(
+                f"{kind}: 故障 {stats['incidents']} 次，恢复 {stats['recoveries']} 次，"
+                f"平均 {avg:.1f}s，最长 {stats['max_recovery']:.1f}s"
+            )
+        return lines
+
+    # ------------------------ 内部实现 ------------------------
+
+    def _stats_for(self, kind: str) -> dict:
+        stats = self.recovery_stats.get(kind)
+        if stats is None:
+            stats = {"incidents": 0, "recoveries": 0, "last_recovery": 0.0, "max_recovery": 0.0, "total_recovery": 0.0}
+            self.recovery_stats[kind] = stats
+        return stats
+
+    def _record_recovery(self, breaker: CircuitBreaker, seconds: float):
+        stats = self._stats_for(breaker.kind)
+        stats["recoveries"] += 1
+        stats["last_recovery"] = seconds
+        stats["max_recovery"] = max(stats["max_recovery"], seconds)
+        stats["total_recovery"] += seconds
+        print(f"    ✓ [{breaker.name}] 已恢复，故障持续 {seconds:.1f}s")
+
+    def _start_rebuild(self, breaker: CircuitBreaker):
+        """调用方需持有 self._lock"""
+        if breaker.rebuild is None:
+            # 无可重建的对象：冷却后直接进入验证
+            breaker.state = HALF_OPEN
+            return
+        breaker.rebuilding = True
+        threading.Thread(target=self._run_rebuild, args=(breaker,), name=f"rebuild-{breaker.name}", daemon=True).start()
+
+    def _run_rebuild(self, breaker: CircuitBreaker):
+        started = time.monotonic()
+        try:
+            ok = bool(breaker.rebuild())
+        except Exception as ex:
+            print(f"[警告] [{breaker.name}] 重建失败: {str(ex)[:80]}")
+            ok = False
+        elapsed = time.monotonic() - started
+
+        with self._lock:
+            breaker.rebuilding = False
+            breaker.rebuilds += 1
+            if breaker.state != OPEN:
+                return
+            if ok:
+                breaker.state = HALF_OPEN
+                print(f"[{breaker.name}] 重建完成（{elapsed:.2f}s），等待采样验证")
+            else:
+                breaker.rebuild_failures += 1
+                breaker.cooldown = min(self.max_cooldown, breaker.cooldown * 2)
+                breaker.retry_at = time.monotonic() + breaker.cooldown
+                print(f"[{breaker.name}] 重建未成功，{breaker.cooldown:g}s 后重试")
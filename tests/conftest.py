@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 测试直接导入仓库根目录的模块与 benchmarks 中的本地替身服务
+for path in (ROOT_DIR, os.path.join(ROOT_DIR, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,117 @@
+import csv
+
+import pytest
+
+import backfill
+import main
+from csv_writer import CsvSink
+from mock_servers import MockServers
+
+DATE = "2025-01-01"
+
+
+def stamp(ts: int) -> str:
+    return main.format_tick_time(main.to_data_datetime(ts))
+
+
+def write_csv(path, header, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+@pytest.fixture
+def day_start():
+    return backfill.day_range(DATE)[0]
+
+
+def test_find_missing_counts_gaps_and_sentinels(day_start):
+    rows = [
+        [stamp(day_start), "0.51"],
+        [stamp(day_start + 1), "none"],
+        [stamp(day_start + 3), "0.52"],
+        ["garbage"],
+    ]
+    assert backfill.find_missing(rows, "polymarket", day_start, day_start + 5) == [
+        day_start + 1, day_start + 2, day_start + 4,
+    ]
+    # 币安的哨兵值为 0
+    binance_rows = [[stamp(day_start), "0"], [stamp(day_start + 1), "97000.10"]]
+    assert backfill.find_missing(binance_rows, "binance", day_start, day_start + 2) == [day_start]
+
+
+def test_split_runs_breaks_on_gaps_and_max_length():
+    assert backfill.split_runs([1, 2, 3, 5, 6, 9], 10) == [(1, 3), (5, 6), (9, 9)]
+    assert backfill.split_runs(list(range(10, 17)), 3) == [(10, 12), (13, 15), (16, 16)]
+    assert backfill.split_runs([], 3) == []
+
+
+def test_step_fill_takes_latest_point_within_staleness():
+    points = [(100, "0.40"), (160, "0.45")]
+    filled = backfill.step_fill(points, [99, 100, 159, 160, 280, 281], max_staleness=120)
+    assert filled == {100: "0.40", 159: "0.40", 160: "0.45", 280: "0.45"}
+
+
+def test_merge_file_replaces_sentinels_in_time_order(tmp_path, day_start):
+    sink = CsvSink(str(tmp_path))
+    path = tmp_path / DATE[:7] / DATE / f"BTC_{DATE}.csv"
+    write_csv(path, ["time", "price"], [
+        [stamp(day_start), "0.51"],
+        [stamp(day_start + 1), "none"],
+        [stamp(day_start + 3), "0.53"],
+    ])
+    gap = backfill.SeriesGap("polymarket", "BTC", "BTC", str(path), [day_start + 1, day_start + 2],
+                             filled={day_start + 2: "0.52", day_start + 1: "0.50"})
+
+    assert backfill.merge_file(gap) == 2
+    assert read_csv(path) == [
+        ["time", "price", "source"],
+        [stamp(day_start), "0.51", ""],
+        [stamp(day_start + 1), "0.50", "backfill"],
+        [stamp(day_start + 2), "0.52", "backfill"],
+        [stamp(day_start + 3), "0.53", ""],
+    ]
+
+    # 采集器之后追加到同一文件的行按已有表头补齐列数
+    assert sink.file_path("BTC", DATE) == str(path)
+    sink.write_row("BTC", main.to_data_datetime(day_start + 4), [stamp(day_start + 4), "0.54"], ["time", "price"])
+    sink.close()
+    assert read_csv(path)[-1] == [stamp(day_start + 4), "0.54", ""]
+    assert {len(row) for row in read_csv(path)} == {3}
+
+
+def test_backfill_run_against_mock_servers(tmp_path, monkeypatch, day_start):
+    with MockServers() as servers:
+        env = servers.env()
+        monkeypatch.setenv("GAMMA_MARKETS_URL", env["GAMMA_MARKETS_URL"])
+        monkeypatch.setattr(main, "CLOB_API", env["CLOB_API_URL"])
+        monkeypatch.setattr(main, "BINANCE_API_URL", env["BINANCE_API_URL"])
+        monkeypatch.setattr(main, "csv_sink", CsvSink(str(tmp_path)))
+
+        start = day_start + 8 * 3600
+        polymarket_path = tmp_path / DATE[:7] / DATE / f"BTC_{DATE}.csv"
+        binance_path = tmp_path / DATE[:7] / DATE / f"BTC_BINANCE_{DATE}.csv"
+        # 前 60 秒正常，之后整段缺失，中间夹一个哨兵值
+        write_csv(polymarket_path, ["time", "price"],
+                  [[stamp(ts), "0.50" if ts != start + 30 else "none"] for ts in range(start, start + 60)])
+        write_csv(binance_path, ["time", "price"], [[stamp(ts), "97000.00"] for ts in range(start, start + 60)])
+
+        clock = lambda ts: main.to_data_datetime(ts).strftime("%H:%M:%S")
+        backfill.run(backfill.parse_args([
+            DATE, "--series", "BTC,BTC_BINANCE", "--start", clock(start), "--end", clock(start + 300),
+        ]))
+
+    for path in (polymarket_path, binance_path):
+        rows = read_csv(path)
+        assert rows[0] == ["time", "price", "source"]
+        times = [row[0] for row in rows[1:]]
+        assert times == sorted(times) and len(times) == len(set(times)) == 300
+        assert all(row[1] not in {"", "none", "0"} for row in rows[1:])
+        assert sum(row[2] == "backfill" for row in rows[1:]) == (241 if path == polymarket_path else 240)
@@ -0,0 +1,113 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from binance_ws import BinanceStream
+from csv_writer import CsvSink
+from mock_ws import MockWebSocketServer
+from writer_queue import BackgroundWriter
+
+
+def book_ticker(symbol: str, bid: str, ask: str) -> str:
+    return json.dumps({"stream": f"{symbol.lower()}@bookTicker", "data": {"s": symbol, "b": bid, "a": ask}})
+
+
+def agg_trade(symbol: str, agg_id: int, price: str, trade_time: int = 1735689600000) -> str:
+    return json.dumps({
+        "stream": f"{symbol.lower()}@aggTrade",
+        "data": {"e": "aggTrade", "s": symbol, "a": agg_id, "p": price, "q": "0.5", "T": trade_time, "m": True},
+    })
+
+
+@pytest.fixture
+def server():
+    with MockWebSocketServer() as mock:
+        yield mock
+
+
+@pytest.fixture
+def stream(server):
+    stream = BinanceStream(
+        {"BTC": "BTCUSDT", "ETH": "ETHUSDT"},
+        f"{server.url}/stream",
+        capture_trades=True,
+        reconnect_delay=0.05,
+    )
+    stream.start()
+    assert server.wait_for(lambda: stream.connected)
+    yield stream
+    stream.stop()
+
+
+def test_combined_stream_path_and_quotes(server, stream):
+    assert server.connections[0].path == (
+        "/stream?streams=btcusdt@bookTicker/btcusdt@aggTrade/ethusdt@bookTicker/ethusdt@aggTrade"
+    )
+
+    server.broadcast(book_ticker("BTCUSDT", "99999.9", "100000.1"))
+    server.broadcast(agg_trade("BTCUSDT", 1, "100000.0"))
+    assert server.wait_for(lambda: stream.get_prices() == {"BTC": "100000.0"})
+    quote = stream.get_quote("BTC")
+    assert (quote["bid"], quote["ask"]) == ("99999.9", "100000.1")
+    assert stream.get_quote("ETH") is None
+
+
+def test_duplicate_and_missed_trades_across_reconnect(server, stream):
+    trades = []
+
+    def drained(count):
+        for coin, batch in stream.drain_trades().items():
+            trades.extend((coin, trade["agg_id"]) for trade in batch)
+        return len(trades) == count
+
+    server.broadcast(book_ticker("BTCUSDT", "1", "2"))
+    for agg_id in (1, 2, 3):
+        server.broadcast(agg_trade("BTCUSDT", agg_id, f"{agg_id}.0"))
+    assert server.wait_for(lambda: drained(3))
+
+    server.drop_clients()
+    assert server.wait_for(lambda: len(server.active()) == 1 and stream.connected)
+    assert stream.stats["reconnects"] == 1
+    # 断线期间的盘口被清空，成交价保留
+    assert "bid" not in stream.get_quote("BTC")
+
+    # 重连后服务端重放了 2、3，随后跳过 4、5
+    for agg_id in (2, 3, 6):
+        server.broadcast(agg_trade("BTCUSDT", agg_id, f"{agg_id}.0"))
+    assert server.wait_for(lambda: drained(4))
+    assert trades == [("BTC", 1), ("BTC", 2), ("BTC", 3), ("BTC", 6)]
+    assert stream.stats["missed_trades"] == 2
+    assert stream.get_prices() == {"BTC": "6.0"}
+
+
+def test_trades_are_submitted_with_the_tick_as_one_item(tmp_path, monkeypatch, server, stream):
+    import main
+
+    sink = CsvSink(str(tmp_path))
+    writer = BackgroundWriter(main.write_rows, maxsize=2, spill_path=str(tmp_path / "spill.bin"))
+    monkeypatch.setattr(main, "csv_sink", sink)
+    monkeypatch.setattr(main, "parquet_sink", None)
+    monkeypatch.setattr(main, "background_writer", writer)
+    monkeypatch.setattr(main, "binance_stream", stream)
+
+    # 2025-01-01 00:00:00.123 UTC 起的一串成交，多于写盘队列容量
+    for agg_id in range(1, 21):
+        server.broadcast(agg_trade("BTCUSDT", agg_id, f"{agg_id}.5", trade_time=1735689600123 + agg_id))
+    assert server.wait_for(lambda: stream.get_prices().get("BTC") == "20.5")
+
+    rows = [("binance", "BTC", "20.5")] + main.binance_trade_rows()
+    assert [kind for kind, _, _ in rows] == ["binance", "binance_trades"]
+    assert main.binance_trade_rows() == []
+    writer.start()
+    main.submit_rows(datetime(2025, 1, 1, 0, 0, 1), rows)
+    writer.close()
+    sink.close()
+
+    date_str = main.to_data_datetime(1735689600.123).strftime("%Y-%m-%d")
+    with open(sink.file_path("BTC_BINANCE_TRADES", date_str), encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines[0] == "time,price,qty,agg_id,is_buyer_maker"
+    assert len(lines) == 21
+    assert lines[1].endswith(".124,1.5,0.5,1,1")
+    assert writer.metrics()["written"] == 1
@@ -0,0 +1,23 @@
+from crypto15 import apply_token_info
+from market_registry import MarketSpec
+
+
+def test_apply_token_info_replaces_the_entry_in_one_assignment():
+    spec = MarketSpec(key="BTC", asset="BTC", interval="15m")
+    old_tokens = {"UP": "up-1", "DOWN": "down-1"}
+    token_ids = {"BTC": old_tokens}
+
+    assert apply_token_info(token_ids, spec, {"UP": "up-2", "DOWN": "down-2", "slug": "btc-updown-15m-900"})
+    assert token_ids["BTC"] == {"UP": "up-2", "DOWN": "down-2", "slug": "btc-updown-15m-900"}
+    # 读线程之前拿到的字典保持完整的旧 token
+    assert token_ids["BTC"] is not old_tokens
+    assert old_tokens == {"UP": "up-1", "DOWN": "down-1"}
+
+
+def test_apply_token_info_rejects_incomplete_results():
+    spec = MarketSpec(key="BTC", asset="BTC", interval="15m")
+    token_ids = {"BTC": {"UP": "up-1", "DOWN": "down-1"}}
+
+    assert not apply_token_info(token_ids, spec, {"UP": "up-2"})
+    assert not apply_token_info(token_ids, spec, {})
+    assert token_ids["BTC"] == {"UP": "up-1", "DOWN": "down-1"}
@@ -0,0 +1,169 @@
+import os
+import zlib
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import data_index
+
+DATE = "2025-01-01"
+AFTER = datetime(2025, 1, 2, 12, 0, 0)
+
+
+def line(clock: str, price: str = "0.50") -> str:
+    return f"{DATE} {clock},{price}\n"
+
+
+@pytest.fixture
+def day(tmp_path):
+    directory = tmp_path / DATE[:7] / DATE
+    directory.mkdir(parents=True)
+    return directory
+
+
+def write(path, text: str, mode: str = "w"):
+    with open(path, mode, encoding="utf-8", newline="") as f:
+        f.write(text)
+
+
+def entry_of(directory, name, now=AFTER):
+    return data_index.update_day(str(directory), now=now)["files"][name]
+
+
+def test_missing_counts_from_day_start_to_day_end(day):
+    name = f"BTC_{DATE}.csv"
+    write(day / name, "time,price\n" + line("00:00:10") + line("00:00:11", "none") + line("00:00:15"))
+
+    entry = entry_of(day, name)
+    # 开头 10 秒 + 中间 3 秒 + 00:00:16 到当天结束
+    assert entry["missing"] == 10 + 3 + (data_index.SECONDS_PER_DAY - 16)
+    assert (entry["rows"], entry["none"]) == (3, 1)
+
+    # 当天的文件只统计到此刻；此刻之前没有变化也会更新
+    assert entry_of(day, name, now=datetime(2025, 1, 1, 0, 1, 0))["missing"] == 10 + 3 + (60 - 16)
+    assert entry_of(day, name, now=datetime(2025, 1, 1, 0, 2, 0))["missing"] == 10 + 3 + (120 - 16)
+
+
+def test_empty_file_misses_the_whole_day(day):
+    name = f"ETH_{DATE}.csv"
+    write(day / name, "time,price\n")
+    assert entry_of(day, name)["missing"] == data_index.SECONDS_PER_DAY
+    assert entry_of(day, name, now=datetime(2024, 12, 31, 23, 0, 0))["missing"] == 0
+
+
+def test_incremental_resume_only_scans_appended_lines(day):
+    name = f"BTC_{DATE}.csv"
+    path = day / name
+    write(path, "time,price\n" + line("10:00:00") + line("10:00:01"))
+    first = entry_of(day, name)
+    inode = first["inode"]
+
+    # 写盘缓冲刷出的半行不会被索引
+    write(path, line("10:00:02") + f"{DATE} 10:0", mode="a")
+    partial = entry_of(day, name)
+    assert partial["rows"] == 3
+    assert partial["mtime_ns"] == 0
+    write(path, "0:03,0.50\n" + line("10:01:00"), mode="a")
+
+    resumed = entry_of(day, name)
+    assert resumed["inode"] == inode
+    assert resumed["rows"] == 5
+    assert resumed["last"] == f"{DATE} 10:01:00"
+    assert resumed["minutes"] == {"10:00": first["minutes"]["10:00"], "10:01": resumed["last_offset"]}
+    with open(path, "rb") as f:
+        assert resumed["crc32"] == zlib.crc32(f.read())
+    # 未变化的文件原样返回，不重写 _index.json
+    mtime = os.stat(day / data_index.INDEX_NAME).st_mtime_ns
+    assert entry_of(day, name) == resumed
+    assert os.stat(day / data_index.INDEX_NAME).st_mtime_ns == mtime
+
+
+def test_replaced_or_truncated_file_is_rebuilt(day):
+    name = f"BTC_{DATE}.csv"
+    path = day / name
+    write(path, "time,price\n" + line("10:00:00", "none") + line("10:00:02"))
+    assert entry_of(day, name)["none"] == 1
+
+    # 与 backfill.py 一样原子替换：前面的行被改写
+    tmp = day / f"{name}.tmp"
+    write(tmp, "time,price,source\n" + line("10:00:00").rstrip("\n") + ",backfill\n"
+          + line("10:00:01").rstrip("\n") + ",backfill\n" + line("10:00:02").rstrip("\n") + ",\n")
+    os.replace(tmp, path)
+    replaced = entry_of(day, name)
+    assert replaced["header"] == ["time", "price", "source"]
+    assert (replaced["rows"], replaced["none"], replaced["gaps"]) == (3, 0, 0)
+
+    write(path, "time,price\n" + line("11:00:00"))
+    truncated = entry_of(day, name)
+    assert (truncated["rows"], truncated["first"], truncated["last"]) == (1, f"{DATE} 11:00:00", f"{DATE} 11:00:00")
+
+
+def test_query_boundaries(day):
+    name = f"BTC_{DATE}.csv"
+    clocks = ["13:59:59", "14:00:00", "14:00:30", "14:01:59", "14:03:00", "14:15:59", "14:16:00"]
+    write(day / name, "time,price\n" + "".join(line(clock) for clock in clocks))
+    base = str(day.parent.parent)
+
+    def times(start, end):
+        header, rows = data_index.query(base, "BTC", DATE, start, end)
+        assert header == ["time", "price"]
+        return [row[0][11:] for row in rows]
+
+    # HH:MM 的结束时刻包含整分钟
+    assert times("14:00", "14:15") == ["14:00:00", "14:00:30", "14:01:59", "14:03:00", "14:15:59"]
+    assert times("14:00:30", "14:01:59") == ["14:00:30", "14:01:59"]
+    # 起点所在分钟没有数据时从下一个有数据的分钟开始
+    assert times("14:02", "14:03") == ["14:03:00"]
+    assert times("14:04", "14:10") == []
+    assert times("14:17", "23:59") == []
+    assert times("00:00", "13:59") == ["13:59:59"]
+    assert data_index.query(base, "ETH", DATE, "00:00", "23:59") == ([], [])
+
+
+def test_late_rows_are_indexed_once_per_grace_period(tmp_path, monkeypatch):
+    import csv_writer
+
+    clock = [1000.0]
+    monkeypatch.setattr(csv_writer, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    directory = str(tmp_path / DATE[:7] / DATE)
+    indexed = []
+
+    def on_day_closed(closed):
+        indexed.append(closed)
+        data_index.update_day(closed, now=AFTER)
+
+    sink = csv_writer.CsvSink(str(tmp_path), on_day_closed=on_day_closed, late_grace=60)
+    header = ["time", "price"]
+
+    def write(day, clock_str, price):
+        sink.write_row("BTC", datetime.strptime(f"{day} {clock_str}", "%Y-%m-%d %H:%M:%S"),
+                       [f"{day} {clock_str}", price], header)
+
+    write(DATE, "23:59:59", "0.50")
+    # 零点切换：前一天的句柄保留宽限期，暂不索引
+    write("2025-01-02", "00:00:00", "0.51")
+    assert indexed == []
+
+    # 宽限期内的迟到行直接追加，不重新打开文件，也不逐行更新索引
+    for price in ("0.52", "0.53", "0.54"):
+        write(DATE, "23:59:59", price)
+    assert sink.stats["opens"] == 2
+    assert indexed == []
+
+    # 宽限期结束后的下一次写入关闭前一天并只索引一次
+    clock[0] += 61
+    write("2025-01-02", "00:01:01", "0.55")
+    assert indexed == [directory]
+    assert data_index.load_index(directory)["files"][f"BTC_{DATE}.csv"]["rows"] == 4
+
+    # 宽限期之后才到达的行重新打开文件，并在新的宽限期结束时再索引一次
+    write(DATE, "23:59:59", "0.56")
+    write(DATE, "23:59:59", "0.57")
+    assert sink.stats["opens"] == 3
+    assert indexed == [directory]
+    clock[0] += 61
+    write("2025-01-02", "00:02:02", "0.58")
+    assert indexed == [directory, directory]
+    assert data_index.load_index(directory)["files"][f"BTC_{DATE}.csv"]["rows"] == 6
+    sink.close()
@@ -0,0 +1,61 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from py_clob_client.client import ClobClient
+
+import main
+import mock_servers
+from mock_servers import MockServers
+
+
+@pytest.fixture
+def clob(monkeypatch):
+    with MockServers() as servers:
+        monkeypatch.setattr(main, "client", ClobClient(servers.clob.url))
+        monkeypatch.setattr(main, "polymarket_stream", None)
+        monkeypatch.setattr(main, "async_collector", None)
+        monkeypatch.setattr(main, "depth_recorder", object())
+        monkeypatch.setattr(main, "MARKET_TOKEN_IDS", {
+            "BTC": {"UP": "btc-up", "DOWN": "btc-down"},
+            "BTC5": {"UP": "btc5-up", "DOWN": "btc5-down"},
+            "ETH": {"UP": "none"},
+        })
+        monkeypatch.setitem(main.COLLECTION_CONFIG, "ENABLE_POLYMARKET", True)
+        monkeypatch.setitem(main.COLLECTION_CONFIG, "ENABLE_BINANCE", False)
+        yield servers.clob
+
+
+def test_bulk_mode_shares_one_books_request_with_depth(clob, monkeypatch):
+    monkeypatch.setitem(main.POLYMARKET_CONFIG, "PRICE_MODE", "bulk")
+
+    polymarket_prices, binance_prices, depth_books = main.collect_tick_with_depth()
+
+    assert clob.stats["requests"] == 1
+    assert binance_prices is None
+    assert polymarket_prices["ETH"] == "none"
+    assert polymarket_prices["BTC"] != "none" and polymarket_prices["BTC5"] != "none"
+    assert set(depth_books) == {"BTC", "BTC5"}
+    token_id, bids, asks = depth_books["BTC"]["DOWN"]
+    assert token_id == "btc-down"
+    assert len(bids) == len(asks) == main.DEPTH_CONFIG["LEVELS"]
+
+
+def test_bulk_prices_match_the_price_only_path(clob, monkeypatch):
+    monkeypatch.setitem(main.POLYMARKET_CONFIG, "PRICE_MODE", "bulk")
+    # 固定模拟盘口的时间，两次请求返回相同的价格
+    monkeypatch.setattr(mock_servers, "time", SimpleNamespace(time=lambda: 1735689600.0, sleep=time.sleep))
+
+    shared_prices, _ = main.fetch_polymarket_bulk_with_depth()
+    assert shared_prices == main.fetch_polymarket_prices_bulk()
+
+
+def test_poll_mode_fetches_depth_separately(clob, monkeypatch):
+    monkeypatch.setitem(main.POLYMARKET_CONFIG, "PRICE_MODE", "poll")
+
+    polymarket_prices, _, depth_books = main.collect_tick_with_depth()
+
+    # 两个有效 token 各一次 /midpoint，外加一次深度 /books
+    assert clob.stats["requests"] == 3
+    assert polymarket_prices["BTC"] != "none"
+    assert set(depth_books) == {"BTC", "BTC5"}
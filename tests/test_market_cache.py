@@ -0,0 +1,22 @@
+from crypto15 import cache_capacity
+from market_cache import MarketCache
+
+
+def test_resize_evicts_expired_then_least_recently_used():
+    now = [100.0]
+    cache = MarketCache(capacity=4, clock=lambda: now[0])
+    cache.set("expired", 0, expires_at=50.0)
+    for key in ("a", "b", "c"):
+        cache.set(key, key, expires_at=200.0)
+    cache.get("a")
+
+    cache.resize(2)
+    assert cache.capacity == 2
+    assert len(cache) == 2
+    assert "a" in cache and "c" in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_capacity_scales_with_registry_size():
+    assert cache_capacity(8) == 256
+    assert cache_capacity(500) == 2000
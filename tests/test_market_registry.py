@@ -0,0 +1,24 @@
+import json
+
+import crypto15
+from market_registry import DEFAULT_CONFIG, build_registry, legacy_spec
+
+
+def test_legacy_keys_match_the_default_registry():
+    registry = build_registry(DEFAULT_CONFIG)
+    for spec in registry.markets:
+        legacy = legacy_spec(spec.key)
+        assert (legacy.interval, legacy.outcomes, legacy.file_stem) == (spec.interval, spec.outcomes, spec.file_stem)
+    assert registry.get("BTC5").with_down
+
+
+def test_crypto15_loads_the_registry_on_first_use(tmp_path, monkeypatch):
+    path = tmp_path / "markets.json"
+    path.write_text(json.dumps({"assets": {"DOGE": {"binance_symbol": "DOGEUSDT"}}, "intervals": ["1h"]}))
+    # 模拟 main：导入 crypto15 之后才由 load_dotenv 设置环境变量
+    monkeypatch.delitem(vars(crypto15), "MARKET_REGISTRY", raising=False)
+    monkeypatch.delitem(vars(crypto15), "MARKET_TOKEN_IDS", raising=False)
+    monkeypatch.setenv("MARKET_REGISTRY_FILE", str(path))
+
+    assert crypto15.MARKET_REGISTRY.keys() == ["DOGE1H"]
+    assert crypto15.MARKET_TOKEN_IDS == {"DOGE1H": {"UP": "none"}}
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from mock_ws import MockWebSocketServer
+from polymarket_ws import PolymarketMarketStream
+
+
+def book_event(token_id: str, bid: str, ask: str) -> str:
+    return json.dumps([{
+        "event_type": "book",
+        "asset_id": token_id,
+        "bids": [{"price": bid, "size": "100"}],
+        "asks": [{"price": ask, "size": "100"}],
+    }])
+
+
+def reply_with_books(conn, text):
+    """订阅（首次或增量）后推送对应 token 的盘口快照，与真实 market 频道一致"""
+    message = json.loads(text)
+    if message.get("operation") == "unsubscribe":
+        return
+    for token_id in message.get("assets_ids", []):
+        conn.send(book_event(token_id, "0.49", "0.51"))
+
+
+@pytest.fixture
+def server():
+    with MockWebSocketServer(on_message=reply_with_books) as mock:
+        yield mock
+
+
+@pytest.fixture
+def stream(server):
+    stream = PolymarketMarketStream(server.url, ping_interval=60, reconnect_delay=0.05)
+    yield stream
+    stream.stop()
+
+
+def test_initial_subscription_and_snapshot(server, stream):
+    stream.set_tokens(["A", "B", "none"])
+    stream.start()
+    assert server.wait_for(lambda: stream.get_price("A") == "0.50" and stream.get_price("B") == "0.50")
+    first = json.loads(server.connections[0].received[0])
+    assert first == {"assets_ids": ["A", "B"], "type": "market"}
+
+
+def test_set_tokens_updates_subscription_without_reconnecting(server, stream):
+    stream.set_tokens(["A", "B"])
+    stream.start()
+    assert server.wait_for(lambda: stream.get_price("B") == "0.50")
+
+    stream.set_tokens(["A", "C"])
+    # 未变化的 token 在切换瞬间仍可读到价格
+    assert stream.get_price("A") == "0.50"
+    assert stream.get_price("B") == "none"
+    assert server.wait_for(lambda: stream.get_price("C") == "0.50")
+
+    assert len(server.connections) == 1
+    assert stream.reconnect_count == 0
+    messages = [json.loads(text) for text in server.connections[0].received]
+    assert {"assets_ids": ["B"], "operation": "unsubscribe"} in messages
+    assert {"assets_ids": ["C"], "operation": "subscribe"} in messages
+
+
+def test_price_change_updates_book(server, stream):
+    stream.set_tokens(["A"])
+    stream.start()
+    assert server.wait_for(lambda: stream.get_price("A") == "0.50")
+    server.broadcast(json.dumps({
+        "event_type": "price_change",
+        "price_changes": [{"asset_id": "A", "side": "BUY", "price": "0.55", "size": "10"},
+                          {"asset_id": "A", "side": "SELL", "price": "0.51", "size": "0"},
+                          {"asset_id": "A", "side": "SELL", "price": "0.57", "size": "10"}],
+    }))
+    assert server.wait_for(lambda: stream.get_price("A") == "0.56")
+
+
+def test_reconnect_resubscribes_full_set(server, stream):
+    stream.set_tokens(["A", "B"])
+    stream.start()
+    assert server.wait_for(lambda: stream.get_price("A") == "0.50")
+    server.drop_clients()
+    assert server.wait_for(lambda: len(server.connections) == 2 and stream.get_price("B") == "0.50")
+    assert json.loads(server.connections[1].received[0])["assets_ids"] == ["A", "B"]
@@ -0,0 +1,110 @@
+import multiprocessing
+import queue
+import threading
+import time
+
+import pytest
+
+import main
+import sharded
+from binance_ws import BinanceStream
+from mock_ws import MockWebSocketServer
+from supervisor import Supervisor
+from test_binance_ws import agg_trade
+
+
+def test_split_round_robin_spreads_intervals_across_shards():
+    keys = ["BTC", "ETH", "SOL", "XRP", "BTC5", "ETH5", "SOL5", "XRP5"]
+    assert sharded.split_round_robin(keys, 3) == [["BTC", "XRP", "SOL5"], ["ETH", "BTC5", "XRP5"], ["SOL", "ETH5"]]
+
+
+def test_worker_sends_end_marker_when_setup_fails():
+    ctx = multiprocessing.get_context("spawn")
+    row_queue = ctx.Queue()
+    stop_event = ctx.Event()
+    # symbols=None 让初始化在进入采样循环之前失败
+    process = ctx.Process(
+        target=sharded._worker_main,
+        args=(0, [], None, None, {}, 1, None, row_queue, stop_event),
+    )
+    process.start()
+    try:
+        assert row_queue.get(timeout=30) is None
+    finally:
+        process.join(timeout=10)
+    assert process.exitcode != 0
+
+
+def test_writer_exits_when_a_worker_dies_without_end_marker():
+    ctx = multiprocessing.get_context("spawn")
+    row_queue = ctx.Queue()
+    workers_done = ctx.Event()
+    writer = ctx.Process(target=sharded._writer_main, args=(row_queue, 2, workers_done))
+    writer.start()
+    # 一个采样进程正常结束，另一个被强制结束、没有发出结束标记
+    row_queue.put(None)
+    workers_done.set()
+    writer.join(timeout=30)
+    assert writer.exitcode == 0
+
+
+@pytest.fixture
+def shard(monkeypatch):
+    """在当前进程中把 main 收窄为一个分片：两个市场、一个币安交易对，采样周期 0.05 秒、3 个周期"""
+    monkeypatch.setattr(main, "MARKET_TOKEN_IDS", {"BTC": {"UP": "btc-up"}, "ETH": {"UP": "eth-up"}})
+    monkeypatch.setattr(main, "none_counter", {"BTC": 0, "ETH": 0})
+    monkeypatch.setattr(main, "BINANCE_SYMBOLS", {"BTC": "BTCUSDT"})
+    monkeypatch.setattr(main, "binance_none_counter", {"BTC": 0})
+    monkeypatch.setattr(main, "supervisor", Supervisor(failure_threshold=2, cooldown=0))
+    monkeypatch.setattr(main, "binance_stream", None)
+    monkeypatch.setitem(main.COLLECTION_CONFIG, "SAMPLE_PERIOD", 0.05)
+    monkeypatch.setitem(main.COLLECTION_CONFIG, "MAX_TICKS", 3)
+    return queue.Queue()
+
+
+def test_worker_reports_failing_markets_to_its_supervisor(shard, monkeypatch):
+    rebuilt = []
+    main.supervisor.register("polymarket", "polymarket_source")
+    for key in main.MARKET_TOKEN_IDS:
+        main.supervisor.register(f"polymarket:{key}", "market_token", lambda key=key: rebuilt.append(key) or True)
+    monkeypatch.setattr(main, "collect_tick", lambda: ({"BTC": "0.51"}, {"BTC": "97000.1"}))
+
+    sharded._worker_loop(0, shard, threading.Event())
+
+    items = [shard.get_nowait() for _ in range(shard.qsize())]
+    assert len(items) == 3
+    assert items[0][1] == [("polymarket", "BTC", "0.51"), ("polymarket", "ETH", "none"), ("binance", "BTC", "97000.1")]
+    assert main.none_counter == {"BTC": 0, "ETH": 3}
+    # 只有失败的市场被熔断重建，数据源本身正常
+    assert main.supervisor.get("polymarket:ETH").opens == 1
+    assert main.supervisor.get("polymarket:BTC").opens == 0
+    assert main.supervisor.get("polymarket").opens == 0
+    deadline = time.monotonic() + 5
+    while not rebuilt and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert rebuilt == ["ETH"]
+
+
+def test_worker_forwards_captured_trades_over_the_row_queue(shard, monkeypatch):
+    monkeypatch.setitem(main.COLLECTION_CONFIG, "MAX_TICKS", 1)
+    with MockWebSocketServer() as server:
+        stream = BinanceStream({"BTC": "BTCUSDT"}, f"{server.url}/stream", capture_trades=True, reconnect_delay=0.05)
+        stream.start()
+        assert server.wait_for(lambda: stream.connected)
+        monkeypatch.setattr(main, "binance_stream", stream)
+        monkeypatch.setattr(main, "collect_tick", lambda: (None, stream.get_prices()))
+
+        for agg_id in (1, 2):
+            server.broadcast(agg_trade("BTCUSDT", agg_id, f"{agg_id}.0"))
+        assert server.wait_for(lambda: stream.get_prices() == {"BTC": "2.0"})
+        sharded._worker_loop(0, shard, threading.Event())
+        # 最后一个周期之后到达的成交在退出时发出
+        server.broadcast(agg_trade("BTCUSDT", 3, "3.0"))
+        assert server.wait_for(lambda: stream.get_prices() == {"BTC": "3.0"})
+        sharded._worker_shutdown(0, shard)
+
+    (_, rows, tick_info), (_, last_rows, last_info) = shard.get_nowait(), shard.get_nowait()
+    assert rows[0] == ("binance", "BTC", "2.0")
+    assert [trade["agg_id"] for trade in rows[1][2]] == [1, 2] and rows[1][:2] == ("binance_trades", "BTC")
+    assert tick_info is not None
+    assert [trade["agg_id"] for trade in last_rows[0][2]] == [3] and last_info is None
@@ -0,0 +1,56 @@
+import os
+import threading
+
+from cycle_calendar import cycle_start_ts
+from market_registry import DEFAULT_CONFIG, build_registry
+from state_store import load_state, market_entries, save_state, valid_markets
+
+NOW = 1735689600.0 + 7 * 60  # 2025-01-01 00:07:00 UTC
+
+
+def test_warm_start_keeps_only_markets_resolved_for_the_current_cycle():
+    registry = build_registry(DEFAULT_CONFIG)
+    btc, eth = registry.get("BTC"), registry.get("ETH")
+    current = cycle_start_ts(btc.interval_seconds, NOW)
+    previous = cycle_start_ts(btc.interval_seconds, NOW, offset_cycles=-1)
+    token_ids = {
+        "BTC": {"UP": "btc-up", "DOWN": "btc-down", "slug": btc.slug(current)},
+        # 当前周期市场尚未上线，偏移回退解析到了上一周期
+        "ETH": {"UP": "eth-up", "DOWN": "eth-down", "slug": eth.slug(previous)},
+        # 没有记录 slug 的 token 无法校验
+        "SOL": {"UP": "sol-up", "DOWN": "sol-down"},
+        "XRP": {"UP": "none"},
+    }
+
+    entries = market_entries(token_ids, registry, NOW)
+    assert set(entries) == {"BTC", "ETH"}
+    assert entries["ETH"]["slug"] == eth.slug(previous)
+
+    restored = valid_markets({"markets": entries}, registry, NOW)
+    assert restored == {"BTC": {"UP": "btc-up", "DOWN": "btc-down", "slug": btc.slug(current)}}
+
+
+def test_concurrent_saves_leave_a_complete_private_file(tmp_path):
+    path = str(tmp_path / "state.json")
+    errors = []
+
+    def save(name):
+        try:
+            for i in range(200):
+                save_state({"creds": {"api_key": name}, "markets": {f"M{j}": {"UP": str(i)} for j in range(50)}}, path)
+        except Exception as ex:
+            errors.append(ex)
+
+    # 热启动时凭证校验与市场校验两个线程同时保存
+    threads = [threading.Thread(target=save, args=(name,)) for name in ("warm-start", "warm-creds", "refresh")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    state = load_state(path)
+    assert state["creds"]["api_key"] in {"warm-start", "warm-creds", "refresh"}
+    assert len(state["markets"]) == 50
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    assert os.listdir(tmp_path) == ["state.json"]
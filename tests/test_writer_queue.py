@@ -0,0 +1,39 @@
+import threading
+
+from writer_queue import BackgroundWriter
+
+
+def test_drop_oldest_with_concurrent_producers_never_raises(tmp_path):
+    writer = BackgroundWriter(lambda item: None, maxsize=2, policy="drop_oldest",
+                              spill_path=str(tmp_path / "spill.bin"))
+    errors = []
+
+    def produce(name):
+        try:
+            for i in range(5000):
+                writer.submit((name, i))
+        except Exception as ex:
+            errors.append(ex)
+
+    # 写盘线程未启动：队列一直是满的，每次提交都要先丢弃最旧的一项
+    producers = [threading.Thread(target=produce, args=(name,)) for name in ("tick", "trade", "other")]
+    for thread in producers:
+        thread.start()
+    for thread in producers:
+        thread.join()
+
+    metrics = writer.metrics()
+    assert errors == []
+    assert metrics["depth"] == 2
+    assert metrics["dropped"] == 3 * 5000 - 2
+
+
+def test_drop_oldest_keeps_the_newest_items(tmp_path):
+    written = []
+    writer = BackgroundWriter(written.append, maxsize=3, policy="drop_oldest", spill_path=str(tmp_path / "spill.bin"))
+    for i in range(10):
+        writer.submit(i)
+    writer.start()
+    writer.close()
+    assert written == [7, 8, 9]
+    assert writer.metrics()["dropped"] == 7
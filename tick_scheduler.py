@@ -0,0 +1,91 @@
+import math
+import time
+from typing import NamedTuple
+
+
+class Tick(NamedTuple):
+    index: int             # 自对齐起点以来的周期序号（跳过的周期也计数）
+    scheduled_time: float  # 计划触发时刻（Unix 时间戳，对齐到周期边界）
+    lag: float             # 实际触发时刻相对计划时刻的延迟（秒）
+    missed: int            # 本次触发前被跳过的周期数
+
+
+class TickScheduler:
+    """
+    基于单调时钟绝对截止时间的采样调度器
+    截止时间 = 对齐基准 + index * period，不累积每次处理耗时，因此长期运行无漂移；
+    基准对齐到墙钟的周期边界（period=1 时即整秒）
+    """
+
+    # 墙钟与单调时钟偏差超过该值（如 NTP 校时）时重新对齐
+    REALIGN_THRESHOLD = 0.5
+
+    def __init__(self, period: float = 1.0):
+        if period <= 0:
+            raise ValueError("period 必须大于 0")
+        self.period = period
+        self.stats = {
+            "ticks": 0,
+            "missed": 0,      # 因处理过慢而整周期跳过的次数
+            "overruns": 0,    # 处理耗时超过一个周期、与下一周期重叠的次数
+            "realigns": 0,
+            "max_lag": 0.0,
+        }
+        self._index = 0
+        self._align()
+
+    def _align(self):
+        wall = time.time()
+        mono = time.monotonic()
+        next_boundary = (math.floor(wall / self.period) + 1) * self.period
+        self._base_wall = next_boundary
+        self._base_mono = mono + (next_boundary - wall)
+        self._index = 0
+
+    def _deadline(self, index: int) -> float:
+        return self._base_mono + index * self.period
+
+    def wait_next(self) -> Tick:
+        """阻塞到下一个周期边界并返回该周期信息；若已落后整周期则跳过并计数"""
+        missed = 0
+        now = time.monotonic()
+        deadline = self._deadline(self._index)
+
+        if now - deadline >= self.period:
+            missed = int((now - deadline) // self.period)
+            self._index += missed
+            deadline = self._deadline(self._index)
+            self.stats["missed"] += missed
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(remaining)
+
+        lag = time.monotonic() - deadline
+        tick = Tick(
+            index=self._index,
+            scheduled_time=self._base_wall + self._index * self.period,
+            lag=lag,
+            missed=missed,
+        )
+        self._index += 1
+        self.stats["ticks"] += 1
+        self.stats["max_lag"] = max(self.stats["max_lag"], lag)
+        return tick
+
+    def finish(self, tick: Tick) -> bool:
+        """
+        在本周期处理完成后调用：检查是否与下一周期重叠，并校正墙钟偏差
+        返回 True 表示本周期处理超时（overrun）
+        """
+        overrun = time.monotonic() > self._deadline(tick.index + 1)
+        if overrun:
+            self.stats["overruns"] += 1
+
+        expected_wall = self._base_wall + (time.monotonic() - self._base_mono)
+        if abs(time.time() - expected_wall) > self.REALIGN_THRESHOLD:
+            self.stats["realigns"] += 1
+            self._align()
+        return overrun
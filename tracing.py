@@ -0,0 +1,262 @@
+import cProfile
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Optional
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "started")
+
+    def __init__(self, tracer, name: str, cat: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.cat, self.started, time.perf_counter(), self.args)
+        return False
+
+
+class Tracer:
+    """
+    采样周期各阶段的耗时区间（span），保存在有界环形缓冲区中，可导出为 Chrome trace JSON
+    （chrome://tracing 或 https://ui.perfetto.dev 打开）；未启用时 span() 返回空上下文，几乎没有开销
+    """
+
+    def __init__(self, capacity: int = 20000, enabled: bool = False):
+        self.enabled = enabled
+        self._events = deque(maxlen=capacity)
+        # perf_counter 与墙钟的换算基准：导出的 ts 为 Unix 时间（微秒），便于与 CSV 时间对照
+        self._wall_offset = time.time() - time.perf_counter()
+        self._pid = os.getpid()
+        self._thread_names: dict = {}
+
+    def span(self, name: str, cat: str = "collector", **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def record(self, name: str, cat: str, started: float, ended: float, args: dict | None = None):
+        """记录一个已结束的区间（perf_counter 秒）；未启用时忽略"""
+        if not self.enabled:
+            return
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": (started + self._wall_offset) * 1e6,
+            "dur": (ended - started) * 1e6,
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        if event["tid"] not in self._thread_names:
+            self._thread_names[event["tid"]] = threading.current_thread().name
+        # deque.append 是原子操作，多个线程可同时记录
+        self._events.append(event)
+
+    def events(self, since: float | None = None) -> list:
+        """since 为 Unix 时间戳，只返回之后开始的区间"""
+        events = list(self._events)
+        if since is not None:
+            events = [e for e in events if e["ts"] >= since * 1e6]
+        return events
+
+    def dump(self, path: str, since: float | None = None) -> int:
+        """写出 Chrome trace JSON，返回区间数"""
+        events = self.events(since)
+        # 线程名元数据：trace 查看器按名称显示各线程
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+            for tid, name in list(self._thread_names.items())
+        ]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        return len(events)
+
+
+class StackSampler:
+    """
+    采样分析器：后台线程定时读取所有线程的调用栈（sys._current_frames），
+    按 "线程;外层函数;...;内层函数 次数" 的折叠格式汇总（可直接交给 flamegraph.pl / speedscope）
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.samples = 0
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write_folded(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                self._stacks[";".join(reversed(frames))] += 1
+            self.samples += 1
+
+
+class ProfileController:
+    """
+    运行中按需开启 N 秒的分析窗口，无需重启：
+      - 信号（默认 SIGUSR1）或触发文件（文件内容可写秒数，读取后删除）请求一个窗口
+      - 窗口期间同时记录 trace 区间；结束后写出分析结果与该窗口的 Chrome trace 到 out_dir
+    mode="sample" 采样所有线程（默认）；mode="cprofile" 用 cProfile 精确统计调用主循环所在线程
+    poll() 需在主循环中每个周期调用一次（cProfile 只能在调用 enable 的线程上生效）
+    """
+
+    def __init__(
+            self,
+            tracer: Tracer,
+            out_dir: str = "profiles",
+            seconds: float = 30.0,
+            mode: str = "sample",
+            trigger_file: str | None = None,
+    ):
+        if mode not in ("sample", "cprofile"):
+            raise ValueError("mode 只能是 sample 或 cprofile")
+        self.tracer = tracer
+        self.out_dir = out_dir
+        self.seconds = seconds
+        self.mode = mode
+        self.trigger_file = trigger_file
+
+        self._requested: float | None = None
+        self._active_until = 0.0
+        self._started_wall = 0.0
+        self._tracer_was_enabled = tracer.enabled
+        self._profiler: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+
+    @property
+    def active(self) -> bool:
+        return self._active_until > 0
+
+    def request(self, seconds: float | None = None):
+        """请求一个分析窗口（可在信号处理函数或其他线程中调用），下一次 poll 时开始"""
+        self._requested = seconds or self.seconds
+
+    def install_signal(self, signum=None) -> bool:
+        """注册信号触发；平台不支持（如 Windows 没有 SIGUSR1）或不在主线程时返回 False"""
+        signum = signum if signum is not None else getattr(signal, "SIGUSR1", None)
+        if signum is None:
+            return False
+        try:
+            signal.signal(signum, lambda *_: self.request())
+        except ValueError:
+            return False
+        return True
+
+    def poll(self):
+        now = time.monotonic()
+        if self.active:
+            if now >= self._active_until:
+                self._finish()
+            return
+
+        self._check_trigger_file()
+        if self._requested is not None:
+            seconds, self._requested = self._requested, None
+            self._start(seconds)
+
+    # ------------------------ 内部实现 ------------------------
+
+    def _check_trigger_file(self):
+        if not self.trigger_file or not os.path.exists(self.trigger_file):
+            return
+        try:
+            with open(self.trigger_file, encoding="utf-8") as f:
+                content = f.read().strip()
+            os.remove(self.trigger_file)
+        except OSError:
+            return
+        try:
+            seconds = float(content) if content else None
+        except ValueError:
+            seconds = None
+        self.request(seconds)
+
+    def _start(self, seconds: float):
+        self._active_until = time.monotonic() + seconds
+        self._started_wall = time.time()
+        self._tracer_was_enabled = self.tracer.enabled
+        self.tracer.enabled = True
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = StackSampler()
+            self._sampler.start()
+        print(f"[分析] 开始 {seconds:g} 秒的分析窗口（{self.mode}）")
+
+    def _finish(self):
+        self._active_until = 0.0
+        self.tracer.enabled = self._tracer_was_enabled
+        profiler, self._profiler = self._profiler, None
+        sampler, self._sampler = self._sampler, None
+        if profiler is not None:
+            profiler.disable()
+        started_wall = self._started_wall
+        # 写文件放到后台线程，不占用采样周期
+        threading.Thread(
+            target=self._write, args=(profiler, sampler, started_wall), name="profile-writer", daemon=True,
+        ).start()
+
+    def _write(self, profiler, sampler, started_wall: float):
+        try:
+            if sampler is not None:
+                sampler.stop()
+            os.makedirs(self.out_dir, exist_ok=True)
+            stamp = datetime.fromtimestamp(started_wall).strftime("%Y%m%d_%H%M%S")
+            if profiler is not None:
+                profile_path = os.path.join(self.out_dir, f"profile_{stamp}.prof")
+                profiler.dump_stats(profile_path)
+            else:
+                profile_path = os.path.join(self.out_dir, f"profile_{stamp}.folded")
+                sampler.write_folded(profile_path)
+            trace_path = os.path.join(self.out_dir, f"trace_{stamp}.json")
+            spans = self.tracer.dump(trace_path, since=started_wall)
+            print(f"[分析] 已写出 {profile_path} 与 {trace_path}（{spans} 个区间）")
+        except Exception as ex:
+            print(f"[警告] [分析] 写出结果失败: {str(ex)[:80]}")
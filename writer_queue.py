@@ -0,0 +1,194 @@
+import os
+import pickle
+import queue
+import struct
+import threading
+import time
+from typing import Any, Callable
+
+_SENTINEL = object()
+_FRAME_HEADER = struct.Struct("<I")
+
+
+class BackgroundWriter:
+    """
+    采集与落盘之间的有界队列，由专用写盘线程按提交顺序消费
+
+    队列满时的背压策略：
+      block:       阻塞提交方直到有空位（不丢数据，但会拖慢采集）
+      drop_oldest: 丢弃队列中最旧的一项，保证采集不被阻塞
+      spill:       溢出到磁盘文件，队列消化完后按顺序回放（不丢数据也不阻塞）
+    """
+
+    POLICIES = ("block", "drop_oldest", "spill")
+
+    def __init__(
+            self,
+            handler: Callable[[Any], None],
+            maxsize: int = 600,
+            policy: str = "block",
+            spill_path: str = os.path.join("data", ".spill", "writer_spill.bin"),
+    ):
+        if policy not in self.POLICIES:
+            raise ValueError(f"未知的背压策略: {policy}，可选 {', '.join(self.POLICIES)}")
+        self.handler = handler
+        self.policy = policy
+        self.spill_path = spill_path
+
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._spill_handle = None
+        self._spill_pending = 0
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+        self._metrics = {
+            "submitted": 0,
+            "written": 0,
+            "dropped": 0,
+            "spilled": 0,
+            "errors": 0,
+            "max_depth": 0,
+            "lag": 0.0,
+            "max_lag": 0.0,
+            "blocked_seconds": 0.0,
+        }
+
+    # ------------------------ 生命周期 ------------------------
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._recover_spill()
+        self._thread = threading.Thread(target=self._run, name="csv-writer", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout: float | None = None):
+        """停止接收新数据，等待队列与溢出文件全部落盘后返回"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is None:
+            return
+        self._queue.put(_SENTINEL)
+        self._thread.join(timeout)
+
+    # ------------------------ 提交与指标 ------------------------
+
+    def submit(self, item):
+        if self._closed:
+            raise RuntimeError("BackgroundWriter 已关闭")
+        entry = (time.monotonic(), item)
+        self._metrics["submitted"] += 1
+
+        with self._lock:
+            # 溢出文件中还有待回放的数据时，新数据也写入溢出文件以保持顺序
+            if self._spill_pending:
+                self._spill(entry)
+                return
+
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            if self.policy == "drop_oldest":
+                # 丢弃与放入在锁内完成；其他提交方可能先占用腾出的空位，放入失败就继续丢弃最旧的一项
+                with self._lock:
+                    while True:
+                        try:
+                            self._queue.put_nowait(entry)
+                            break
+                        except queue.Full:
+                            try:
+                                self._queue.get_nowait()
+                                self._metrics["dropped"] += 1
+                            except queue.Empty:
+                                pass
+            elif self.policy == "spill":
+                with self._lock:
+                    self._spill(entry)
+            else:
+                started = time.monotonic()
+                self._queue.put(entry)
+                self._metrics["blocked_seconds"] += time.monotonic() - started
+
+        depth = self._queue.qsize()
+        if depth > self._metrics["max_depth"]:
+            self._metrics["max_depth"] = depth
+
+    def metrics(self) -> dict:
+        """队列深度、写盘延迟（入队到落盘）与各计数器"""
+        result = dict(self._metrics)
+        result["depth"] = self._queue.qsize()
+        result["spill_pending"] = self._spill_pending
+        return result
+
+    # ------------------------ 写盘线程 ------------------------
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is _SENTINEL:
+                break
+            self._handle(entry)
+            if self._queue.empty():
+                self._drain_spill()
+        self._drain_spill()
+
+    def _handle(self, entry):
+        enqueued_at, item = entry
+        try:
+            self.handler(item)
+            self._metrics["written"] += 1
+        except Exception as ex:
+            self._metrics["errors"] += 1
+            print(f"[警告] 写盘失败: {str(ex)[:80]}")
+        lag = time.monotonic() - enqueued_at
+        self._metrics["lag"] = lag
+        if lag > self._metrics["max_lag"]:
+            self._metrics["max_lag"] = lag
+
+    # ------------------------ 溢出文件 ------------------------
+
+    def _spill(self, entry):
+        """调用方需持有 self._lock"""
+        if self._spill_handle is None:
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            self._spill_handle = open(self.spill_path, "ab")
+        payload = pickle.dumps(entry[1], protocol=pickle.HIGHEST_PROTOCOL)
+        self._spill_handle.write(_FRAME_HEADER.pack(len(payload)) + payload)
+        self._spill_pending += 1
+        self._metrics["spilled"] += 1
+
+    def _drain_spill(self):
+        """把溢出文件整体转移后按顺序回放；回放期间的新提交重新进入队列"""
+        with self._lock:
+            if not self._spill_pending:
+                return
+            self._spill_handle.close()
+            self._spill_handle = None
+            draining_path = self.spill_path + ".draining"
+            os.replace(self.spill_path, draining_path)
+            self._spill_pending = 0
+
+        self._replay(draining_path)
+
+    def _replay(self, path: str):
+        now = time.monotonic()
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(_FRAME_HEADER.size)
+                if len(header) < _FRAME_HEADER.size:
+                    break
+                (length,) = _FRAME_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    break
+                self._handle((now, pickle.loads(payload)))
+        os.remove(path)
+
+    def _recover_spill(self):
+        """上次异常退出遗留的溢出文件，在启动时先回放"""
+        for path in (self.spill_path + ".draining", self.spill_path):
+            if os.path.exists(path):
+                print(f"[写盘] 回放上次遗留的溢出文件: {path}")
+                self._replay(path)